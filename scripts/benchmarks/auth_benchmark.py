@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""Measure per-request authentication overhead: cookie session vs Bearer access token.
+
+Usage: python3 scripts/benchmarks/auth_benchmark.py [--seconds 3]
+Each variant calls the same trivial endpoint through the Flask test client;
+the overhead is the difference to an unauthenticated endpoint. The permission
+cache is primed, as it would be after the first request of a user.
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT))
+
+# The benchmark works in a throw-away base directory
+WORK_DIR = tempfile.mkdtemp(prefix="kl-auth-bench-")
+os.environ["KL_BASE_DIR"] = WORK_DIR
+os.environ.setdefault("KL_ENV", "development")
+os.environ.setdefault("KL_SECRET_KEY", "benchmark")
+
+from flask import Flask, session, jsonify  # noqa: E402
+from src.backend.middleware.auth import login_required, admin_required, start_session_activity  # noqa: E402
+from src.backend.services.token_service import token_service  # noqa: E402
+from src.backend.services.permission_service import permission_service, ALL_PERMISSIONS  # noqa: E402
+
+USER = {"id": 1, "username": "bench", "role": "admin", "full_name": ""}
+
+
+def create_app():
+    app = Flask(__name__)
+    app.config["SECRET_KEY"] = os.environ["KL_SECRET_KEY"]
+
+    @app.route("/login")
+    def login():
+        session.update(user_id=USER["id"], username=USER["username"], role=USER["role"])
+        start_session_activity()
+        return "ok"
+
+    @app.route("/open")
+    def open_endpoint():
+        return jsonify(ok=True)
+
+    @app.route("/user")
+    @login_required
+    def user_endpoint():
+        return jsonify(ok=True)
+
+    @app.route("/admin")
+    @admin_required
+    def admin_endpoint():
+        return jsonify(ok=True)
+
+    return app
+
+
+def rate(func, seconds):
+    """Return microseconds of CPU per call"""
+    done = 0
+    cpu_started = time.process_time()
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        for _ in range(100):
+            func()
+        done += 100
+    return (time.process_time() - cpu_started) * 1e6 / done
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=3)
+    args = parser.parse_args()
+
+    # Hot path: masks are served from the per-user cache, no database needed
+    permission_service._cache.set(USER["id"], ALL_PERMISSIONS, 10 ** 6)
+
+    token = token_service.create_access_token(USER)
+    assert token_service.verify_access_token(token)["role"] == "admin"
+    verify_us = rate(lambda: token_service.verify_access_token(token), args.seconds)
+    print(f"token verify only:     {verify_us:8.1f} us")
+
+    app = create_app()
+    session_client = app.test_client()
+    session_client.get("/login")
+    token_client = app.test_client()
+    bearer = {"Authorization": f"Bearer {token}"}
+
+    assert session_client.get("/admin").status_code == 200
+    assert token_client.get("/admin", headers=bearer).status_code == 200
+    assert token_client.get("/admin").status_code == 401
+
+    baseline = rate(lambda: token_client.get("/open"), args.seconds)
+    print(f"unauthenticated:       {baseline:8.1f} us/request")
+    for name, path in (("login_required", "/user"), ("admin_required", "/admin")):
+        with_session = rate(lambda: session_client.get(path), args.seconds)
+        with_token = rate(lambda: token_client.get(path, headers=bearer), args.seconds)
+        print(f"{name} session: {with_session:8.1f} us/request  (+{with_session - baseline:.1f} us)")
+        print(f"{name} token:   {with_token:8.1f} us/request  (+{with_token - baseline:.1f} us)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""Load test: limiter and lockout memory under a scan from random source IPs.
+
+Usage: python3 scripts/benchmarks/limiter_memory_test.py [--requests 300000] [--report 25000]
+Every request comes from a new random IPv4 address, tries a new random
+username and presents a garbage API key, through an endpoint guarded by
+rate_limit and prevent_brute_force. The expiry sweep runs once a second as
+the background task would. Per report interval it prints RSS, the entries
+of the shared counter table and the API key cache, the login write queue
+and the evictions so far; RSS must level off instead of growing with the
+number of distinct sources.
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT))
+
+# The test works in a throw-away base directory with small caches and short
+# lifetimes, so that both capacity and expiry evictions show up quickly
+WORK_DIR = tempfile.mkdtemp(prefix="kl-memory-test-")
+os.environ["KL_BASE_DIR"] = WORK_DIR
+os.environ.setdefault("KL_ENV", "development")
+os.environ.setdefault("KL_SECRET_KEY", "benchmark")
+os.environ.setdefault("KL_LOGIN_TRACKER_SIZE", "5000")
+os.environ.setdefault("KL_LOGIN_ATTEMPT_HALF_LIFE", "2")
+os.environ.setdefault("KL_API_KEY_CACHE_SIZE", "5000")
+os.environ.setdefault("KL_API_KEY_CACHE_TTL", "5")
+
+from flask import Flask, Blueprint, jsonify, request  # noqa: E402
+from src.backend.rate_limiting import rate_limit, rate_limiter  # noqa: E402
+from src.backend.middleware.security import prevent_brute_force  # noqa: E402
+from src.backend.services.login_attempts import login_attempts  # noqa: E402
+from src.backend.services.api_key_service import api_key_service  # noqa: E402
+from src.backend.utils.bounded_cache import sweep_caches  # noqa: E402
+from src.backend.utils.shared_counters import shared_counters  # noqa: E402
+from src.backend.utils.metrics import metrics  # noqa: E402
+
+
+def create_app():
+    app = Flask(__name__)
+    auth_bp = Blueprint("auth", __name__)
+
+    @auth_bp.route("/login", methods=["POST"])
+    @prevent_brute_force(max_attempts=5, lockout_minutes=5)
+    @rate_limit("auth")
+    def login():
+        api_key_service.authenticate(request.headers.get("X-API-Key"))
+        login_attempts.record_failure(request.json["username"])
+        return jsonify({"error": "Invalid credentials"}), 401
+
+    app.register_blueprint(auth_bp)
+    return app
+
+
+def rss_mib():
+    with open("/proc/self/statm") as statm:
+        return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=300000)
+    parser.add_argument("--report", type=int, default=25000)
+    args = parser.parse_args()
+
+    # The global limit would turn most of the scan away before it reaches the stores
+    rate_limiter.scopes["global"]["limit"] = 0
+    client = create_app().test_client()
+    rng = random.Random(1)
+    swept_at = time.monotonic()
+    started = time.perf_counter()
+    print(f"{'requests':>9} {'rss MiB':>8} {'shared':>7} {'pending':>7} {'api keys':>8} {'evicted':>8} {'req/s':>7}")
+
+    for done in range(1, args.requests + 1):
+        ip = f"{rng.randrange(1, 224)}.{rng.randrange(256)}.{rng.randrange(256)}.{rng.randrange(1, 255)}"
+        client.post(
+            "/login",
+            json={"username": f"user{rng.getrandbits(40):x}"},
+            # A 12-character prefix is malformed, so the key is rejected (and cached) without a database
+            headers={"X-API-Key": f"kl_{rng.getrandbits(48):012x}_guess"},
+            environ_base={"REMOTE_ADDR": ip},
+        )
+
+        if time.monotonic() - swept_at >= 1:
+            sweep_caches()
+            swept_at = time.monotonic()
+
+        if done % args.report == 0:
+            evicted = sum(
+                value for name, value in metrics.snapshot()["counters"].items()
+                if name.startswith("memory_cache_evictions_total")
+            )
+            # No database here: the write queue is never flushed and must stay capped
+            print(f"{done:>9} {rss_mib():>8.1f} {shared_counters.entries():>7} {len(login_attempts._pending):>7} "
+                  f"{len(api_key_service._cache):>8} {evicted:>8} {done / (time.perf_counter() - started):>7.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""Measure OCSP responder throughput with pre-signed responses.
+
+Usage: python3 scripts/benchmarks/ocsp_benchmark.py [--certs 1000] [--seconds 5]
+Reports signing time for the response cache, then single-core request rate
+for the responder itself and through the Flask blueprint (WSGI test client).
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT))
+
+# The benchmark works in a throw-away base directory
+WORK_DIR = tempfile.mkdtemp(prefix="kl-ocsp-bench-")
+os.environ["KL_BASE_DIR"] = WORK_DIR
+os.environ.setdefault("KL_ENV", "development")
+os.environ.setdefault("KL_SECRET_KEY", "benchmark")
+os.environ["KL_KEY_POOL_SIZE"] = "0"
+
+from flask import Flask  # noqa: E402
+from cryptography.x509 import ocsp  # noqa: E402
+from cryptography.hazmat.primitives import hashes, serialization  # noqa: E402
+from src.backend.config import config  # noqa: E402
+from src.backend.services.certificate_service import CertificateService  # noqa: E402
+from src.backend.services.ocsp_responder import ocsp_responder  # noqa: E402
+from src.backend.routes.ocsp import ocsp_bp  # noqa: E402
+
+
+def setup(certs, algorithm):
+    """Create a CA and issue certificates without touching the database"""
+    service = CertificateService()
+    config.CA_DIR.mkdir(parents=True, exist_ok=True)
+    ca_key = service._generate_private_key(algorithm)
+    ca_cert = service._build_ca_certificate(ca_key)
+    service._write_file(config.CA_DIR / "ca.key", service._key_to_pem(ca_key), 0o600)
+    service._write_file(config.CA_DIR / "ca.crt", ca_cert.public_bytes(serialization.Encoding.PEM))
+    service.invalidate_ca_cache()
+
+    entries, requests = [], []
+    for i in range(certs):
+        key = service._generate_private_key(algorithm)
+        cert = service._sign_certificate(f"client{i}", key.public_key())
+        # Every tenth certificate is revoked; responses are signed from the serial alone
+        status = "revoked" if i % 10 == 0 else "active"
+        entries.append((format(cert.serial_number, "x"), status, None, "key_compromise"))
+        request = ocsp.OCSPRequestBuilder().add_certificate(cert, ca_cert, hashes.SHA1()).build()
+        requests.append(request.public_bytes(serialization.Encoding.DER))
+    # A CertID hashed with another algorithm must be refused, not answered by serial
+    foreign = ocsp.OCSPRequestBuilder().add_certificate(cert, ca_cert, hashes.SHA256()).build()
+    return entries, requests, foreign.public_bytes(serialization.Encoding.DER)
+
+
+def rate(func, requests, seconds):
+    """Call func with random requests for the given time on one core"""
+    done = 0
+    cpu_started = time.process_time()
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        for request in random.sample(requests, min(len(requests), 100)):
+            func(request)
+        done += min(len(requests), 100)
+    cpu = time.process_time() - cpu_started
+    return done / cpu, cpu * 1e6 / done
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--certs", type=int, default=1000)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--algorithm", default="ec-p256", choices=CertificateService.KEY_ALGORITHMS)
+    args = parser.parse_args()
+
+    entries, requests, foreign = setup(args.certs, args.algorithm)
+
+    started = time.perf_counter()
+    signed = ocsp_responder.refresh(entries)
+    print(f"pre-signed {signed} responses in {time.perf_counter() - started:.2f}s")
+
+    # Sanity check: responses are valid and match the request
+    sample = ocsp.load_der_ocsp_response(ocsp_responder.respond(requests[1]))
+    assert sample.response_status == ocsp.OCSPResponseStatus.SUCCESSFUL
+    assert sample.certificate_status == ocsp.OCSPCertStatus.GOOD
+    revoked = ocsp.load_der_ocsp_response(ocsp_responder.respond(requests[0]))
+    assert revoked.certificate_status == ocsp.OCSPCertStatus.REVOKED
+    assert revoked.serial_number == int(entries[0][0], 16)
+    refused = ocsp.load_der_ocsp_response(ocsp_responder.respond(foreign))
+    assert refused.response_status == ocsp.OCSPResponseStatus.UNAUTHORIZED
+
+    per_sec, us = rate(ocsp_responder.respond, requests, args.seconds)
+    print(f"responder:   {per_sec:>10.0f} req/s per core  ({us:.1f} us/request)")
+
+    app = Flask(__name__)
+    app.register_blueprint(ocsp_bp)
+    client = app.test_client()
+
+    def via_wsgi(request_der):
+        client.post("/api/ocsp", data=request_der, content_type="application/ocsp-request")
+
+    per_sec, us = rate(via_wsgi, requests, args.seconds)
+    print(f"flask wsgi:  {per_sec:>10.0f} req/s per core  ({us:.1f} us/request)")
+
+
+if __name__ == "__main__":
+    main()
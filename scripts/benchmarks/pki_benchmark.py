@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""Compare RSA and EC PKI modes: certificate issuance time and TLS handshake CPU.
+
+Usage: python3 scripts/benchmarks/pki_benchmark.py [--certs 50] [--handshakes 200]
+"""
+import os
+import sys
+import ssl
+import time
+import argparse
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT))
+
+# The benchmark works in a throw-away base directory
+WORK_DIR = tempfile.mkdtemp(prefix="kl-pki-bench-")
+os.environ["KL_BASE_DIR"] = WORK_DIR
+os.environ.setdefault("KL_ENV", "development")
+os.environ.setdefault("KL_SECRET_KEY", "benchmark")
+os.environ["KL_KEY_POOL_SIZE"] = "0"
+
+from cryptography.hazmat.primitives import serialization  # noqa: E402
+from src.backend.config import config  # noqa: E402
+from src.backend.services.certificate_service import CertificateService  # noqa: E402
+
+
+def setup_ca(service, algorithm):
+    """Create a CA of the given algorithm in the work directory"""
+    ca_dir = config.CA_DIR / algorithm
+    ca_dir.mkdir(parents=True, exist_ok=True)
+    config.CA_DIR = ca_dir
+    ca_key = service._generate_private_key(algorithm)
+    ca_cert = service._build_ca_certificate(ca_key)
+    service._write_file(ca_dir / "ca.key", service._key_to_pem(ca_key), 0o600)
+    service._write_file(ca_dir / "ca.crt", ca_cert.public_bytes(serialization.Encoding.PEM))
+    service.invalidate_ca_cache()
+    return ca_dir
+
+
+def issue(service, algorithm, name, server=False):
+    """Issue one certificate exactly like the service does, without the key pool"""
+    key = service._generate_private_key(algorithm)
+    cert = service._sign_certificate(name, key.public_key(), server=server)
+    return service._key_to_pem(key), cert.public_bytes(serialization.Encoding.PEM)
+
+
+def write_pair(directory, name, key_pem, cert_pem):
+    key_path = directory / f"{name}.key"
+    cert_path = directory / f"{name}.crt"
+    key_path.write_bytes(key_pem)
+    cert_path.write_bytes(cert_pem)
+    return str(cert_path), str(key_path)
+
+
+def handshake(server_ctx, client_ctx):
+    """Run one full TLS handshake in memory"""
+    client_in, client_out = ssl.MemoryBIO(), ssl.MemoryBIO()
+    server_in, server_out = ssl.MemoryBIO(), ssl.MemoryBIO()
+    client = client_ctx.wrap_bio(client_in, client_out, server_hostname="server")
+    server = server_ctx.wrap_bio(server_in, server_out, server_side=True)
+
+    client_done = server_done = False
+    while not (client_done and server_done):
+        if not client_done:
+            try:
+                client.do_handshake()
+                client_done = True
+            except ssl.SSLWantReadError:
+                pass
+        server_in.write(client_out.read())
+        if not server_done:
+            try:
+                server.do_handshake()
+                server_done = True
+            except ssl.SSLWantReadError:
+                pass
+        client_in.write(server_out.read())
+
+
+def bench(algorithm, certs, handshakes):
+    service = CertificateService()
+    ca_dir = setup_ca(service, algorithm)
+
+    started = time.perf_counter()
+    for i in range(certs):
+        issue(service, algorithm, f"client{i}")
+    issuance_ms = (time.perf_counter() - started) * 1000 / certs
+
+    server_cert, server_key = write_pair(ca_dir, "server", *issue(service, algorithm, "server", server=True))
+    client_cert, client_key = write_pair(ca_dir, "client", *issue(service, algorithm, "client"))
+
+    server_ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    server_ctx.load_cert_chain(server_cert, server_key)
+    server_ctx.load_verify_locations(str(ca_dir / "ca.crt"))
+    server_ctx.verify_mode = ssl.CERT_REQUIRED
+
+    client_ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+    client_ctx.check_hostname = False
+    client_ctx.load_cert_chain(client_cert, client_key)
+    client_ctx.load_verify_locations(str(ca_dir / "ca.crt"))
+
+    # Both peers run in this process, so the CPU time covers server and client side
+    cpu_started = time.process_time()
+    for _ in range(handshakes):
+        handshake(server_ctx, client_ctx)
+    handshake_ms = (time.process_time() - cpu_started) * 1000 / handshakes
+
+    return issuance_ms, handshake_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--certs", type=int, default=50, help="certificates to issue per algorithm")
+    parser.add_argument("--handshakes", type=int, default=200, help="TLS handshakes per algorithm")
+    parser.add_argument("--algorithms", default=",".join(CertificateService.KEY_ALGORITHMS))
+    args = parser.parse_args()
+
+    base_ca_dir = config.CA_DIR
+    print(f"{'algorithm':<10} {'issue ms/cert':>14} {'handshake cpu ms':>17}")
+    for algorithm in args.algorithms.split(","):
+        config.CA_DIR = base_ca_dir
+        try:
+            issuance_ms, handshake_ms = bench(algorithm, args.certs, args.handshakes)
+        except (ssl.SSLError, ValueError) as e:
+            print(f"{algorithm:<10} skipped: {e}")
+            continue
+        print(f"{algorithm:<10} {issuance_ms:>14.2f} {handshake_ms:>17.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""Measure rate limiter cost per check as the request rate per key grows.
+
+Usage: python3 scripts/benchmarks/rate_limit_benchmark.py [--redis-url redis://localhost:6379/15]
+For each level N the key first receives N requests inside the window, then
+checks are timed. GCRA keeps one timestamp per key and costs the same at every
+level; the sliding log (the previous implementation) keeps every timestamp in
+the window and slows down linearly. With --redis-url the same run is repeated
+through the Lua script on the pooled Redis client. The last line is the
+cost of a full hierarchy check (global, IP, user, endpoint class) that is
+evaluated in one store round trip.
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT))
+
+# The benchmark works in a throw-away base directory
+WORK_DIR = tempfile.mkdtemp(prefix="kl-ratelimit-bench-")
+os.environ["KL_BASE_DIR"] = WORK_DIR
+os.environ.setdefault("KL_ENV", "development")
+os.environ.setdefault("KL_SECRET_KEY", "benchmark")
+
+from src.backend.rate_limiting import RateLimiter  # noqa: E402
+
+LEVELS = (10, 1000, 10000, 100000)
+WINDOW = 3600
+
+
+class SlidingLog:
+    """Reference: the list-of-timestamps limiter this module used before GCRA"""
+
+    def __init__(self):
+        self.store = {}
+
+    def is_rate_limited(self, key, limit, window):
+        now = time.time()
+        self.store[key] = [ts for ts in self.store.get(key, []) if ts > now - window]
+        if len(self.store[key]) >= limit:
+            return True
+        self.store[key].append(now)
+        return False
+
+
+def per_check_us(func, checks):
+    started = time.perf_counter()
+    for _ in range(checks):
+        func()
+    return (time.perf_counter() - started) * 1e6 / checks
+
+
+def run_gcra(limiter, label, checks):
+    for level in LEVELS:
+        limit_type = f"bench{level}"
+        limiter.limits[limit_type] = {"limit": level, "window": WINDOW}
+        key = f"{label}:{time.time_ns()}"
+        for _ in range(level):
+            limiter.check(key, limit_type)
+        cost = per_check_us(lambda: limiter.check(key, limit_type), checks)
+        print(f"{label:<12} {level:>7} req/window: {cost:8.2f} us/check")
+
+    for scope in limiter.scopes.values():
+        scope["limit"] = 10 ** 9
+    limiter.limits["bench"] = {"limit": 10 ** 9, "window": WINDOW}
+    cost = per_check_us(lambda: limiter.check_request("bench", "10.0.0.1", 1), checks)
+    print(f"{label:<12} hierarchy of 4 limits: {cost:8.2f} us/check")
+
+
+def run_sliding_log(checks):
+    log = SlidingLog()
+    for level in LEVELS:
+        key = f"log{level}"
+        # Seed the window directly, filling it request by request is quadratic
+        log.store[key] = [time.time()] * level
+        cost = per_check_us(lambda: log.is_rate_limited(key, level, WINDOW), max(10, checks // level))
+        print(f"{'sliding log':<12} {level:>7} req/window: {cost:8.2f} us/check")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--checks", type=int, default=100000)
+    parser.add_argument("--redis-url", default="")
+    args = parser.parse_args()
+
+    run_gcra(RateLimiter(redis_url=""), "gcra memory", args.checks)
+    run_sliding_log(args.checks)
+
+    if args.redis_url:
+        limiter = RateLimiter(redis_url=args.redis_url)
+        limiter.redis_client.ping()
+        run_gcra(limiter, "gcra redis", max(1000, args.checks // 20))
+
+
+if __name__ == "__main__":
+    main()
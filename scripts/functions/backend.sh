@@ -37,9 +37,9 @@ pyrad==2.1
 bcrypt==4.0.1
 Jinja2==3.1.2
 requests==2.31.0
-cryptography==41.0.7
+cryptography==43.0.3
 xmltodict==0.13.0
-pyOpenSSL==23.2.0
+pyOpenSSL==24.2.1
 netaddr==0.8.0
 psutil==5.9.5
 gunicorn==21.2.0
@@ -31,7 +31,7 @@ install_dependencies_redhat() {
         dnf groupinstall -y "Development Tools"
         dnf install -y \
             python3 python3-virtualenv python3-pip python3-devel \
-            openvpn easy-rsa xmlstarlet unzip curl nginx openssl wget \
+            openvpn easy-rsa xmlstarlet unzip curl nginx openssl wget socat \
             postgresql postgresql-server postgresql-contrib \
             openssl-devel openvpn-devel libpq-devel postgresql-devel \
             policycoreutils-python-utils setroubleshoot rsyslog \
@@ -42,7 +42,7 @@ install_dependencies_redhat() {
         yum groupinstall -y "Development Tools"
         yum install -y \
             python3 python3-virtualenv python3-pip python3-devel \
-            openvpn easy-rsa xmlstarlet unzip curl nginx openssl wget \
+            openvpn easy-rsa xmlstarlet unzip curl nginx openssl wget socat \
             postgresql postgresql-server postgresql-contrib \
             openssl-devel openvpn-devel libpq-devel postgresql-devel \
             policycoreutils-python-utils setroubleshoot rsyslog \
@@ -59,7 +59,7 @@ install_dependencies_debian() {
     apt-get update
     apt-get install -y \
         python3 python3-venv python3-pip python3-dev \
-        openvpn easy-rsa xmlstarlet unzip curl nginx openssl wget \
+        openvpn easy-rsa xmlstarlet unzip curl nginx openssl wget socat \
         postgresql postgresql-contrib \
         libssl-dev libopenvpn-dev libpq-dev postgresql-server-dev-all \
         policycoreutils setools rsyslog \
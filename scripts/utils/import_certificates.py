@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""Import existing certificate PEM files into the certificates inventory table.
+
+Run once after upgrading: python3 scripts/utils/import_certificates.py [--workers N]
+The import is idempotent: certificates already in the table are skipped.
+"""
+import os
+import sys
+import time
+import argparse
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT))
+
+from cryptography import x509  # noqa: E402
+from src.backend.config import config  # noqa: E402
+from src.backend.models.certificate import CertificateModel  # noqa: E402
+from src.backend.services.certificate_service import CertificateService  # noqa: E402
+
+BATCH_SIZE = 1000
+
+
+def find_certificates():
+    """Yield (path, instance_name, cert_type) for every issued certificate file"""
+    server_crt = config.CERTS_DIR / "server.crt"
+    if server_crt.exists():
+        yield str(server_crt), None, "server"
+
+    clients_root = config.CERTS_DIR / "clients"
+    if not clients_root.exists():
+        return
+    for server_dir in clients_root.iterdir():
+        if server_dir.is_dir():
+            for cert_file in server_dir.glob("*.crt"):
+                yield str(cert_file), server_dir.name, "client"
+
+
+def parse_certificate(item):
+    """Parse one PEM file into an inventory row (runs in a worker process)"""
+    path, instance_name, cert_type = item
+    try:
+        cert = x509.load_pem_x509_certificate(Path(path).read_bytes())
+    except (OSError, ValueError) as e:
+        return None, f"{path}: {e}"
+    return CertificateService._inventory_row(cert, instance_name, cert_type, path), None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    files = list(find_certificates())
+    imported = failed = 0
+    batch = []
+
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        chunksize = max(1, len(files) // (args.workers * 8))
+        for row, error in executor.map(parse_certificate, files, chunksize=chunksize):
+            if error:
+                failed += 1
+                print(f"skipped {error}", file=sys.stderr)
+                continue
+            batch.append(row)
+            if len(batch) >= BATCH_SIZE:
+                imported += CertificateModel.record_batch(batch)
+                batch = []
+
+    if batch:
+        imported += CertificateModel.record_batch(batch)
+
+    elapsed = time.perf_counter() - started
+    print(f"Scanned {len(files)} files: {imported} imported, "
+          f"{len(files) - imported - failed} already known, {failed} unreadable in {elapsed:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -71,6 +71,11 @@ def _register_middleware(app):
     from .middleware.request_logging import log_requests
     from .middleware.security import security_headers
     from .middleware.cors import setup_cors
+    from werkzeug.middleware.proxy_fix import ProxyFix
+    
+    # Адрес клиента за nginx (иначе все запросы приходят с 127.0.0.1)
+    if config.PROXY_COUNT > 0:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=config.PROXY_COUNT)
     
     # Логирование запросов
     log_requests(app)
@@ -91,6 +96,8 @@ def _register_blueprints(app):
     from .routes.vpn import vpn_bp
     from .routes.certificates import certificates_bp
     from .routes.system import system_bp
+    from .routes.traffic import traffic_bp
+    from .routes.ocsp import ocsp_bp
     
     # API routes с префиксом /api
     blueprints = [
@@ -99,7 +106,9 @@ def _register_blueprints(app):
         (groups_bp, '/api'),
         (vpn_bp, '/api'),
         (certificates_bp, '/api'),
-        (system_bp, '/api')
+        (system_bp, '/api'),
+        (traffic_bp, '/api'),
+        (ocsp_bp, '/api')
     ]
     
     for blueprint, url_prefix in blueprints:
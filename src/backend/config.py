@@ -23,6 +23,29 @@ class Config:
         # Безопасность
         self.SECRET_KEY = os.getenv('KL_SECRET_KEY', '')
         self.SESSION_TIMEOUT = int(os.getenv('KL_SESSION_TIMEOUT', '3600'))
+        # Отметка активности сессии обновляется не чаще этого интервала (секунды)
+        self.SESSION_ACTIVITY_SLICE = int(os.getenv('KL_SESSION_ACTIVITY_SLICE', '60'))
+        
+        # Кеш проверенных API ключей и период пакетной записи last_used (секунды)
+        self.API_KEY_CACHE_TTL = int(os.getenv('KL_API_KEY_CACHE_TTL', '60'))
+        self.API_KEY_CACHE_SIZE = int(os.getenv('KL_API_KEY_CACHE_SIZE', '10000'))
+        self.API_KEY_LAST_USED_FLUSH = int(os.getenv('KL_API_KEY_LAST_USED_FLUSH', '60'))
+        
+        # Токены доступа (Bearer): срок жизни access token (секунды) и refresh token (дни)
+        self.ACCESS_TOKEN_TTL = int(os.getenv('KL_ACCESS_TOKEN_TTL', '900'))
+        self.REFRESH_TOKEN_DAYS = int(os.getenv('KL_REFRESH_TOKEN_DAYS', '30'))
+        
+        # Предельный срок кеша прав пользователя (секунды); изменения через API сбрасывают кеш сразу
+        self.PERMISSION_CACHE_TTL = int(os.getenv('KL_PERMISSION_CACHE_TTL', '300'))
+        self.PERMISSION_CACHE_SIZE = int(os.getenv('KL_PERMISSION_CACHE_SIZE', '10000'))
+        
+        # Блокировка входа: порог неудачных попыток, полураспад счетчика и длительность блокировки (секунды)
+        self.LOGIN_MAX_ATTEMPTS = int(os.getenv('KL_LOGIN_MAX_ATTEMPTS', '5'))
+        self.LOGIN_ATTEMPT_HALF_LIFE = int(os.getenv('KL_LOGIN_ATTEMPT_HALF_LIFE', '900'))
+        self.LOGIN_LOCKOUT_SECONDS = int(os.getenv('KL_LOGIN_LOCKOUT_SECONDS', '900'))
+        # Период пакетной записи счетчиков в БД (секунды) и предел очереди записи
+        self.LOGIN_ATTEMPTS_FLUSH = int(os.getenv('KL_LOGIN_ATTEMPTS_FLUSH', '10'))
+        self.LOGIN_TRACKER_SIZE = int(os.getenv('KL_LOGIN_TRACKER_SIZE', '100000'))
         
         # База данных
         self.DB_NAME = os.getenv('KL_DB_NAME', 'kurslight_db')
@@ -36,6 +59,42 @@ class Config:
         
         # SSL
         self.SSL_ENABLED = os.getenv('KL_SSL_ENABLED', 'true').lower() == 'true'
+        
+        # Ограничения подключений (group max_connections / instance max_clients)
+        self.CONNECTION_LIMITS_ENABLED = os.getenv('KL_CONNECTION_LIMITS', 'true').lower() == 'true'
+        self.CONNECTION_LIMITER_RECONCILE = int(os.getenv('KL_CONNECTION_LIMITER_RECONCILE', '60'))
+        self.CONNECTION_LIMITER_SOCKET_MODE = int(os.getenv('KL_CONNECTION_LIMITER_SOCKET_MODE', '660'), 8)
+        
+        # Алгоритм ключей новой PKI: rsa2048, rsa4096, ec-p256, ec-p384, ed25519
+        self.PKI_KEY_ALGORITHM = os.getenv('KL_PKI_KEY_ALGORITHM', 'rsa2048')
+        
+        # DH параметры новой RSA PKI (0 — только ECDHE) и число запасных наборов каждого размера
+        self.DH_PARAM_BITS = int(os.getenv('KL_DH_PARAM_BITS', '2048'))
+        self.DH_STORE_TARGET = int(os.getenv('KL_DH_STORE_TARGET', '1'))
+        
+        # Максимум клиентов в одном запросе пакетного выпуска сертификатов
+        self.CERT_BULK_MAX = int(os.getenv('KL_CERT_BULK_MAX', '10000'))
+        
+        # Срок действия CRL (перевыпускается в фоне по истечении половины срока)
+        self.CRL_VALIDITY_DAYS = int(os.getenv('KL_CRL_VALIDITY_DAYS', '30'))
+        
+        # С какого числа отозванных сертификатов crl_mode=auto переключается на каталог (crl-verify dir)
+        self.CRL_DIR_MODE_THRESHOLD = int(os.getenv('KL_CRL_DIR_MODE_THRESHOLD', '1000'))
+        
+        # Срок действия серверных и клиентских сертификатов и их автоматическое продление
+        self.CERT_VALIDITY_DAYS = int(os.getenv('KL_CERT_VALIDITY_DAYS', '3650'))
+        self.CERT_RENEWAL_ENABLED = os.getenv('KL_CERT_RENEWAL', 'true').lower() == 'true'
+        self.CERT_RENEW_BEFORE_DAYS = int(os.getenv('KL_CERT_RENEW_BEFORE_DAYS', '30'))
+        self.CERT_RENEWAL_BATCH = int(os.getenv('KL_CERT_RENEWAL_BATCH', '50'))
+        self.CERT_RENEWAL_RATE = int(os.getenv('KL_CERT_RENEWAL_RATE', '120'))  # сертификатов в минуту
+        
+        # Встроенный OCSP-ответчик: срок действия заранее подписанных ответов
+        self.OCSP_ENABLED = os.getenv('KL_OCSP_ENABLED', 'true').lower() == 'true'
+        self.OCSP_VALIDITY_HOURS = int(os.getenv('KL_OCSP_VALIDITY_HOURS', '24'))
+        
+        # Пул заранее сгенерированных ключей (0 — отключен)
+        self.KEY_POOL_SIZE = int(os.getenv('KL_KEY_POOL_SIZE', '50'))
+        self.KEY_POOL_REFILL_INTERVAL = int(os.getenv('KL_KEY_POOL_REFILL_INTERVAL', '30'))
     
     def _get_default_base_dir(self) -> str:
         """Определить базовую директорию по умолчанию"""
@@ -58,6 +117,7 @@ class Config:
         # Основные директории
         self.CONFIG_DIR = self.BASE_DIR / 'config'
         self.CA_DIR = self.BASE_DIR / 'ca'
+        self.CRL_DIR = self.CA_DIR / 'revoked'
         self.OPENVPN_DIR = self.BASE_DIR / 'openvpn'
         self.FRONTEND_DIR = self.BASE_DIR / 'frontend'
         self.SSL_DIR = self.BASE_DIR / 'ssl'
@@ -65,6 +125,7 @@ class Config:
         self.LOGS_DIR = self.BASE_DIR / 'logs'
         self.BACKUPS_DIR = self.BASE_DIR / 'backups'
         self.TEMP_DIR = self.BASE_DIR / 'temp'
+        self.RUN_DIR = self.BASE_DIR / 'run'
         
         # Файлы конфигурации
         self.CONFIG_FILE = self.CONFIG_DIR / 'config.xml'
@@ -78,6 +139,11 @@ class Config:
         # OpenVPN файлы
         self.OPENVPN_SERVERS_DIR = self.OPENVPN_DIR / 'servers'
         self.OPENVPN_SCRIPTS_DIR = self.OPENVPN_DIR / 'scripts'
+        
+        # Локальный сокет сервиса ограничения подключений
+        self.CONNECTION_LIMITER_SOCKET = Path(
+            os.getenv('KL_LIMITER_SOCKET', str(self.RUN_DIR / 'conn-limiter.sock'))
+        )
     
     def _setup_database(self):
         """Настройка конфигурации базы данных"""
@@ -100,11 +166,25 @@ class Config:
         """Настройка параметров безопасности"""
         self.ALLOWED_HOSTS = os.getenv('KL_ALLOWED_HOSTS', 'localhost,127.0.0.1').split(',')
         self.CORS_ORIGINS = os.getenv('KL_CORS_ORIGINS', 'http://localhost:3000').split(',')
+        # Число обратных прокси (nginx) перед приложением: адрес клиента берется из X-Forwarded-For; 0 — без прокси
+        self.PROXY_COUNT = int(os.getenv('KL_PROXY_COUNT', '1'))
         
         # Rate limiting
         self.RATE_LIMIT_ENABLED = os.getenv('KL_RATE_LIMIT', 'true').lower() == 'true'
         self.RATE_LIMIT_REQUESTS = int(os.getenv('KL_RATE_LIMIT_REQUESTS', '100'))
         self.RATE_LIMIT_WINDOW = int(os.getenv('KL_RATE_LIMIT_WINDOW', '900'))  # 15 минут
+        # Redis для общих лимитов (redis://host:6379/0); пусто — состояние в памяти процесса.
+        # Размер пула соединений и таймаут операций (миллисекунды)
+        self.REDIS_URL = os.getenv('KL_REDIS_URL', '')
+        self.REDIS_MAX_CONNECTIONS = int(os.getenv('KL_REDIS_MAX_CONNECTIONS', '16'))
+        self.REDIS_TIMEOUT_MS = int(os.getenv('KL_REDIS_TIMEOUT_MS', '200'))
+        # Слотов в общей для воркеров таблице счетчиков лимитов (24 байта на слот)
+        self.SHARED_COUNTER_SLOTS = int(os.getenv('KL_SHARED_COUNTER_SLOTS', '65536'))
+        
+        # Хеширование паролей (bcrypt): стоимость, потоки пула и предел очереди (сверх него — 503)
+        self.PASSWORD_HASH_ROUNDS = int(os.getenv('KL_PASSWORD_HASH_ROUNDS', '12'))
+        self.PASSWORD_HASH_WORKERS = int(os.getenv('KL_PASSWORD_HASH_WORKERS', str(os.cpu_count() or 1)))
+        self.PASSWORD_HASH_QUEUE_MAX = int(os.getenv('KL_PASSWORD_HASH_QUEUE_MAX', '32'))
     
     def validate(self):
         """Проверить обязательные настройки"""
@@ -145,7 +225,8 @@ class Config:
             self.CERTS_DIR,
             self.LOGS_DIR,
             self.BACKUPS_DIR,
-            self.TEMP_DIR
+            self.TEMP_DIR,
+            self.RUN_DIR
         ]
         
         for directory in directories:
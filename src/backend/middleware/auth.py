@@ -1,81 +1,144 @@
 from functools import wraps
 from flask import request, session, jsonify, g
+import time
 import logging
-from datetime import datetime, timedelta
+from datetime import datetime
+from ..services.api_key_service import api_key_service
+from ..services.token_service import token_service
+from ..services.permission_service import permission_service, Permission
+from .. import rate_limiting
+from ..config import config
 
 logger = logging.getLogger(__name__)
 
 def login_required(f):
-    """Декоратор для проверки аутентификации пользователя"""
+    """Декоратор для проверки аутентификации пользователя (сессия или Bearer токен)"""
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        # Проверить наличие user_id в сессии
-        if 'user_id' not in session:
-            logger.warning(f"Unauthorized access attempt to {request.endpoint} from {request.remote_addr}")
-            return jsonify({"error": "Authentication required"}), 401
-        
-        # Проверить срок действия сессии (опционально)
-        if not _is_session_valid():
-            session.clear()
-            logger.warning(f"Expired session for user {session.get('username', 'unknown')}")
-            return jsonify({"error": "Session expired"}), 401
-        
-        # Добавить информацию о пользователе в контекст запроса
-        g.user = {
-            'id': session['user_id'],
-            'username': session['username'],
-            'role': session['role'],
-            'full_name': session.get('full_name', '')
-        }
-        
-        # Обновить время последней активности
-        session['last_activity'] = datetime.now().isoformat()
+        error = _authenticate()
+        if error:
+            return error
         
         return f(*args, **kwargs)
     return decorated_function
 
 def admin_required(f):
-    """Декоратор для проверки прав администратора"""
+    """Декоратор для проверки прав администратора (сессия или Bearer токен)"""
     @wraps(f)
     def decorated_function(*args, **kwargs):
         # Сначала проверить аутентификацию
-        if 'user_id' not in session:
-            return jsonify({"error": "Authentication required"}), 401
+        error = _authenticate()
+        if error:
+            return error
         
-        # Затем проверить роль администратора
-        if session.get('role') != 'admin':
+        # Затем проверить право администратора
+        if not permission_service.has_permission(g.user, Permission.ADMIN):
             logger.warning(
-                f"Admin access denied for user {session.get('username', 'unknown')} "
+                f"Admin access denied for user {g.user['username']} "
                 f"to endpoint {request.endpoint}"
             )
             return jsonify({"error": "Admin access required"}), 403
         
-        # Добавить информацию о пользователе в контекст запроса
-        g.user = {
-            'id': session['user_id'],
-            'username': session['username'],
-            'role': session['role'],
-            'full_name': session.get('full_name', '')
-        }
-        
-        # Обновить время последней активности
-        session['last_activity'] = datetime.now().isoformat()
-        
         return f(*args, **kwargs)
     return decorated_function
 
-def _is_session_valid():
-    """Проверить валидность сессии (время жизни)"""
-    last_activity = session.get('last_activity')
-    if not last_activity:
-        return False
+def permission_required(permission):
+    """Декоратор для проверки права (одна битовая операция над маской из токена или кеша)"""
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            error = _authenticate()
+            if error:
+                return error
+            
+            if not permission_service.has_permission(g.user, permission):
+                logger.warning(
+                    f"Permission {permission.name} denied for user {g.user['username']} "
+                    f"to endpoint {request.endpoint}"
+                )
+                return jsonify({"error": "Permission denied", "permission": permission.name.lower()}), 403
+            
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
+
+def _authenticate():
+    """Заполнить g.user по Bearer токену или cookie-сессии. Возвращает ответ с ошибкой или None"""
+    authorization = request.headers.get('Authorization', '')
+    if authorization.startswith('Bearer '):
+        # Токен проверяется без обращения к БД и без cookie-сессии
+        claims = token_service.verify_access_token(authorization[7:])
+        if claims is None:
+            return jsonify({"error": "Invalid or expired token"}), 401, {'WWW-Authenticate': 'Bearer error="invalid_token"'}
+        
+        g.user = {
+            'id': int(claims['sub']),
+            'username': claims['name'],
+            'role': claims['role'],
+            'full_name': '',
+            'permissions': claims.get('perms')
+        }
+        return None
+    
+    # Проверить наличие user_id в сессии
+    if 'user_id' not in session:
+        logger.warning(f"Unauthorized access attempt to {request.endpoint} from {request.remote_addr}")
+        return jsonify({"error": "Authentication required"}), 401
     
+    # Проверить срок действия сессии
+    if not _is_session_valid():
+        return _expire_session()
+    
+    # Добавить информацию о пользователе в контекст запроса
+    g.user = {
+        'id': session['user_id'],
+        'username': session['username'],
+        'role': session['role'],
+        'full_name': session.get('full_name', '')
+    }
+    
+    _touch_session()
+    return None
+
+def start_session_activity():
+    """Отметить начало активности сессии (при входе)"""
+    session['last_activity'] = int(time.time())
+
+def _last_activity():
+    """Время последней активности (unix time) или None"""
+    last_activity = session.get('last_activity')
+    if isinstance(last_activity, (int, float)):
+        return last_activity
     try:
-        last_activity_time = datetime.fromisoformat(last_activity)
-        # Сессия действительна 1 час
-        return datetime.now() - last_activity_time < timedelta(hours=1)
+        # Сессии, созданные до перехода на unix time
+        return datetime.fromisoformat(last_activity).timestamp()
     except (ValueError, TypeError):
+        return None
+
+def _is_session_valid():
+    """Проверить валидность сессии (скользящий срок SESSION_TIMEOUT)"""
+    last_activity = _last_activity()
+    if last_activity is None:
         return False
+    return time.time() - last_activity < config.SESSION_TIMEOUT
+
+def _touch_session():
+    """Продлить сессию, только если отметка старше SESSION_ACTIVITY_SLICE.
+
+    Изменение сессии заставляет Flask заново сериализовать, подписать и
+    отправить cookie, поэтому частые запросы (опрос дашборда) в пределах
+    одного интервала сессию не трогают. Срок жизни от этого может
+    сократиться не больше чем на один интервал.
+    """
+    now = int(time.time())
+    if now - _last_activity() >= config.SESSION_ACTIVITY_SLICE:
+        session['last_activity'] = now
+
+def _expire_session():
+    username = session.get('username', 'unknown')
+    session.clear()
+    logger.warning(f"Expired session for user {username}")
+    return jsonify({"error": "Session expired"}), 401
 
 def api_key_required(f):
     """Декоратор для проверки API ключа (для внешних интеграций)"""
@@ -87,65 +150,23 @@ def api_key_required(f):
             logger.warning(f"API key missing for endpoint {request.endpoint}")
             return jsonify({"error": "API key required"}), 401
         
-        # TODO: Реализовать проверку API ключа в БД
-        # Временная заглушка
-        valid_keys = []  # Будет загружаться из БД или конфига
-        
-        if api_key not in valid_keys:
+        principal = api_key_service.authenticate(api_key)
+        if principal is None:
             logger.warning(f"Invalid API key used for endpoint {request.endpoint}")
             return jsonify({"error": "Invalid API key"}), 401
         
+        g.user = {
+            'id': principal['id'],
+            'username': principal['username'],
+            'role': principal['role'],
+            'full_name': principal['full_name'],
+            'api_key_id': principal['key_id']
+        }
+        
         return f(*args, **kwargs)
     return decorated_function
 
 def rate_limit(max_requests=100, window_minutes=15):
-    """Декоратор для ограничения частоты запросов"""
-    def decorator(f):
-        request_counts = {}
-        
-        @wraps(f)
-        def decorated_function(*args, **kwargs):
-            # Использовать IP адрес как идентификатор
-            client_id = request.remote_addr
-            current_window = datetime.now().strftime('%Y%m%d%H%M')
-            window_key = f"{client_id}:{current_window}"
-            
-            # Инициализировать счетчик для окна
-            if window_key not in request_counts:
-                request_counts[window_key] = 0
-            
-            # Проверить лимит
-            if request_counts[window_key] >= max_requests:
-                logger.warning(f"Rate limit exceeded for {client_id}")
-                return jsonify({
-                    "error": "Rate limit exceeded",
-                    "message": f"Maximum {max_requests} requests per {window_minutes} minutes"
-                }), 429
-            
-            # Увеличить счетчик
-            request_counts[window_key] += 1
-            
-            # Очистить старые окна (простая реализация)
-            _clean_old_windows(request_counts, window_minutes)
-            
-            return f(*args, **kwargs)
-        return decorated_function
-    return decorator
-
-def _clean_old_windows(request_counts, window_minutes):
-    """Очистить старые окна запросов"""
-    current_time = datetime.now()
-    keys_to_remove = []
-    
-    for key in request_counts.keys():
-        try:
-            client_id, window_str = key.split(':')
-            window_time = datetime.strptime(window_str, '%Y%m%d%H%M')
-            
-            if current_time - window_time > timedelta(minutes=window_minutes):
-                keys_to_remove.append(key)
-        except (ValueError, AttributeError):
-            keys_to_remove.append(key)
-    
-    for key in keys_to_remove:
-        del request_counts[key]
\ No newline at end of file
+    """Декоратор для ограничения частоты запросов: лимит эндпоинта проверяется
+    вместе с общим лимитом, лимитами IP и пользователя (rate_limiting)"""
+    return rate_limiting.rate_limit(limit=max_requests, window=window_minutes * 60)
\ No newline at end of file
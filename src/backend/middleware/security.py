@@ -1,5 +1,7 @@
-from flask import request, jsonify
+from flask import request, jsonify, make_response
+import time
 import logging
+from ..utils.shared_counters import shared_counters
 
 logger = logging.getLogger(__name__)
 
@@ -46,8 +48,7 @@ def validate_json_content_type(f):
     return decorated_function
 
 def prevent_brute_force(max_attempts=5, lockout_minutes=30):
-    """Защита от brute force атак"""
-    failed_attempts = {}
+    """Защита от brute force атак (счетчики общие для всех воркеров хоста)"""
     
     def decorator(f):
         from functools import wraps
@@ -55,55 +56,31 @@ def prevent_brute_force(max_attempts=5, lockout_minutes=30):
         @wraps(f)
         def decorated_function(*args, **kwargs):
             client_ip = request.remote_addr
-            current_time = time.time()
+            counter_key = f"brute-force:{client_ip}"
             
-            # Очистить старые попытки
-            _clean_old_attempts(failed_attempts, lockout_minutes)
-            
-            # Проверить блокировку
-            if client_ip in failed_attempts:
-                attempts, first_attempt = failed_attempts[client_ip]
-                if attempts >= max_attempts:
-                    lockout_time = first_attempt + (lockout_minutes * 60)
-                    if current_time < lockout_time:
-                        remaining = int(lockout_time - current_time) // 60
-                        logger.warning(f"Brute force protection triggered for IP {client_ip}")
-                        return jsonify({
-                            "error": "Too many failed attempts",
-                            "message": f"Account temporarily locked. Try again in {remaining} minutes."
-                        }), 429
-                    else:
-                        # Сбросить счетчик после истечения времени блокировки
-                        del failed_attempts[client_ip]
+            # Проверить блокировку; счетчик истекает через lockout_minutes после первой попытки
+            attempts, lockout_time = shared_counters.get(counter_key)
+            if attempts is not None and attempts >= max_attempts:
+                remaining = int(lockout_time - time.time()) // 60
+                logger.warning(f"Brute force protection triggered for IP {client_ip}")
+                return jsonify({
+                    "error": "Too many failed attempts",
+                    "message": f"Account temporarily locked. Try again in {remaining} minutes."
+                }), 429
             
-            # Выполнить оригинальную функцию
-            response = f(*args, **kwargs)
+            # Выполнить оригинальную функцию (ответ вида (body, status) приводится к Response)
+            response = make_response(f(*args, **kwargs))
             
             # Если аутентификация неуспешна, увеличить счетчик
             if (hasattr(response, 'status_code') and 
                 response.status_code in [401, 403] and 
                 request.endpoint in ['auth.login']):
                 
-                if client_ip not in failed_attempts:
-                    failed_attempts[client_ip] = [1, current_time]
-                else:
-                    failed_attempts[client_ip][0] += 1
+                attempts, _ = shared_counters.incr(counter_key, lockout_minutes * 60)
                 
                 logger.warning(f"Failed authentication attempt from {client_ip}. "
-                              f"Attempts: {failed_attempts[client_ip][0]}")
+                              f"Attempts: {int(attempts)}")
             
             return response
         return decorated_function
-    return decorator
-
-def _clean_old_attempts(failed_attempts, lockout_minutes):
-    """Очистить старые записи о неудачных попытках"""
-    current_time = time.time()
-    expired_ips = []
-    
-    for ip, (attempts, first_attempt) in failed_attempts.items():
-        if current_time - first_attempt > (lockout_minutes * 60 * 2):  # Удалить после двойного времени блокировки
-            expired_ips.append(ip)
-    
-    for ip in expired_ips:
-        del failed_attempts[ip]
\ No newline at end of file
+    return decorator
\ No newline at end of file
@@ -1,5 +1,12 @@
 from .base_model import BaseModel
 from .vpn import VPNModel
 from .user import UserModel
+from .traffic import TrafficModel
+from .session import SessionModel
+from .client import ClientModel
+from .revocation import RevocationModel
+from .certificate import CertificateModel
+from .api_key import ApiKeyModel
+from .refresh_token import RefreshTokenModel
 
-__all__ = ['BaseModel', 'VPNModel', 'UserModel']
\ No newline at end of file
+__all__ = ['BaseModel', 'VPNModel', 'UserModel', 'TrafficModel', 'SessionModel', 'ClientModel', 'RevocationModel', 'CertificateModel', 'ApiKeyModel', 'RefreshTokenModel']
\ No newline at end of file
@@ -0,0 +1,81 @@
+from .base_model import BaseModel
+from ..utils.database import get_db_connection
+from psycopg2.extras import execute_values
+import logging
+
+logger = logging.getLogger(__name__)
+
+class ApiKeyModel(BaseModel):
+    """Модель API ключей (хранится только SHA-256 ключа и открытый префикс)"""
+
+    FIELDS = ['id', 'user_id', 'key_prefix', 'description', 'is_active', 'created_at', 'last_used', 'expires_at']
+
+    @classmethod
+    def create(cls, user_id, key_prefix, key_hash, description='', expires_at=None):
+        """Сохранить новый ключ"""
+        query = '''
+            INSERT INTO api_keys (user_id, key_prefix, key_hash, description, expires_at)
+            VALUES (%s, %s, %s, %s, %s) RETURNING id
+        '''
+        result = cls._execute_query(query, (user_id, key_prefix, key_hash, description, expires_at), fetch=True)
+        return result[0][0] if result else None
+
+    @classmethod
+    def get_by_prefix(cls, key_prefix):
+        """Активные ключи с префиксом вместе с владельцем (по индексу key_prefix).
+
+        Возвращает строки (id, key_hash, expires_at, user_id, username, role, full_name).
+        """
+        query = '''
+            SELECT k.id, k.key_hash, k.expires_at, u.id, u.username, u.role, u.full_name
+            FROM api_keys k
+            JOIN users u ON u.id = k.user_id
+            WHERE k.key_prefix = %s AND k.is_active AND u.is_active
+        '''
+        return cls._execute_query(query, (key_prefix,), fetch=True) or []
+
+    @classmethod
+    def get_by_user(cls, user_id):
+        """Ключи пользователя (без хешей)"""
+        query = f'''
+            SELECT {', '.join(cls.FIELDS)}
+            FROM api_keys
+            WHERE user_id = %s
+            ORDER BY created_at DESC
+        '''
+        result = cls._execute_query(query, (user_id,), fetch=True)
+        return [cls._dict_to_model(row, cls.FIELDS) for row in result] if result else []
+
+    @classmethod
+    def revoke(cls, key_id, user_id=None):
+        """Отозвать ключ (только свой, если указан user_id)"""
+        query = "UPDATE api_keys SET is_active = FALSE WHERE id = %s AND is_active"
+        params = [key_id]
+        if user_id is not None:
+            query += " AND user_id = %s"
+            params.append(user_id)
+        return cls._execute_query(query, params) > 0
+
+    @classmethod
+    def touch_batch(cls, rows):
+        """Записать last_used пакетом. rows — последовательность (key_id, last_used)"""
+        if not rows:
+            return 0
+
+        conn = get_db_connection()
+        cur = conn.cursor()
+        try:
+            execute_values(cur, '''
+                UPDATE api_keys AS k SET last_used = d.last_used
+                FROM (VALUES %s) AS d(id, last_used)
+                WHERE k.id = d.id
+            ''', rows, template='(%s, %s::timestamp)', page_size=1000)
+            conn.commit()
+            return cur.rowcount
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"API key last_used update failed: {str(e)}")
+            raise
+        finally:
+            cur.close()
+            conn.close()
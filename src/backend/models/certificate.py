@@ -0,0 +1,201 @@
+from .base_model import BaseModel
+from ..utils.database import get_db_connection
+from psycopg2.extras import execute_values
+import logging
+
+logger = logging.getLogger(__name__)
+
+class CertificateModel(BaseModel):
+    """Модель реестра выпущенных сертификатов"""
+
+    FIELDS = [
+        'id', 'serial', 'common_name', 'user_id', 'vpn_instance_id', 'cert_type',
+        'not_after', 'fingerprint', 'status', 'path', 'created_at'
+    ]
+
+    @classmethod
+    def record_batch(cls, rows):
+        """Записать выпущенные сертификаты одной транзакцией.
+
+        rows — последовательность (serial, common_name, instance_name, cert_type,
+        not_after, fingerprint, path). Инстанс и владелец определяются по имени
+        инстанса и клиенту в vpn_clients. Предыдущие активные сертификаты того же
+        клиента помечаются как superseded. Возвращает количество новых записей.
+        """
+        if not rows:
+            return 0
+
+        conn = get_db_connection()
+        cur = conn.cursor()
+        try:
+            template = '(%s, %s, %s, %s, %s::timestamp, %s, %s)'
+            execute_values(cur, '''
+                UPDATE certificates AS c SET status = 'superseded'
+                FROM (VALUES %s) AS d(serial, common_name, instance_name, cert_type, not_after, fingerprint, path)
+                WHERE c.status = 'active'
+                  AND c.common_name = d.common_name
+                  AND c.cert_type = d.cert_type
+                  AND c.serial <> d.serial
+                  AND c.vpn_instance_id IS NOT DISTINCT FROM (SELECT id FROM vpn_instances WHERE name = d.instance_name)
+            ''', rows, template=template, page_size=1000)
+
+            inserted = execute_values(cur, '''
+                INSERT INTO certificates (
+                    serial, common_name, user_id, vpn_instance_id, cert_type, not_after, fingerprint, path
+                )
+                SELECT d.serial, d.common_name,
+                       (SELECT vc.user_id FROM vpn_clients vc
+                        WHERE vc.vpn_instance_id = i.id AND vc.client_name = d.common_name AND vc.is_active
+                        ORDER BY vc.id DESC LIMIT 1),
+                       i.id, d.cert_type, d.not_after, d.fingerprint, d.path
+                FROM (VALUES %s) AS d(serial, common_name, instance_name, cert_type, not_after, fingerprint, path)
+                LEFT JOIN vpn_instances i ON i.name = d.instance_name
+                ON CONFLICT (serial) DO NOTHING
+                RETURNING serial
+            ''', rows, template=template, page_size=1000, fetch=True)
+
+            conn.commit()
+            return len(inserted)
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"Certificate inventory write failed: {str(e)}")
+            raise
+        finally:
+            cur.close()
+            conn.close()
+
+    @classmethod
+    def reserve_serials(cls, candidates):
+        """Зарезервировать серийные номера одной вставкой.
+
+        Возвращает множество серийных номеров, которые удалось занять: номер
+        не занят ни резервом, ни уже выпущенным (в том числе импортированным)
+        сертификатом. Уникальный индекс гарантирует, что два воркера не получат
+        один номер.
+        """
+        if not candidates:
+            return set()
+
+        conn = get_db_connection()
+        cur = conn.cursor()
+        try:
+            reserved = execute_values(cur, '''
+                INSERT INTO certificate_serials (serial)
+                SELECT d.serial FROM (VALUES %s) AS d(serial)
+                WHERE NOT EXISTS (SELECT 1 FROM certificates c WHERE c.serial = d.serial)
+                ON CONFLICT (serial) DO NOTHING
+                RETURNING serial
+            ''', [(serial,) for serial in candidates], page_size=1000, fetch=True)
+            conn.commit()
+            return {row[0] for row in reserved}
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cur.close()
+            conn.close()
+
+    @classmethod
+    def get_expiring(cls, before, vpn_instance_id=None, limit=1000):
+        """Активные сертификаты, срок которых истекает до before (по индексу not_after)"""
+        query = f'''
+            SELECT {', '.join(cls.FIELDS)}
+            FROM certificates
+            WHERE status = 'active' AND not_after < %s
+        '''
+        params = [before]
+        if vpn_instance_id is not None:
+            query += " AND vpn_instance_id = %s"
+            params.append(vpn_instance_id)
+        query += " ORDER BY not_after LIMIT %s"
+        params.append(limit)
+
+        result = cls._execute_query(query, params, fetch=True)
+        return [cls._dict_to_model(row, cls.FIELDS) for row in result] if result else []
+
+    @classmethod
+    def get_by_user(cls, user_id, status='active'):
+        """Сертификаты пользователя"""
+        query = f'''
+            SELECT {', '.join(cls.FIELDS)}
+            FROM certificates
+            WHERE user_id = %s AND status = %s
+            ORDER BY not_after
+        '''
+        result = cls._execute_query(query, (user_id, status), fetch=True)
+        return [cls._dict_to_model(row, cls.FIELDS) for row in result] if result else []
+
+    @classmethod
+    def get_renewal_candidates(cls):
+        """Активные сертификаты для планировщика продления (serial, common_name, instance_name, cert_type, not_after)"""
+        query = '''
+            SELECT c.serial, c.common_name, i.name, c.cert_type, c.not_after
+            FROM certificates c
+            LEFT JOIN vpn_instances i ON i.id = c.vpn_instance_id
+            WHERE c.status = 'active'
+        '''
+        return cls._execute_query(query, fetch=True) or []
+
+    @classmethod
+    def get_ocsp_entries(cls):
+        """Сертификаты, по которым отвечает OCSP (serial, status, revoked_at, reason)"""
+        query = '''
+            SELECT c.serial, c.status, r.revoked_at, r.reason
+            FROM certificates c
+            LEFT JOIN revoked_certificates r ON r.serial = c.serial
+            WHERE c.status IN ('active', 'superseded', 'revoked')
+              AND c.not_after > CURRENT_TIMESTAMP
+        '''
+        return cls._execute_query(query, fetch=True) or []
+
+    @classmethod
+    def get_revocable(cls, vpn_instance_id, common_names):
+        """Непросроченные клиентские сертификаты инстанса по CN: [(serial, common_name)].
+
+        Кроме действующего — и замененные продлением или перевыпуском
+        (superseded), и уже отозванные, чтобы отзыв был повторяемым.
+        """
+        if not common_names:
+            return []
+        query = '''
+            SELECT serial, common_name FROM certificates
+            WHERE vpn_instance_id = %s AND cert_type = 'client'
+              AND common_name = ANY(%s)
+              AND status IN ('active', 'superseded', 'revoked')
+              AND not_after > CURRENT_TIMESTAMP
+        '''
+        return cls._execute_query(query, (vpn_instance_id, list(common_names)), fetch=True) or []
+
+    @classmethod
+    def filter_active(cls, serials):
+        """Оставить серийные номера, сертификаты которых все еще активны"""
+        if not serials:
+            return set()
+        query = "SELECT serial FROM certificates WHERE status = 'active' AND serial = ANY(%s)"
+        return {row[0] for row in cls._execute_query(query, (list(serials),), fetch=True) or []}
+
+    @classmethod
+    def count_active(cls, user_id):
+        """Количество активных сертификатов пользователя"""
+        query = "SELECT COUNT(*) FROM certificates WHERE user_id = %s AND status = 'active'"
+        result = cls._execute_query(query, (user_id,), fetch=True)
+        return result[0][0] if result else 0
+
+    @classmethod
+    def count_active_by_user(cls):
+        """Количество активных сертификатов всех пользователей {user_id: count}"""
+        query = '''
+            SELECT user_id, COUNT(*) FROM certificates
+            WHERE status = 'active' AND user_id IS NOT NULL
+            GROUP BY user_id
+        '''
+        return dict(cls._execute_query(query, fetch=True) or [])
+
+    @classmethod
+    def expire_due(cls):
+        """Пометить истекшие сертификаты. Возвращает количество"""
+        query = '''
+            UPDATE certificates SET status = 'expired'
+            WHERE status = 'active' AND not_after < CURRENT_TIMESTAMP
+        '''
+        return cls._execute_query(query)
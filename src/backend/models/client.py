@@ -0,0 +1,51 @@
+from .base_model import BaseModel
+from ..utils.database import get_db_connection
+from psycopg2.extras import execute_values
+import logging
+
+logger = logging.getLogger(__name__)
+
+class ClientModel(BaseModel):
+    """Модель для работы с VPN клиентами"""
+
+    @classmethod
+    def upsert_certificates_batch(cls, vpn_instance_id, rows):
+        """Записать сертификаты нескольких клиентов инстанса в одной транзакции.
+
+        rows — последовательность (client_name, certificate_data). Активные
+        клиенты с таким именем получают новый сертификат, для остальных
+        создаются записи. Возвращает (updated, inserted).
+        """
+        if not rows:
+            return 0, 0
+
+        conn = get_db_connection()
+        cur = conn.cursor()
+        try:
+            values = [(vpn_instance_id, name, cert) for name, cert in rows]
+            updated = execute_values(cur, '''
+                UPDATE vpn_clients AS c SET certificate_data = d.certificate_data
+                FROM (VALUES %s) AS d(vpn_instance_id, client_name, certificate_data)
+                WHERE c.vpn_instance_id = d.vpn_instance_id
+                  AND c.client_name = d.client_name
+                  AND c.is_active
+                RETURNING c.client_name
+            ''', values, page_size=1000, fetch=True)
+            updated_names = {row[0] for row in updated}
+
+            missing = [row for row in values if row[1] not in updated_names]
+            if missing:
+                execute_values(cur, '''
+                    INSERT INTO vpn_clients (vpn_instance_id, client_name, certificate_data)
+                    VALUES %s
+                ''', missing, page_size=1000)
+
+            conn.commit()
+            return len(updated_names), len(missing)
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"Batch client certificate write failed: {str(e)}")
+            raise
+        finally:
+            cur.close()
+            conn.close()
@@ -0,0 +1,51 @@
+from .base_model import BaseModel
+from datetime import datetime
+import logging
+
+logger = logging.getLogger(__name__)
+
+class RefreshTokenModel(BaseModel):
+    """Модель refresh token (хранится только SHA-256 токена).
+
+    expires_at хранится в UTC без зоны, поэтому сравнивается с
+    datetime.utcnow(), а не с CURRENT_TIMESTAMP (часовой пояс сессии БД).
+    """
+
+    @classmethod
+    def create(cls, user_id, token_hash, expires_at):
+        query = '''
+            INSERT INTO refresh_tokens (user_id, token_hash, expires_at)
+            VALUES (%s, %s, %s) RETURNING id
+        '''
+        result = cls._execute_query(query, (user_id, token_hash, expires_at), fetch=True)
+        return result[0][0] if result else None
+
+    @classmethod
+    def consume(cls, token_hash):
+        """Отозвать действующий токен и вернуть его user_id (одним запросом — повторное использование невозможно)"""
+        query = '''
+            UPDATE refresh_tokens SET revoked_at = CURRENT_TIMESTAMP
+            WHERE token_hash = %s AND revoked_at IS NULL AND expires_at > %s
+            RETURNING user_id
+        '''
+        result = cls._execute_query(query, (token_hash, datetime.utcnow()), fetch=True)
+        return result[0][0] if result else None
+
+    @classmethod
+    def revoke(cls, token_hash):
+        query = "UPDATE refresh_tokens SET revoked_at = CURRENT_TIMESTAMP WHERE token_hash = %s AND revoked_at IS NULL"
+        return cls._execute_query(query, (token_hash,)) > 0
+
+    @classmethod
+    def revoke_by_user(cls, user_id):
+        query = "UPDATE refresh_tokens SET revoked_at = CURRENT_TIMESTAMP WHERE user_id = %s AND revoked_at IS NULL"
+        return cls._execute_query(query, (user_id,))
+
+    @classmethod
+    def delete_expired(cls):
+        """Удалить истекшие и отозванные токены. Возвращает количество"""
+        query = '''
+            DELETE FROM refresh_tokens
+            WHERE expires_at < %s OR revoked_at < CURRENT_TIMESTAMP - INTERVAL '1 day'
+        '''
+        return cls._execute_query(query, (datetime.utcnow(),))
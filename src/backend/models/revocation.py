@@ -0,0 +1,79 @@
+from .base_model import BaseModel
+from ..utils.database import get_db_connection
+from psycopg2.extras import execute_values
+import logging
+
+logger = logging.getLogger(__name__)
+
+class RevocationModel(BaseModel):
+    """Модель хранилища отозванных сертификатов"""
+
+    @classmethod
+    def revoke_batch(cls, vpn_instance_id, rows):
+        """Отозвать пакет сертификатов одной транзакцией.
+
+        rows — последовательность (serial, client_name, reason). Клиенты
+        инстанса помечаются неактивными. Возвращает множество серийных
+        номеров, которые не были отозваны ранее.
+        """
+        if not rows:
+            return set()
+
+        conn = get_db_connection()
+        cur = conn.cursor()
+        try:
+            values = [(serial, client_name, vpn_instance_id, reason) for serial, client_name, reason in rows]
+            inserted = execute_values(cur, '''
+                INSERT INTO revoked_certificates (serial, client_name, vpn_instance_id, reason)
+                VALUES %s
+                ON CONFLICT (serial) DO NOTHING
+                RETURNING serial
+            ''', values, page_size=1000, fetch=True)
+
+            execute_values(cur, '''
+                UPDATE vpn_clients AS c SET
+                    is_active = FALSE,
+                    revoked_at = CURRENT_TIMESTAMP
+                FROM (VALUES %s) AS d(vpn_instance_id, client_name)
+                WHERE c.vpn_instance_id = d.vpn_instance_id
+                  AND c.client_name = d.client_name
+                  AND c.is_active
+            ''', [(vpn_instance_id, client_name) for _, client_name, _ in rows], page_size=1000)
+
+            execute_values(cur, '''
+                UPDATE certificates AS c SET status = 'revoked'
+                FROM (VALUES %s) AS d(serial)
+                WHERE c.serial = d.serial
+            ''', [(serial,) for serial, _, _ in rows], page_size=1000)
+
+            conn.commit()
+            return {row[0] for row in inserted}
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"Batch revocation failed: {str(e)}")
+            raise
+        finally:
+            cur.close()
+            conn.close()
+
+    @classmethod
+    def get_all(cls):
+        """Получить все отозванные сертификаты (serial, revoked_at, reason)"""
+        query = "SELECT serial, revoked_at, reason FROM revoked_certificates ORDER BY id"
+        return cls._execute_query(query, fetch=True) or []
+
+    @classmethod
+    def prune_expired(cls):
+        """Удалить из хранилища отзывы сертификатов, срок которых истек"""
+        query = '''
+            DELETE FROM revoked_certificates r
+            USING certificates c
+            WHERE c.serial = r.serial AND c.not_after < CURRENT_TIMESTAMP
+        '''
+        return cls._execute_query(query)
+
+    @classmethod
+    def count(cls):
+        """Количество отозванных сертификатов"""
+        result = cls._execute_query("SELECT COUNT(*) FROM revoked_certificates", fetch=True)
+        return result[0][0] if result else 0
@@ -0,0 +1,51 @@
+from .base_model import BaseModel
+import logging
+
+logger = logging.getLogger(__name__)
+
+class SessionModel(BaseModel):
+    """Модель для работы с VPN сессиями и лимитами подключений"""
+
+    @classmethod
+    def get_open_sessions(cls):
+        """Получить открытые сессии (session_id, instance_name, client_name, client_ip)"""
+        query = '''
+            SELECT s.id, i.name, s.client_name, s.client_ip
+            FROM vpn_sessions s
+            JOIN vpn_instances i ON i.id = s.vpn_instance_id
+            WHERE s.disconnected_at IS NULL
+        '''
+        return cls._execute_query(query, fetch=True) or []
+
+    @classmethod
+    def get_instance_limits(cls):
+        """Получить max_clients всех инстансов (name, max_clients)"""
+        query = "SELECT name, max_clients FROM vpn_instances"
+        return cls._execute_query(query, fetch=True) or []
+
+    @classmethod
+    def get_client_owners(cls):
+        """Получить владельцев активных клиентов (instance_name, client_name, user_id)"""
+        query = '''
+            SELECT i.name, c.client_name, c.user_id
+            FROM vpn_clients c
+            JOIN vpn_instances i ON i.id = c.vpn_instance_id
+            WHERE c.is_active AND c.user_id IS NOT NULL
+        '''
+        return cls._execute_query(query, fetch=True) or []
+
+    @classmethod
+    def get_user_connection_limits(cls):
+        """Получить лимит одновременных подключений пользователей (user_id, limit).
+
+        Берется самый строгий положительный max_connections среди групп пользователя,
+        0 означает отсутствие ограничения.
+        """
+        query = '''
+            SELECT ug.user_id, MIN(g.max_connections)
+            FROM user_groups ug
+            JOIN groups g ON g.id = ug.group_id
+            WHERE g.max_connections > 0
+            GROUP BY ug.user_id
+        '''
+        return cls._execute_query(query, fetch=True) or []
@@ -0,0 +1,153 @@
+from .base_model import BaseModel
+from ..utils.database import get_db_connection
+from psycopg2.extras import execute_values
+from datetime import datetime
+import logging
+
+logger = logging.getLogger(__name__)
+
+class TrafficModel(BaseModel):
+    """Модель для работы с агрегатами трафика VPN сессий"""
+
+    SCOPES = ('user', 'group', 'instance')
+    TABLES = {
+        'hour': 'traffic_hourly',
+        'day': 'traffic_daily'
+    }
+
+    @classmethod
+    def rollup_chunk(cls, chunk_size=1000):
+        """Учесть в агрегатах порцию новых и закрытых сессий.
+
+        Обрабатываются только сессии, у которых изменились счетчики байт
+        или которые закрылись с момента прошлого прохода. Учтенные значения
+        сохраняются в самой сессии, поэтому обработку можно прервать и
+        продолжить с того же места. Возвращает количество обработанных сессий.
+        """
+        conn = get_db_connection()
+        cur = conn.cursor()
+
+        try:
+            # SKIP LOCKED позволяет нескольким воркерам делить работу без блокировок
+            cur.execute('''
+                SELECT s.id, s.vpn_instance_id, s.disconnected_at,
+                       s.bytes_received, s.bytes_sent,
+                       s.bytes_received - s.rolled_bytes_received,
+                       s.bytes_sent - s.rolled_bytes_sent,
+                       (SELECT c.user_id FROM vpn_clients c
+                        WHERE c.client_name = s.client_name
+                          AND c.vpn_instance_id = s.vpn_instance_id
+                        ORDER BY c.id DESC LIMIT 1)
+                FROM vpn_sessions s
+                WHERE NOT s.rollup_done
+                  AND (s.disconnected_at IS NOT NULL
+                       OR s.bytes_received <> s.rolled_bytes_received
+                       OR s.bytes_sent <> s.rolled_bytes_sent)
+                ORDER BY s.id
+                LIMIT %s
+                FOR UPDATE OF s SKIP LOCKED
+            ''', (chunk_size,))
+            rows = cur.fetchall()
+
+            if not rows:
+                conn.commit()
+                return 0
+
+            # Членство в группах для всех пользователей порции одним запросом
+            user_ids = list({row[7] for row in rows if row[7] is not None})
+            groups_by_user = {}
+            if user_ids:
+                cur.execute(
+                    "SELECT user_id, group_id FROM user_groups WHERE user_id = ANY(%s)",
+                    (user_ids,)
+                )
+                for user_id, group_id in cur.fetchall():
+                    groups_by_user.setdefault(user_id, []).append(group_id)
+
+            hourly, daily = cls._aggregate(rows, groups_by_user, datetime.now())
+
+            for table, buckets in ((cls.TABLES['hour'], hourly), (cls.TABLES['day'], daily)):
+                # Сортировка задает единый порядок блокировок строк между воркерами
+                values = [key + tuple(totals) for key, totals in sorted(buckets.items())]
+                execute_values(cur, f'''
+                    INSERT INTO {table} (scope, scope_id, bucket_start, bytes_received, bytes_sent, sessions)
+                    VALUES %s
+                    ON CONFLICT (scope, scope_id, bucket_start) DO UPDATE SET
+                        bytes_received = {table}.bytes_received + EXCLUDED.bytes_received,
+                        bytes_sent = {table}.bytes_sent + EXCLUDED.bytes_sent,
+                        sessions = {table}.sessions + EXCLUDED.sessions
+                ''', values)
+
+            # Запомнить учтенные значения (прочитанные, а не текущие — чтобы не потерять
+            # байты, пришедшие во время прохода)
+            execute_values(cur, '''
+                UPDATE vpn_sessions AS s SET
+                    rolled_bytes_received = v.rx,
+                    rolled_bytes_sent = v.tx,
+                    rollup_done = v.done
+                FROM (VALUES %s) AS v(id, rx, tx, done)
+                WHERE s.id = v.id
+            ''', [(row[0], row[3], row[4], row[2] is not None) for row in rows])
+
+            conn.commit()
+            return len(rows)
+
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"Traffic rollup failed: {str(e)}")
+            raise
+        finally:
+            cur.close()
+            conn.close()
+
+    @staticmethod
+    def _aggregate(rows, groups_by_user, now):
+        """Сгруппировать приращения трафика по (scope, scope_id, bucket_start)"""
+        hourly = {}
+        daily = {}
+
+        for session_id, instance_id, disconnected_at, _, _, delta_rx, delta_tx, user_id in rows:
+            closed = disconnected_at is not None
+            # Трафик закрытой сессии относится ко времени закрытия,
+            # приращения живой сессии — ко времени наблюдения
+            moment = disconnected_at if closed else now
+            hour = moment.replace(minute=0, second=0, microsecond=0)
+            day = hour.replace(hour=0)
+
+            targets = [('instance', instance_id)]
+            if user_id is not None:
+                targets.append(('user', user_id))
+                targets.extend(('group', group_id) for group_id in groups_by_user.get(user_id, []))
+
+            for scope, scope_id in targets:
+                if scope_id is None:
+                    continue
+                for buckets, bucket_start in ((hourly, hour), (daily, day)):
+                    totals = buckets.setdefault((scope, scope_id, bucket_start), [0, 0, 0])
+                    totals[0] += delta_rx
+                    totals[1] += delta_tx
+                    totals[2] += 1 if closed else 0
+
+        return hourly, daily
+
+    @classmethod
+    def count_pending(cls):
+        """Количество сессий, еще не полностью учтенных в агрегатах"""
+        query = "SELECT COUNT(*) FROM vpn_sessions WHERE NOT rollup_done"
+        result = cls._execute_query(query, fetch=True)
+        return result[0][0] if result else 0
+
+    @classmethod
+    def get_series(cls, granularity, scope, scope_id, start, end):
+        """Получить ряд агрегатов за период [start, end)"""
+        table = cls.TABLES[granularity]
+        query = f'''
+            SELECT bucket_start, bytes_received, bytes_sent, sessions
+            FROM {table}
+            WHERE scope = %s AND scope_id = %s
+              AND bucket_start >= %s AND bucket_start < %s
+            ORDER BY bucket_start
+        '''
+        result = cls._execute_query(query, (scope, scope_id, start, end), fetch=True)
+        return [cls._dict_to_model(row, ['bucket_start', 'bytes_received', 'bytes_sent', 'sessions'])
+                for row in result or []]
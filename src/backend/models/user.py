@@ -1,4 +1,8 @@
 from .base_model import BaseModel
+from ..utils.database import get_db_connection
+from psycopg2.extras import execute_values
+from ..utils.password_hasher import password_hasher
+from datetime import datetime
 import logging
 
 logger = logging.getLogger(__name__)
@@ -9,13 +13,15 @@ class UserModel(BaseModel):
     FIELDS = ['id', 'username', 'password_hash', 'email', 'full_name', 'role', 'is_active', 'created_at', 'last_login']
     
     @classmethod
-    def create(cls, username, password_hash, email='', full_name='', role='user'):
-        """Создать нового пользователя"""
+    def create(cls, username, password_hash=None, email='', full_name='', role='user', password=None, is_active=True):
+        """Создать нового пользователя (password хешируется в пуле хеширования)"""
+        if password is not None:
+            password_hash = password_hasher.hash(password)
         query = '''
-            INSERT INTO users (username, password_hash, email, full_name, role) 
-            VALUES (%s, %s, %s, %s, %s) RETURNING id
+            INSERT INTO users (username, password_hash, email, full_name, role, is_active) 
+            VALUES (%s, %s, %s, %s, %s, %s) RETURNING id
         '''
-        result = cls._execute_query(query, (username, password_hash, email, full_name, role), fetch=True)
+        result = cls._execute_query(query, (username, password_hash, email, full_name, role, is_active), fetch=True)
         return result[0][0] if result else None
     
     @classmethod
@@ -47,6 +53,93 @@ class UserModel(BaseModel):
         query = "UPDATE users SET password_hash = %s WHERE id = %s"
         return cls._execute_query(query, (new_password_hash, user_id)) > 0
     
+    @classmethod
+    def change_password(cls, user_id, new_password):
+        """Захешировать и сохранить новый пароль"""
+        return cls.update_password(user_id, password_hasher.hash(new_password))
+    
+    @classmethod
+    def verify_password(cls, username, password):
+        """Проверить пароль пользователя. Возвращает (верен, пользователь).
+
+        Хеш с устаревшими параметрами прозрачно перехешируется после успешной
+        проверки. HashingBusyError пробрасывается вызывающему (ответ 503).
+        """
+        user = cls.get_by_username(username)
+        if not user or not user.get('is_active', True):
+            password_hasher.verify_dummy(password)
+            return False, None
+        
+        is_valid, needs_rehash = password_hasher.verify(password, user['password_hash'])
+        if not is_valid:
+            return False, None
+        
+        if needs_rehash:
+            try:
+                cls.update_password(user['id'], password_hasher.hash(password))
+                logger.info(f"Password hash upgraded for user: {username}")
+            except Exception as e:
+                logger.warning(f"Password rehash failed for user {username}: {str(e)}")
+        
+        return True, user
+    
+    @classmethod
+    def get_permission_inputs(cls, user_id):
+        """Роль и объединенная маска прав всех групп пользователя (role, group_mask) или None"""
+        query = '''
+            SELECT u.role, COALESCE(BIT_OR(g.permissions), 0)
+            FROM users u
+            LEFT JOIN user_groups ug ON ug.user_id = u.id
+            LEFT JOIN groups g ON g.id = ug.group_id
+            WHERE u.id = %s AND u.is_active
+            GROUP BY u.role
+        '''
+        result = cls._execute_query(query, (user_id,), fetch=True)
+        return (result[0][0], int(result[0][1])) if result else None
+    
+    @classmethod
+    def save_login_attempts(cls, rows):
+        """Записать счетчики входа пакетом.
+
+        rows — последовательность (username, attempts, locked_until, last_login, success).
+        Успешный вход снимает блокировку, иначе сохраняется более поздняя из
+        блокировок в БД и в пакете (ее мог поставить другой воркер).
+        """
+        if not rows:
+            return 0
+
+        conn = get_db_connection()
+        cur = conn.cursor()
+        try:
+            execute_values(cur, '''
+                UPDATE users AS u SET
+                    failed_login_attempts = d.attempts,
+                    locked_until = CASE WHEN d.success THEN NULL
+                                        ELSE GREATEST(u.locked_until, d.locked_until) END,
+                    last_login = COALESCE(d.last_login, u.last_login)
+                FROM (VALUES %s) AS d(username, attempts, locked_until, last_login, success)
+                WHERE u.username = d.username
+            ''', rows, template='(%s, %s, %s::timestamp, %s::timestamp, %s)', page_size=1000)
+            conn.commit()
+            return cur.rowcount
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"Login attempts update failed: {str(e)}")
+            raise
+        finally:
+            cur.close()
+            conn.close()
+    
+    @classmethod
+    def get_login_lockouts(cls):
+        """Действующие блокировки входа: [(username, failed_login_attempts, locked_until)]"""
+        # locked_until — UTC без зоны; CURRENT_TIMESTAMP дал бы время в часовом поясе сессии
+        query = '''
+            SELECT username, failed_login_attempts, locked_until
+            FROM users WHERE locked_until > %s
+        '''
+        return cls._execute_query(query, (datetime.utcnow(),), fetch=True) or []
+    
     @classmethod
     def deactivate(cls, user_id):
         """Деактивировать пользователя"""
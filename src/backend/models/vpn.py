@@ -3,7 +3,9 @@ import subprocess
 import os
 import logging
 import json
+from psycopg2.extras import execute_values
 from ..config import config
+from ..utils.database import get_db_connection
 
 logger = logging.getLogger(__name__)
 
@@ -13,7 +15,8 @@ class VPNModel(BaseModel):
     FIELDS = [
         'id', 'name', 'description', 'config', 'status', 'created_at', 
         'port', 'protocol', 'subnet', 'active_clients', 'max_clients',
-        'interface_type', 'topology', 'tls_auth', 'crl_enabled', 
+        'bytes_received', 'bytes_sent',
+        'interface_type', 'topology', 'tls_auth', 'crl_enabled', 'crl_mode',
         'verify_client', 'ocsp_enabled', 'cert_depth', 'renegotiate_time',
         'auth_token_lifetime', 'redirect_gateway', 'dns_servers', 
         'ntp_servers', 'push_options', 'openvpn_options', 'local_network',
@@ -23,10 +26,13 @@ class VPNModel(BaseModel):
         'explicit_exit_notify'
     ]
     
+    # Режимы crl-verify: auto — по размеру CRL, file — crl.pem, dir — файл на серийный номер
+    CRL_MODES = ('auto', 'file', 'dir')
+    
     @classmethod
     def create(cls, name, description='', port=1194, protocol='udp', 
                subnet='10.8.0.0/24', max_clients=100, interface_type='tun',
-               topology='subnet', tls_auth=False, crl_enabled=False,
+               topology='subnet', tls_auth=False, crl_enabled=False, crl_mode='auto',
                verify_client=True, ocsp_enabled=False, cert_depth=1,
                renegotiate_time=3600, auth_token_lifetime=3600,
                redirect_gateway=False, dns_servers='', ntp_servers='',
@@ -36,23 +42,24 @@ class VPNModel(BaseModel):
                float=False, passtos=False, persist_remote_ip=False,
                route_noexec=False, route_nopull=False, explicit_exit_notify=True):
         """Создать новый VPN инстанс"""
+        cls._validate_crl_mode(crl_mode)
         query = '''
             INSERT INTO vpn_instances (
                 name, description, port, protocol, subnet, max_clients,
-                interface_type, topology, tls_auth, crl_enabled, verify_client,
+                interface_type, topology, tls_auth, crl_enabled, crl_mode, verify_client,
                 ocsp_enabled, cert_depth, renegotiate_time, auth_token_lifetime,
                 redirect_gateway, dns_servers, ntp_servers, push_options,
                 openvpn_options, local_network, verify_remote_cert, strict_user_cn,
                 remote_random, client_to_client, block_ipv6, duplicate_cn, float,
                 passtos, persist_remote_ip, route_noexec, route_nopull, explicit_exit_notify
             ) 
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
             RETURNING id
         '''
         
         params = (
             name, description, port, protocol, subnet, max_clients,
-            interface_type, topology, tls_auth, crl_enabled, verify_client,
+            interface_type, topology, tls_auth, crl_enabled, crl_mode, verify_client,
             ocsp_enabled, cert_depth, renegotiate_time, auth_token_lifetime,
             redirect_gateway, dns_servers, ntp_servers, push_options,
             openvpn_options, local_network, verify_remote_cert, strict_user_cn,
@@ -136,6 +143,8 @@ class VPNModel(BaseModel):
         """Обновить настройки VPN инстанса"""
         if not settings:
             return False
+        if 'crl_mode' in settings:
+            cls._validate_crl_mode(settings['crl_mode'])
             
         set_clause = ', '.join([f"{key} = %s" for key in settings.keys()])
         query = f"UPDATE vpn_instances SET {set_clause}, updated_at = CURRENT_TIMESTAMP WHERE id = %s"
@@ -143,12 +152,54 @@ class VPNModel(BaseModel):
         
         return cls._execute_query(query, params) > 0
     
+    @classmethod
+    def _validate_crl_mode(cls, crl_mode):
+        if crl_mode not in cls.CRL_MODES:
+            raise ValueError(f"Invalid crl_mode: {crl_mode} (expected one of {', '.join(cls.CRL_MODES)})")
+    
     @classmethod
     def update_client_count(cls, instance_name, client_count):
         """Обновить количество активных клиентов"""
         query = "UPDATE vpn_instances SET active_clients = %s, updated_at = CURRENT_TIMESTAMP WHERE name = %s"
         return cls._execute_query(query, (client_count, instance_name)) > 0
     
+    @classmethod
+    def get_stats_snapshot(cls):
+        """Получить текущие счетчики всех инстансов (id, name, clients, rx, tx)"""
+        query = "SELECT id, name, active_clients, bytes_received, bytes_sent FROM vpn_instances"
+        return cls._execute_query(query, fetch=True) or []
+    
+    @classmethod
+    def update_stats_batch(cls, rows):
+        """Обновить счетчики нескольких инстансов одним запросом.
+        
+        rows — последовательность (id, active_clients, bytes_received, bytes_sent)
+        """
+        if not rows:
+            return 0
+        
+        conn = get_db_connection()
+        cur = conn.cursor()
+        try:
+            execute_values(cur, '''
+                UPDATE vpn_instances AS v SET
+                    active_clients = d.active_clients,
+                    bytes_received = d.bytes_received,
+                    bytes_sent = d.bytes_sent,
+                    updated_at = CURRENT_TIMESTAMP
+                FROM (VALUES %s) AS d(id, active_clients, bytes_received, bytes_sent)
+                WHERE v.id = d.id
+            ''', sorted(rows), page_size=1000)
+            conn.commit()
+            return cur.rowcount
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"Batch stats update failed: {str(e)}")
+            raise
+        finally:
+            cur.close()
+            conn.close()
+    
     @classmethod
     def delete(cls, instance_id):
         """Удалить VPN инстанс"""
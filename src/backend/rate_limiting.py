@@ -1,138 +1,291 @@
 import time
+import math
 from functools import wraps
-from flask import request, jsonify
-from collections import defaultdict
+from collections import namedtuple
+from flask import request, jsonify, make_response, g
 import redis
 import logging
+from .utils.shared_counters import shared_counters
+from .config import config
 
 logger = logging.getLogger(__name__)
 
+RateLimitResult = namedtuple('RateLimitResult', ['allowed', 'limit', 'remaining', 'reset_after', 'retry_after', 'scope'])
+
+# GCRA over several limits in one atomic step. State is a single number per
+# key: the theoretical arrival time (TAT) in microseconds of Redis server
+# time, so all workers and hosts share one clock. ARGV holds interval and
+# period per key. The request is counted in every limit only if all of them
+# allow it. Returns {allowed, TAT - now for each key}.
+GCRA_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000000 + tonumber(t[2])
+local allowed = 1
+local tats = {}
+for i = 1, #KEYS do
+    local tat = tonumber(redis.call('GET', KEYS[i]) or now)
+    if tat < now then
+        tat = now
+    end
+    tats[i] = tat
+    if tat + tonumber(ARGV[2 * i - 1]) - now > tonumber(ARGV[2 * i]) then
+        allowed = 0
+    end
+end
+local result = {allowed}
+for i = 1, #KEYS do
+    local tat = tats[i]
+    if allowed == 1 then
+        tat = tat + tonumber(ARGV[2 * i - 1])
+        redis.call('SET', KEYS[i], string.format('%d', tat), 'PX', math.ceil((tat - now) / 1000))
+    end
+    result[i + 1] = tat - now
+end
+return result
+"""
+
+
+class MemoryStore:
+    """GCRA state in the counter table shared by all workers on the host: key -> TAT"""
+
+    def __init__(self, table=shared_counters):
+        self.table = table
+
+    def update(self, limits):
+        """Apply one request to [(key, interval, period)]; return (allowed, [TAT - now in seconds])"""
+        return self.table.gcra_many([(f"rate_limit:{key}", interval, period) for key, interval, period in limits])
+
+    def peek(self, key):
+        tat, _ = self.table.get(f"rate_limit:{key}")
+        return max(tat - time.time(), 0.0) if tat else 0.0
+
+
 class RateLimiter:
-    def __init__(self):
-        # In production, use Redis. For development, use memory.
-        try:
-            self.redis_client = redis.Redis(host='localhost', port=6379, db=0)
-            self.use_redis = True
-        except:
-            self.use_redis = False
-            self.memory_store = defaultdict(list)
-        
+    """Generic cell rate algorithm (GCRA) limiter, process-wide singleton.
+
+    A limit of N requests per window W lets one request through every W/N
+    seconds with a burst of up to N. Each key keeps one timestamp, so the
+    cost of a check does not depend on the request rate. With
+    KL_REDIS_URL set, the state is in Redis (one pooled client, one Lua
+    script call per check); otherwise, and while Redis is unreachable, it
+    is kept in the shared memory table, exact across workers on one host.
+
+    A request is checked against a hierarchy of limits at once: global,
+    per IP, per user and per endpoint class. All of them are evaluated in
+    one store round trip, the request passes only if every limit allows
+    it, and the tightest limit is reported back.
+    """
+
+    # After a Redis error, checks use memory for this many seconds
+    REDIS_RETRY_INTERVAL = 30
+
+    def __init__(self, redis_url=None):
+        # Endpoint classes, counted per user (or per IP before login)
         self.limits = {
-            "auth": {"limit": 5, "window": 300},      # 5 attempts per 5 minutes
-            "api": {"limit": 100, "window": 900},     # 100 requests per 15 minutes  
+            "auth": {"limit": 5, "window": 300},      # 5 failed attempts per 5 minutes
+            "api": {"limit": 100, "window": 900},     # 100 requests per 15 minutes
             "vpn_operations": {"limit": 10, "window": 60},  # 10 operations per minute
             "cert_operations": {"limit": 5, "window": 60},  # 5 operations per minute
         }
-    
+        # Limits every rate limited request counts against, widest first; limit 0 disables a scope
+        self.scopes = {
+            "global": {"limit": 6000, "window": 60},  # 6000 requests per minute in total
+            "ip": {"limit": 600, "window": 60},       # 600 requests per minute per address
+            "user": {"limit": 300, "window": 60},     # 300 requests per minute per user
+        }
+        self.memory_store = MemoryStore()
+        self.redis_client = None
+        self._script = None
+        self._redis_down_until = 0.0
+
+        redis_url = config.REDIS_URL if redis_url is None else redis_url
+        if redis_url:
+            timeout = config.REDIS_TIMEOUT_MS / 1000
+            pool = redis.ConnectionPool.from_url(
+                redis_url, max_connections=config.REDIS_MAX_CONNECTIONS,
+                socket_timeout=timeout, socket_connect_timeout=timeout
+            )
+            self.redis_client = redis.Redis(connection_pool=pool)
+            # EVALSHA, the script is loaded once per Redis server
+            self._script = self.redis_client.register_script(GCRA_SCRIPT)
+
+    @property
+    def use_redis(self):
+        return self.redis_client is not None and time.monotonic() >= self._redis_down_until
+
+    def check(self, key: str, limit_type: str) -> RateLimitResult:
+        """Count one request against a single endpoint class limit"""
+        return self.check_limits([(limit_type, f"{limit_type}:{key}", self.limits[limit_type])])
+
+    def check_request(self, limit_type: str, ip: str, user_id=None, subject=None, count_class=True) -> RateLimitResult:
+        """Count one request against the whole hierarchy: global, IP, user and endpoint class.
+
+        subject replaces the key the endpoint class is counted for (by default
+        the user, or the IP before login). With count_class=False the class
+        limit is only checked; record_failure() counts it afterwards.
+        """
+        checks = [
+            ("global", "global", self.scopes["global"]),
+            ("ip", f"ip:{ip}", self.scopes["ip"]),
+        ]
+        if user_id is not None:
+            checks.append(("user", f"user:{user_id}", self.scopes["user"]))
+        class_key = f"{limit_type}:{self._subject(ip, user_id, subject)}"
+        if count_class:
+            checks.append((limit_type, class_key, self.limits[limit_type]))
+            return self.check_limits(checks)
+
+        # A request the class already denies is not counted anywhere
+        class_result = self._peek_result(class_key, limit_type)
+        if not class_result.allowed:
+            return class_result
+        result = self.check_limits(checks)
+        return class_result if self._tighter(class_result, result) else result
+
+    def record_failure(self, limit_type: str, ip: str, user_id=None, subject=None) -> RateLimitResult:
+        """Count a failed request against an endpoint class checked with count_class=False"""
+        return self.check(self._subject(ip, user_id, subject), limit_type)
+
+    def check_limits(self, checks) -> RateLimitResult:
+        """Evaluate [(scope, key, {"limit", "window"})] in one pass and return the tightest result.
+
+        Denied requests are not counted in any limit. When denied, the result
+        is the limit that frees up last; otherwise the one with the fewest
+        requests left.
+        """
+        checks = [check for check in checks if check[2]["limit"] > 0]
+        if not checks:
+            return RateLimitResult(True, 0, 0, 0.0, 0.0, None)
+        limits = [
+            (key, limit_config["window"] / limit_config["limit"], limit_config["window"])
+            for _, key, limit_config in checks
+        ]
+
+        if self.use_redis:
+            try:
+                reply = self._script(
+                    keys=[f"rate_limit:{key}" for key, _, _ in limits],
+                    args=[int(value * 1e6) for _, interval, period in limits for value in (interval, period)]
+                )
+                allowed, used = bool(reply[0]), [value / 1e6 for value in reply[1:]]
+            except redis.RedisError as e:
+                logger.error(f"Redis rate limiting error, using memory for {self.REDIS_RETRY_INTERVAL}s: {e}")
+                self._redis_down_until = time.monotonic() + self.REDIS_RETRY_INTERVAL
+                allowed, used = self.memory_store.update(limits)
+        else:
+            allowed, used = self.memory_store.update(limits)
+
+        tightest = None
+        for (scope, _, limit_config), (_, interval, period), scope_used in zip(checks, limits, used):
+            # When the request is denied, only the limits that were exhausted denied it
+            scope_allowed = allowed or scope_used + interval <= period
+            result = self._result(scope_allowed, scope_used, limit_config["limit"], interval, period, scope)
+            if tightest is None or self._tighter(result, tightest):
+                tightest = result
+        return tightest
+
     def is_rate_limited(self, key: str, limit_type: str) -> bool:
         """Check if request should be rate limited"""
         if limit_type not in self.limits:
             return False
-        
-        limit_config = self.limits[limit_type]
-        current_time = time.time()
-        
-        if self.use_redis:
-            return self._redis_check(key, limit_config, current_time)
-        else:
-            return self._memory_check(key, limit_config, current_time)
-    
-    def _redis_check(self, key: str, limit_config: dict, current_time: float) -> bool:
-        """Redis-based rate limiting"""
-        try:
-            redis_key = f"rate_limit:{key}"
-            
-            # Remove old timestamps
-            self.redis_client.zremrangebyscore(redis_key, 0, current_time - limit_config["window"])
-            
-            # Count recent requests
-            request_count = self.redis_client.zcard(redis_key)
-            
-            if request_count >= limit_config["limit"]:
-                return True
-            
-            # Add current request
-            self.redis_client.zadd(redis_key, {str(current_time): current_time})
-            self.redis_client.expire(redis_key, limit_config["window"])
-            
-            return False
-            
-        except Exception as e:
-            logger.error(f"Redis rate limiting error: {e}")
-            return False
-    
-    def _memory_check(self, key: str, limit_config: dict, current_time: float) -> bool:
-        """Memory-based rate limiting"""
-        window_start = current_time - limit_config["window"]
-        
-        # Remove old timestamps
-        self.memory_store[key] = [
-            ts for ts in self.memory_store[key] 
-            if ts > window_start
-        ]
-        
-        if len(self.memory_store[key]) >= limit_config["limit"]:
-            return True
-        
-        # Add current request
-        self.memory_store[key].append(current_time)
-        return False
-    
+        return not self.check(key, limit_type).allowed
+
     def get_remaining_requests(self, key: str, limit_type: str) -> int:
-        """Get number of remaining requests"""
+        """Get number of remaining requests without counting one"""
         if limit_type not in self.limits:
             return 0
-        
+        return self._peek_result(f"{limit_type}:{key}", limit_type).remaining
+
+    def _peek_result(self, key, limit_type) -> RateLimitResult:
+        """State of an endpoint class limit without counting a request"""
         limit_config = self.limits[limit_type]
-        current_time = time.time()
-        
+        interval = limit_config["window"] / limit_config["limit"]
+
+        used = None
         if self.use_redis:
-            redis_key = f"rate_limit:{key}"
-            self.redis_client.zremrangebyscore(redis_key, 0, current_time - limit_config["window"])
-            request_count = self.redis_client.zcard(redis_key)
-        else:
-            window_start = current_time - limit_config["window"]
-            request_count = len([
-                ts for ts in self.memory_store[key] 
-                if ts > window_start
-            ])
-        
-        return max(0, limit_config["limit"] - request_count)
-
-def rate_limit(limit_type: str):
-    """Decorator for rate limiting API endpoints"""
+            try:
+                # The key expires exactly at TAT, so its TTL is TAT - now
+                used = max(self.redis_client.pttl(f"rate_limit:{key}"), 0) / 1000
+            except redis.RedisError as e:
+                logger.error(f"Redis rate limiting error: {e}")
+        if used is None:
+            used = self.memory_store.peek(key)
+        allowed = used + interval <= limit_config["window"]
+        return self._result(allowed, used, limit_config["limit"], interval, limit_config["window"], limit_type)
+
+    @staticmethod
+    def _subject(ip, user_id, subject):
+        if subject is not None:
+            return subject
+        return f"user:{user_id}" if user_id is not None else f"ip:{ip}"
+
+    @staticmethod
+    def _tighter(result, other):
+        if result.allowed != other.allowed:
+            return not result.allowed
+        if not result.allowed:
+            return result.retry_after > other.retry_after
+        return result.remaining < other.remaining
+
+    @staticmethod
+    def _result(allowed, used, limit, interval, period, scope):
+        # used = TAT - now: the time until the bucket is full again. Wall-clock
+        # floats and Redis microseconds are off by well under 10 us
+        remaining = max(0, min(limit, int((period - used + 1e-5) / interval)))
+        retry_after = 0.0 if allowed else used + interval - period
+        return RateLimitResult(allowed, limit, remaining, used, retry_after, scope)
+
+
+def rate_limit(limit_type: str = None, limit: int = None, window: int = None, key=None, failures_only=False):
+    """Decorator for rate limiting API endpoints.
+
+    limit_type names an endpoint class from RateLimiter.limits. With limit
+    and window instead, the endpoint gets its own class with that limit.
+    key() returns the subject the class is counted for (default: the user,
+    or the IP before login). With failures_only, only 401 and 403
+    responses count against the class; the other scopes count every request.
+    """
     def decorator(f):
+        name = limit_type or f"endpoint:{f.__module__}.{f.__qualname__}"
+        if limit is not None:
+            rate_limiter.limits[name] = {"limit": limit, "window": window}
+
         @wraps(f)
         def decorated_function(*args, **kwargs):
-            # Create rate limit key
-            if hasattr(request, 'user_id'):
-                key = f"{limit_type}:{request.user_id}"
-            else:
-                key = f"{limit_type}:{request.remote_addr}"
-            
-            limiter = RateLimiter()
-            
-            if limiter.is_rate_limited(key, limit_type):
-                remaining = limiter.get_remaining_requests(key, limit_type)
+            if not config.RATE_LIMIT_ENABLED:
+                return f(*args, **kwargs)
+
+            user = getattr(g, 'user', None)
+            user_id = user['id'] if user else None
+            subject = key() if key else None
+            result = rate_limiter.check_request(
+                name, request.remote_addr, user_id, subject, count_class=not failures_only
+            )
+            headers = {
+                'X-RateLimit-Limit': str(result.limit),
+                'X-RateLimit-Remaining': str(result.remaining),
+                'X-RateLimit-Reset': str(int(time.time() + math.ceil(result.reset_after)))
+            }
+
+            if not result.allowed:
+                retry_after = max(1, math.ceil(result.retry_after))
+                headers['Retry-After'] = str(retry_after)
+                logger.warning(f"Rate limit exceeded ({result.scope}) for {request.remote_addr} on {request.endpoint}")
                 return jsonify({
                     "error": "Rate limit exceeded",
-                    "message": f"Too many requests. Try again later.",
-                    "retry_after": 60,
-                    "remaining": remaining
-                }), 429
-            
+                    "message": "Too many requests. Try again later.",
+                    "retry_after": retry_after,
+                    "remaining": 0
+                }), 429, headers
+
             # Add rate limit headers
-            response = f(*args, **kwargs)
-            
-            if hasattr(response, 'headers'):
-                remaining = limiter.get_remaining_requests(key, limit_type)
-                response.headers['X-RateLimit-Limit'] = str(limiter.limits[limit_type]["limit"])
-                response.headers['X-RateLimit-Remaining'] = str(remaining)
-                response.headers['X-RateLimit-Reset'] = str(int(time.time() + limiter.limits[limit_type]["window"]))
-            
+            response = make_response(f(*args, **kwargs))
+            if failures_only and response.status_code in (401, 403):
+                rate_limiter.record_failure(name, request.remote_addr, user_id, subject)
+            response.headers.update(headers)
             return response
         return decorated_function
     return decorator
 
 # Global rate limiter instance
-rate_limiter = RateLimiter()
\ No newline at end of file
+rate_limiter = RateLimiter()
@@ -1,12 +1,26 @@
-from flask import Blueprint, request, session, jsonify
+from flask import Blueprint, request, session, jsonify, g
 from ..services.auth_service import AuthService
-from ..middleware.auth import login_required
+from ..services.api_key_service import api_key_service
+from ..services.token_service import token_service
+from ..models.api_key import ApiKeyModel
+from ..middleware.auth import login_required, start_session_activity
+from ..rate_limiting import rate_limit
+from ..services.permission_service import permission_service, Permission
+from ..utils.password_hasher import HashingBusyError
 from ..utils.logging import logger
 
 auth_bp = Blueprint('auth', __name__)
 auth_service = AuthService()
 
+def _login_subject():
+    """Ключ класса auth: имя пользователя и адрес клиента"""
+    data = request.get_json(silent=True) or {}
+    username = data.get('username', '')
+    username = username.strip() if isinstance(username, str) else ''
+    return f"login:{username}:ip:{request.remote_addr}"
+
 @auth_bp.route('/api/auth/login', methods=['POST'])
+@rate_limit('auth', key=_login_subject, failures_only=True)
 def login():
     """Аутентификация пользователя"""
     try:
@@ -29,6 +43,7 @@ def login():
         session['username'] = user_data['username']
         session['role'] = user_data['role']
         session['full_name'] = user_data.get('full_name', '')
+        start_session_activity()
         
         logger.info(f"User logged in successfully: {username}")
         return jsonify({
@@ -36,10 +51,72 @@ def login():
             "user": user_data
         })
         
+    except HashingBusyError:
+        logger.warning("Login rejected: password hashing queue is full")
+        return jsonify({"error": "Service busy, try again later"}), 503, {'Retry-After': '1'}
     except Exception as e:
         logger.error(f"Login endpoint error: {str(e)}")
         return jsonify({"error": "Internal server error"}), 500
 
+@auth_bp.route('/api/auth/token', methods=['POST'])
+@rate_limit('auth', key=_login_subject, failures_only=True)
+def issue_token():
+    """Выдать access и refresh token по логину и паролю (для скриптов и API клиентов)"""
+    try:
+        data = request.get_json(silent=True) or {}
+        username = data.get('username', '').strip()
+        password = data.get('password', '')
+        
+        if not username or not password:
+            return jsonify({"error": "Username and password are required"}), 400
+        
+        user_data, error = auth_service.login(username, password)
+        
+        if error:
+            logger.warning(f"Failed token request for user: {username}")
+            return jsonify({"error": error}), 401
+        
+        return jsonify(token_service.issue_tokens(user_data))
+        
+    except HashingBusyError:
+        return jsonify({"error": "Service busy, try again later"}), 503, {'Retry-After': '1'}
+    except Exception as e:
+        logger.error(f"Token endpoint error: {str(e)}")
+        return jsonify({"error": "Internal server error"}), 500
+
+@auth_bp.route('/api/auth/token/refresh', methods=['POST'])
+@rate_limit('auth', failures_only=True)
+def refresh_token():
+    """Обменять refresh token на новую пару токенов (старый refresh token отзывается)"""
+    try:
+        data = request.get_json(silent=True) or {}
+        
+        tokens = token_service.refresh(data.get('refresh_token', ''))
+        
+        if tokens is None:
+            return jsonify({"error": "Invalid or expired refresh token"}), 401
+        
+        return jsonify(tokens)
+        
+    except Exception as e:
+        logger.error(f"Token refresh endpoint error: {str(e)}")
+        return jsonify({"error": "Internal server error"}), 500
+
+@auth_bp.route('/api/auth/token/revoke', methods=['POST'])
+def revoke_token():
+    """Отозвать refresh token (выход для API клиентов)"""
+    try:
+        data = request.get_json(silent=True) or {}
+        
+        token_service.revoke(data.get('refresh_token', ''))
+        
+        # Ответ не раскрывает, существовал ли токен (RFC 7009)
+        return jsonify({"message": "Token revoked"})
+        
+    except Exception as e:
+        logger.error(f"Token revoke endpoint error: {str(e)}")
+        return jsonify({"error": "Internal server error"}), 500
+
 @auth_bp.route('/api/auth/logout', methods=['POST'])
 @login_required
 def logout():
@@ -62,10 +139,10 @@ def get_current_user():
     try:
         user_data = {
             "user": {
-                "id": session['user_id'],
-                "username": session['username'],
-                "role": session['role'],
-                "full_name": session.get('full_name', '')
+                "id": g.user['id'],
+                "username": g.user['username'],
+                "role": g.user['role'],
+                "full_name": g.user['full_name']
             }
         }
         return jsonify(user_data)
@@ -87,17 +164,72 @@ def change_password():
             return jsonify({"error": "Current and new password are required"}), 400
         
         success, message = auth_service.change_password(
-            session['user_id'], current_password, new_password
+            g.user['id'], current_password, new_password
         )
         
         if success:
-            logger.info(f"Password changed for user: {session['username']}")
+            # Refresh token, выданные со старым паролем, больше не действуют
+            token_service.revoke_user(g.user['id'])
+            logger.info(f"Password changed for user: {g.user['username']}")
             return jsonify({"message": message})
         else:
             return jsonify({"error": message}), 400
             
+    except HashingBusyError:
+        return jsonify({"error": "Service busy, try again later"}), 503, {'Retry-After': '1'}
+    except Exception as e:
+        logger.error(f"Change password endpoint error for user {g.user['username']}: {str(e)}")
+        return jsonify({"error": "Internal server error"}), 500
+
+@auth_bp.route('/api/auth/api-keys', methods=['GET'])
+@login_required
+def list_api_keys():
+    """API ключи текущего пользователя (без самих ключей)"""
+    try:
+        return jsonify({"api_keys": ApiKeyModel.get_by_user(g.user['id'])})
+        
+    except Exception as e:
+        logger.error(f"List API keys endpoint error: {str(e)}")
+        return jsonify({"error": "Internal server error"}), 500
+
+@auth_bp.route('/api/auth/api-keys', methods=['POST'])
+@login_required
+def create_api_key():
+    """Создать API ключ. Ключ возвращается только в этом ответе"""
+    try:
+        data = request.get_json(silent=True) or {}
+        expires_days = data.get('expires_days')
+        
+        key_id, key = api_key_service.create_key(
+            g.user['id'],
+            description=data.get('description', ''),
+            expires_days=int(expires_days) if expires_days else None
+        )
+        
+        logger.info(f"API key {key_id} created for user: {g.user['username']}")
+        return jsonify({"id": key_id, "api_key": key}), 201
+        
+    except (TypeError, ValueError):
+        return jsonify({"error": "expires_days must be an integer"}), 400
+    except Exception as e:
+        logger.error(f"Create API key endpoint error: {str(e)}")
+        return jsonify({"error": "Internal server error"}), 500
+
+@auth_bp.route('/api/auth/api-keys/<int:key_id>', methods=['DELETE'])
+@login_required
+def revoke_api_key(key_id):
+    """Отозвать API ключ (администратор может отозвать любой)"""
+    try:
+        owner_id = None if permission_service.has_permission(g.user, Permission.ADMIN) else g.user['id']
+        
+        if not api_key_service.revoke_key(key_id, owner_id):
+            return jsonify({"error": "API key not found"}), 404
+        
+        logger.info(f"API key {key_id} revoked by user: {g.user['username']}")
+        return jsonify({"message": "API key revoked"})
+        
     except Exception as e:
-        logger.error(f"Change password endpoint error for user {session.get('username', 'unknown')}: {str(e)}")
+        logger.error(f"Revoke API key endpoint error: {str(e)}")
         return jsonify({"error": "Internal server error"}), 500
 
 @auth_bp.route('/api/auth/radius/config', methods=['GET'])
@@ -0,0 +1,225 @@
+from flask import Blueprint, request, jsonify, Response, stream_with_context
+from ..services.certificate_service import CertificateService
+from ..services.dh_params import dh_store
+from ..models.certificate import CertificateModel
+from ..services.renewal_scheduler import get_renewal_stats
+from ..middleware.auth import permission_required
+from ..services.permission_service import Permission
+from ..rate_limiting import rate_limit
+from ..utils.logging import logger
+from ..config import config
+from datetime import datetime, timedelta
+import json
+
+certificates_bp = Blueprint('certificates', __name__)
+certificate_service = CertificateService()
+
+@certificates_bp.route('/api/certificates/ca', methods=['POST'])
+@permission_required(Permission.CERTIFICATES_MANAGE)
+@rate_limit('cert_operations')
+def generate_ca():
+    """Сгенерировать CA. DH параметры при необходимости генерируются в фоне"""
+    try:
+        data = request.get_json(silent=True) or {}
+        dh_bits = data.get('dh_bits')
+
+        success, result = certificate_service.generate_ca(
+            key_algorithm=data.get('key_algorithm'),
+            dh_bits=int(dh_bits) if dh_bits is not None else None
+        )
+
+        if not success:
+            return jsonify({"error": result}), 400
+
+        return jsonify({
+            "message": "CA generated successfully",
+            **result
+        }), 201
+
+    except (TypeError, ValueError):
+        return jsonify({"error": "dh_bits must be an integer"}), 400
+    except Exception as e:
+        logger.error(f"Generate CA endpoint error: {str(e)}")
+        return jsonify({"error": "Internal server error"}), 500
+
+@certificates_bp.route('/api/certificates/clients/bulk', methods=['POST'])
+@permission_required(Permission.CERTIFICATES_MANAGE)
+@rate_limit('cert_operations')
+def bulk_issue_client_certificates():
+    """Выпустить сертификаты для списка клиентов сервера.
+
+    Результат отдается потоком NDJSON: строка на каждого клиента и итоговая строка summary.
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        server_name = data.get('server_name')
+        client_names = data.get('client_names')
+
+        if not server_name or not isinstance(client_names, list) or not client_names:
+            return jsonify({"error": "server_name and non-empty client_names list are required"}), 400
+
+        if len(client_names) > config.CERT_BULK_MAX:
+            return jsonify({"error": f"At most {config.CERT_BULK_MAX} clients per request"}), 400
+
+        def generate():
+            try:
+                for result in certificate_service.generate_client_certificates_bulk(client_names, server_name):
+                    yield json.dumps(result) + '\n'
+            except Exception as e:
+                logger.error(f"Bulk issuance stream error for {server_name}: {str(e)}")
+                yield json.dumps({"error": "Internal server error"}) + '\n'
+
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+    except Exception as e:
+        logger.error(f"Bulk issue endpoint error: {str(e)}")
+        return jsonify({"error": "Internal server error"}), 500
+
+@certificates_bp.route('/api/certificates/revoke', methods=['POST'])
+@permission_required(Permission.CERTIFICATES_MANAGE)
+@rate_limit('cert_operations')
+def revoke_client_certificates():
+    """Отозвать сертификаты списка клиентов сервера (один CRL на пакет)"""
+    try:
+        data = request.get_json(silent=True) or {}
+        server_name = data.get('server_name')
+        client_names = data.get('client_names')
+
+        if not server_name or not isinstance(client_names, list) or not client_names:
+            return jsonify({"error": "server_name and non-empty client_names list are required"}), 400
+
+        success, result = certificate_service.revoke_client_certificates(
+            client_names, server_name, reason=data.get('reason', 'unspecified')
+        )
+
+        if not success:
+            return jsonify({"error": result}), 400
+
+        return jsonify(result)
+
+    except Exception as e:
+        logger.error(f"Revoke certificates endpoint error: {str(e)}")
+        return jsonify({"error": "Internal server error"}), 500
+
+@certificates_bp.route('/api/certificates/expiring', methods=['GET'])
+@permission_required(Permission.CERTIFICATES_MANAGE)
+def get_expiring_certificates():
+    """Активные сертификаты, истекающие в ближайшие days дней"""
+    try:
+        days = int(request.args.get('days', 30))
+        instance_id = request.args.get('instance_id', type=int)
+        limit = min(int(request.args.get('limit', 1000)), 10000)
+
+        certificates = CertificateModel.get_expiring(
+            datetime.utcnow() + timedelta(days=days), vpn_instance_id=instance_id, limit=limit
+        )
+        return jsonify({"certificates": certificates, "count": len(certificates)})
+
+    except (TypeError, ValueError):
+        return jsonify({"error": "days and limit must be integers"}), 400
+    except Exception as e:
+        logger.error(f"Get expiring certificates endpoint error: {str(e)}")
+        return jsonify({"error": "Internal server error"}), 500
+
+@certificates_bp.route('/api/certificates/user/<int:user_id>', methods=['GET'])
+@permission_required(Permission.CERTIFICATES_MANAGE)
+def get_user_certificates(user_id):
+    """Сертификаты пользователя по статусу (по умолчанию активные)"""
+    try:
+        status = request.args.get('status', 'active')
+        return jsonify({"certificates": CertificateModel.get_by_user(user_id, status)})
+
+    except Exception as e:
+        logger.error(f"Get user certificates endpoint error for {user_id}: {str(e)}")
+        return jsonify({"error": "Internal server error"}), 500
+
+@certificates_bp.route('/api/certificates/crl', methods=['GET'])
+def download_crl():
+    """Текущий CRL (публичный). Повторные загрузки получают 304 по ETag/Last-Modified"""
+    try:
+        cached = certificate_service.get_crl_file()
+
+        if cached is None:
+            return jsonify({"error": "CRL not found"}), 404
+
+        response = Response(cached.data, mimetype='application/x-pem-file')
+        response.set_etag(cached.etag)
+        response.last_modified = datetime.utcfromtimestamp(int(cached.mtime))
+        # Клиент обязан перепроверять CRL при каждой загрузке
+        response.cache_control.no_cache = True
+        response.headers['Content-Disposition'] = 'attachment; filename=crl.pem'
+        return response.make_conditional(request)
+
+    except Exception as e:
+        logger.error(f"Download CRL endpoint error: {str(e)}")
+        return jsonify({"error": "Internal server error"}), 500
+
+@certificates_bp.route('/api/certificates/renewal/stats', methods=['GET'])
+@permission_required(Permission.CERTIFICATES_MANAGE)
+def get_certificate_renewal_stats():
+    """Очередь, отставание и пропускная способность продления сертификатов"""
+    try:
+        stats = get_renewal_stats()
+
+        if stats is None:
+            return jsonify({"error": "Renewal scheduler is not running"}), 503
+
+        return jsonify(stats)
+
+    except Exception as e:
+        logger.error(f"Get renewal stats endpoint error: {str(e)}")
+        return jsonify({"error": "Internal server error"}), 500
+
+@certificates_bp.route('/api/certificates/dh', methods=['POST'])
+@permission_required(Permission.CERTIFICATES_MANAGE)
+@rate_limit('cert_operations')
+def regenerate_dh_params():
+    """Перегенерировать DH параметры текущего CA (из хранилища или в фоне)"""
+    try:
+        data = request.get_json(silent=True) or {}
+        bits = int(data.get('bits', config.DH_PARAM_BITS))
+
+        if bits not in dh_store.SIZES:
+            return jsonify({"error": f"bits must be one of {', '.join(map(str, dh_store.SIZES))}"}), 400
+
+        dh_pem = config.CA_DIR / 'dh.pem'
+        if dh_store.take(bits, dh_pem):
+            return jsonify({"message": "DH parameters installed from store", "dh_job": None})
+
+        return jsonify({"message": "DH parameters generation started", "dh_job": dh_store.start_job(bits, dh_pem)}), 202
+
+    except (TypeError, ValueError):
+        return jsonify({"error": "bits must be an integer"}), 400
+    except Exception as e:
+        logger.error(f"Regenerate DH params endpoint error: {str(e)}")
+        return jsonify({"error": "Internal server error"}), 500
+
+@certificates_bp.route('/api/certificates/dh/jobs/<job_id>', methods=['GET'])
+@permission_required(Permission.CERTIFICATES_MANAGE)
+def get_dh_job(job_id):
+    """Получить прогресс генерации DH параметров"""
+    try:
+        job = dh_store.get_job(job_id)
+
+        if not job:
+            return jsonify({"error": "Job not found"}), 404
+
+        return jsonify(job)
+
+    except Exception as e:
+        logger.error(f"Get DH job endpoint error for {job_id}: {str(e)}")
+        return jsonify({"error": "Internal server error"}), 500
+
+@certificates_bp.route('/api/certificates/dh/store', methods=['GET'])
+@permission_required(Permission.CERTIFICATES_MANAGE)
+def get_dh_store():
+    """Количество готовых наборов DH параметров по размерам"""
+    try:
+        return jsonify({
+            "available": dh_store.available(),
+            "target": dh_store.target
+        })
+
+    except Exception as e:
+        logger.error(f"Get DH store endpoint error: {str(e)}")
+        return jsonify({"error": "Internal server error"}), 500
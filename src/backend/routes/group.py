@@ -1,13 +1,14 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, g
 from ..services.group_service import GroupService
-from ..middleware.auth import login_required, admin_required
+from ..middleware.auth import login_required, permission_required
+from ..services.permission_service import Permission
 from ..utils.logging import logger
 
 groups_bp = Blueprint('groups', __name__)
 group_service = GroupService()
 
 @groups_bp.route('/api/groups', methods=['GET'])
-@admin_required
+@permission_required(Permission.GROUPS_MANAGE)
 def get_groups():
     """Получить список всех групп"""
     try:
@@ -23,29 +24,31 @@ def get_groups():
         return jsonify({"error": "Internal server error"}), 500
 
 @groups_bp.route('/api/groups', methods=['POST'])
-@admin_required
+@permission_required(Permission.GROUPS_MANAGE)
 def create_group():
     """Создать новую группу"""
     try:
         data = request.get_json(silent=True) or {}
         
-        group_id, error = group_service.create_group(data)
+        group_id, error = group_service.create_group(data, g.user)
         
         if error:
             return jsonify({"error": error}), 400
         
-        logger.info(f"Group created by {request.user.get('username', 'unknown')}: {data.get('name')}")
+        logger.info(f"Group created by {g.user['username']}: {data.get('name')}")
         return jsonify({
             "message": "Group created successfully",
             "group_id": group_id
         }), 201
         
+    except PermissionError as e:
+        return jsonify({"error": str(e)}), 403
     except Exception as e:
         logger.error(f"Create group endpoint error: {str(e)}")
         return jsonify({"error": "Internal server error"}), 500
 
 @groups_bp.route('/api/groups/<int:group_id>', methods=['GET'])
-@admin_required
+@permission_required(Permission.GROUPS_MANAGE)
 def get_group(group_id):
     """Получить информацию о конкретной группе"""
     try:
@@ -65,26 +68,28 @@ def get_group(group_id):
         return jsonify({"error": "Internal server error"}), 500
 
 @groups_bp.route('/api/groups/<int:group_id>', methods=['PUT'])
-@admin_required
+@permission_required(Permission.GROUPS_MANAGE)
 def update_group(group_id):
     """Обновить информацию о группе"""
     try:
         data = request.get_json(silent=True) or {}
         
-        success, error = group_service.update_group(group_id, data)
+        success, error = group_service.update_group(group_id, data, g.user)
         
         if error:
             return jsonify({"error": error}), 400
         
-        logger.info(f"Group updated by {request.user.get('username', 'unknown')}: ID {group_id}")
+        logger.info(f"Group updated by {g.user['username']}: ID {group_id}")
         return jsonify({"message": "Group updated successfully"})
         
+    except PermissionError as e:
+        return jsonify({"error": str(e)}), 403
     except Exception as e:
         logger.error(f"Update group endpoint error for ID {group_id}: {str(e)}")
         return jsonify({"error": "Internal server error"}), 500
 
 @groups_bp.route('/api/groups/<int:group_id>', methods=['DELETE'])
-@admin_required
+@permission_required(Permission.GROUPS_MANAGE)
 def delete_group(group_id):
     """Удалить группу"""
     try:
@@ -93,7 +98,7 @@ def delete_group(group_id):
         if error:
             return jsonify({"error": error}), 400
         
-        logger.info(f"Group deleted by {request.user.get('username', 'unknown')}: ID {group_id}")
+        logger.info(f"Group deleted by {g.user['username']}: ID {group_id}")
         return jsonify({"message": "Group deleted successfully"})
         
     except Exception as e:
@@ -101,7 +106,7 @@ def delete_group(group_id):
         return jsonify({"error": "Internal server error"}), 500
 
 @groups_bp.route('/api/groups/<int:group_id>/users', methods=['GET'])
-@admin_required
+@permission_required(Permission.GROUPS_MANAGE)
 def get_group_users(group_id):
     """Получить пользователей группы"""
     try:
@@ -113,7 +118,7 @@ def get_group_users(group_id):
         return jsonify({"error": "Internal server error"}), 500
 
 @groups_bp.route('/api/groups/<int:group_id>/users', methods=['POST'])
-@admin_required
+@permission_required(Permission.GROUPS_MANAGE)
 def add_user_to_group():
     """Добавить пользователя в группу"""
     try:
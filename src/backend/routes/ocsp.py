@@ -0,0 +1,24 @@
+from flask import Blueprint, request, Response
+from ..services.ocsp_responder import ocsp_responder
+from ..utils.logging import logger
+import base64
+
+ocsp_bp = Blueprint('ocsp', __name__)
+
+def _ocsp_response(request_der):
+    return Response(ocsp_responder.respond(request_der), mimetype='application/ocsp-response')
+
+@ocsp_bp.route('/api/ocsp', methods=['POST'])
+def ocsp_post():
+    """OCSP запрос в теле (RFC 6960, A.1)"""
+    return _ocsp_response(request.get_data())
+
+@ocsp_bp.route('/api/ocsp/<path:encoded>', methods=['GET'])
+def ocsp_get(encoded):
+    """OCSP запрос в URL в base64 (RFC 6960, A.1)"""
+    try:
+        request_der = base64.b64decode(encoded)
+    except ValueError:
+        logger.debug("Malformed OCSP GET request")
+        request_der = b''
+    return _ocsp_response(request_der)
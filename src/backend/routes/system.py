@@ -1,6 +1,10 @@
-from flask import Blueprint, jsonify
-from ..middleware.auth import login_required, admin_required
+from flask import Blueprint, jsonify, request, Response
+from ..middleware.auth import login_required, permission_required
+from ..services.permission_service import Permission
 from ..utils.logging import logger
+from ..utils.metrics import metrics
+from ..services.connection_limiter import query_connection_limiter
+import json
 import psutil
 import os
 import time
@@ -106,8 +110,36 @@ def health_check():
             "timestamp": time.strftime('%Y-%m-%d %H:%M:%S')
         }), 500
 
+@system_bp.route('/api/system/metrics', methods=['GET'])
+@permission_required(Permission.SYSTEM_VIEW)
+def get_metrics():
+    """Получить внутренние метрики приложения (JSON или формат Prometheus)"""
+    try:
+        if request.args.get('format') == 'prometheus':
+            return Response(metrics.render_prometheus(), mimetype='text/plain; version=0.0.4')
+        
+        return jsonify(metrics.snapshot())
+        
+    except Exception as e:
+        logger.error(f"Get metrics endpoint error: {str(e)}")
+        return jsonify({"error": "Internal server error"}), 500
+
+@system_bp.route('/api/system/connection-limits', methods=['GET'])
+@permission_required(Permission.SYSTEM_VIEW)
+def get_connection_limits():
+    """Получить счетчики сервиса ограничения подключений"""
+    try:
+        return jsonify(json.loads(query_connection_limiter('STATS')))
+        
+    except (OSError, ValueError) as e:
+        logger.warning(f"Connection limiter unavailable: {str(e)}")
+        return jsonify({"error": "Connection limiter unavailable"}), 503
+    except Exception as e:
+        logger.error(f"Get connection limits endpoint error: {str(e)}")
+        return jsonify({"error": "Internal server error"}), 500
+
 @system_bp.route('/api/system/audit-logs', methods=['GET'])
-@admin_required
+@permission_required(Permission.SYSTEM_VIEW)
 def get_audit_logs():
     """Получить аудит-логи"""
     try:
@@ -119,7 +151,7 @@ def get_audit_logs():
         return jsonify({"error": "Internal server error"}), 500
 
 @system_bp.route('/api/system/backups', methods=['GET'])
-@admin_required
+@permission_required(Permission.SYSTEM_VIEW)
 def get_backups():
     """Получить список бэкапов"""
     try:
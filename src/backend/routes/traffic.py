@@ -0,0 +1,52 @@
+from flask import Blueprint, request, jsonify
+from ..services.traffic_service import TrafficService
+from ..middleware.auth import permission_required
+from ..services.permission_service import Permission
+from ..utils.logging import logger
+
+traffic_bp = Blueprint('traffic', __name__)
+traffic_service = TrafficService()
+
+@traffic_bp.route('/api/traffic/<scope>/<int:scope_id>', methods=['GET'])
+@permission_required(Permission.TRAFFIC_VIEW)
+def get_traffic_usage(scope, scope_id):
+    """Получить трафик пользователя, группы или инстанса за период"""
+    try:
+        usage, error = traffic_service.get_usage(
+            scope, scope_id,
+            start=request.args.get('from'),
+            end=request.args.get('to'),
+            granularity=request.args.get('granularity', 'day')
+        )
+
+        if error:
+            return jsonify({"error": error}), 400
+
+        return jsonify(usage)
+
+    except Exception as e:
+        logger.error(f"Get traffic usage endpoint error for {scope} {scope_id}: {str(e)}")
+        return jsonify({"error": "Internal server error"}), 500
+
+@traffic_bp.route('/api/traffic/backfill', methods=['POST'])
+@permission_required(Permission.SYSTEM_MANAGE)
+def backfill_traffic():
+    """Учесть в агрегатах накопленные сессии (можно вызывать повторно)"""
+    try:
+        data = request.get_json(silent=True) or {}
+
+        result, error = traffic_service.backfill(
+            chunk_size=int(data.get('chunk_size', 5000)),
+            time_budget=int(data.get('time_budget', 60))
+        )
+
+        if error:
+            return jsonify({"error": error}), 500
+
+        return jsonify(result)
+
+    except (TypeError, ValueError):
+        return jsonify({"error": "chunk_size and time_budget must be integers"}), 400
+    except Exception as e:
+        logger.error(f"Traffic backfill endpoint error: {str(e)}")
+        return jsonify({"error": "Internal server error"}), 500
@@ -1,13 +1,14 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, g
 from ..services.user_service import UserService
-from ..middleware.auth import login_required, admin_required
+from ..middleware.auth import login_required, permission_required
+from ..services.permission_service import Permission
 from ..utils.logging import logger
 
 users_bp = Blueprint('users', __name__)
 user_service = UserService()
 
 @users_bp.route('/api/users', methods=['GET'])
-@admin_required
+@permission_required(Permission.USERS_MANAGE)
 def get_users():
     """Получить список всех пользователей"""
     try:
@@ -23,29 +24,31 @@ def get_users():
         return jsonify({"error": "Internal server error"}), 500
 
 @users_bp.route('/api/users', methods=['POST'])
-@admin_required
+@permission_required(Permission.USERS_MANAGE)
 def create_user():
     """Создать нового пользователя"""
     try:
         data = request.get_json(silent=True) or {}
         
-        user_id, error = user_service.create_user(data)
+        user_id, error = user_service.create_user(data, g.user)
         
         if error:
             return jsonify({"error": error}), 400
         
-        logger.info(f"User created by {request.user.get('username', 'unknown')}: {data.get('username')}")
+        logger.info(f"User created by {g.user['username']}: {data.get('username')}")
         return jsonify({
             "message": "User created successfully",
             "user_id": user_id
         }), 201
         
+    except PermissionError as e:
+        return jsonify({"error": str(e)}), 403
     except Exception as e:
         logger.error(f"Create user endpoint error: {str(e)}")
         return jsonify({"error": "Internal server error"}), 500
 
 @users_bp.route('/api/users/<int:user_id>', methods=['GET'])
-@admin_required
+@permission_required(Permission.USERS_MANAGE)
 def get_user(user_id):
     """Получить информацию о конкретном пользователе"""
     try:
@@ -67,26 +70,28 @@ def get_user(user_id):
         return jsonify({"error": "Internal server error"}), 500
 
 @users_bp.route('/api/users/<int:user_id>', methods=['PUT'])
-@admin_required
+@permission_required(Permission.USERS_MANAGE)
 def update_user(user_id):
     """Обновить информацию о пользователе"""
     try:
         data = request.get_json(silent=True) or {}
         
-        success, error = user_service.update_user(user_id, data)
+        success, error = user_service.update_user(user_id, data, g.user)
         
         if error:
             return jsonify({"error": error}), 400
         
-        logger.info(f"User updated by {request.user.get('username', 'unknown')}: ID {user_id}")
+        logger.info(f"User updated by {g.user['username']}: ID {user_id}")
         return jsonify({"message": "User updated successfully"})
         
+    except PermissionError as e:
+        return jsonify({"error": str(e)}), 403
     except Exception as e:
         logger.error(f"Update user endpoint error for ID {user_id}: {str(e)}")
         return jsonify({"error": "Internal server error"}), 500
 
 @users_bp.route('/api/users/<int:user_id>', methods=['DELETE'])
-@admin_required
+@permission_required(Permission.USERS_MANAGE)
 def delete_user(user_id):
     """Удалить пользователя"""
     try:
@@ -95,7 +100,7 @@ def delete_user(user_id):
         if error:
             return jsonify({"error": error}), 400
         
-        logger.info(f"User deleted by {request.user.get('username', 'unknown')}: ID {user_id}")
+        logger.info(f"User deleted by {g.user['username']}: ID {user_id}")
         return jsonify({"message": "User deleted successfully"})
         
     except Exception as e:
@@ -103,7 +108,7 @@ def delete_user(user_id):
         return jsonify({"error": "Internal server error"}), 500
 
 @users_bp.route('/api/users/<int:user_id>/reset-password', methods=['POST'])
-@admin_required
+@permission_required(Permission.USERS_MANAGE)
 def reset_user_password():
     """Сбросить пароль пользователя (администратором)"""
     try:
@@ -1,6 +1,8 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, g
 from ..services.vpn_service import VPNService
-from ..middleware.auth import login_required
+from ..middleware.auth import login_required, permission_required
+from ..services.permission_service import Permission
+from ..rate_limiting import rate_limit
 from ..utils.logging import logger
 
 vpn_bp = Blueprint('vpn', __name__)
@@ -23,7 +25,8 @@ def get_vpn_instances():
         return jsonify({"error": "Internal server error"}), 500
 
 @vpn_bp.route('/api/vpn-instances/<instance_name>/start', methods=['POST'])
-@login_required
+@permission_required(Permission.VPN_MANAGE)
+@rate_limit('vpn_operations')
 def start_vpn_instance(instance_name):
     """Запустить VPN инстанс"""
     try:
@@ -32,7 +35,7 @@ def start_vpn_instance(instance_name):
         if error:
             return jsonify({"error": error}), 400
         
-        logger.info(f"VPN instance started by {request.user.get('username', 'unknown')}: {instance_name}")
+        logger.info(f"VPN instance started by {g.user['username']}: {instance_name}")
         return jsonify({"message": f"VPN instance '{instance_name}' started successfully"})
         
     except Exception as e:
@@ -40,7 +43,8 @@ def start_vpn_instance(instance_name):
         return jsonify({"error": "Internal server error"}), 500
 
 @vpn_bp.route('/api/vpn-instances/<instance_name>/stop', methods=['POST'])
-@login_required
+@permission_required(Permission.VPN_MANAGE)
+@rate_limit('vpn_operations')
 def stop_vpn_instance(instance_name):
     """Остановить VPN инстанс"""
     try:
@@ -49,7 +53,7 @@ def stop_vpn_instance(instance_name):
         if error:
             return jsonify({"error": error}), 400
         
-        logger.info(f"VPN instance stopped by {request.user.get('username', 'unknown')}: {instance_name}")
+        logger.info(f"VPN instance stopped by {g.user['username']}: {instance_name}")
         return jsonify({"message": f"VPN instance '{instance_name}' stopped successfully"})
         
     except Exception as e:
@@ -57,7 +61,8 @@ def stop_vpn_instance(instance_name):
         return jsonify({"error": "Internal server error"}), 500
 
 @vpn_bp.route('/api/vpn-instances/<instance_name>/restart', methods=['POST'])
-@login_required
+@permission_required(Permission.VPN_MANAGE)
+@rate_limit('vpn_operations')
 def restart_vpn_instance(instance_name):
     """Перезапустить VPN инстанс"""
     try:
@@ -71,13 +76,38 @@ def restart_vpn_instance(instance_name):
         if start_error:
             return jsonify({"error": f"Failed to start: {start_error}"}), 400
         
-        logger.info(f"VPN instance restarted by {request.user.get('username', 'unknown')}: {instance_name}")
+        logger.info(f"VPN instance restarted by {g.user['username']}: {instance_name}")
         return jsonify({"message": f"VPN instance '{instance_name}' restarted successfully"})
         
     except Exception as e:
         logger.error(f"Restart VPN instance endpoint error for {instance_name}: {str(e)}")
         return jsonify({"error": "Internal server error"}), 500
 
+@vpn_bp.route('/api/vpn-instances/<instance_name>/crl-mode', methods=['PUT'])
+@permission_required(Permission.VPN_MANAGE)
+@rate_limit('vpn_operations')
+def update_vpn_instance_crl_mode(instance_name):
+    """Сменить режим crl-verify инстанса: auto, file или dir"""
+    try:
+        data = request.get_json(silent=True) or {}
+        crl_mode = data.get('crl_mode')
+        
+        if not isinstance(crl_mode, str):
+            return jsonify({"error": "crl_mode is required"}), 400
+        
+        success, error = vpn_service.update_crl_mode(instance_name, crl_mode)
+        
+        if error:
+            status = 404 if error == "VPN instance not found" else 400
+            return jsonify({"error": error}), status
+        
+        logger.info(f"VPN instance CRL mode changed by {g.user['username']}: {instance_name} -> {crl_mode}")
+        return jsonify({"message": f"CRL mode of '{instance_name}' set to '{crl_mode}', restart the instance to apply it"})
+        
+    except Exception as e:
+        logger.error(f"Update CRL mode endpoint error for {instance_name}: {str(e)}")
+        return jsonify({"error": "Internal server error"}), 500
+
 @vpn_bp.route('/api/vpn-instances/<instance_name>/status', methods=['GET'])
 @login_required
 def get_vpn_instance_status(instance_name):
@@ -1,42 +1,24 @@
-import time
-from functools import wraps
-from flask import request, jsonify
 import pyotp
 import qrcode
 import io
 import base64
+from . import rate_limiting
 
 # Rate limiting
 class RateLimiter:
-    def __init__(self):
-        self.requests = {}
+    """Ad-hoc limits on the shared rate limiting engine"""
     
     def is_limited(self, key, limit=100, window=60):
-        now = time.time()
-        if key not in self.requests:
-            self.requests[key] = []
-        
-        # Remove old requests
-        self.requests[key] = [req_time for req_time in self.requests[key] if now - req_time < window]
-        
-        if len(self.requests[key]) >= limit:
-            return True
-        
-        self.requests[key].append(now)
-        return False
+        result = rate_limiting.rate_limiter.check_limits([
+            ("security", f"security:{key}", {"limit": limit, "window": window})
+        ])
+        return not result.allowed
 
 rate_limiter = RateLimiter()
 
 def rate_limit(limit=100, window=60):
-    def decorator(f):
-        @wraps(f)
-        def decorated_function(*args, **kwargs):
-            key = f"{request.remote_addr}_{request.endpoint}"
-            if rate_limiter.is_limited(key, limit, window):
-                return jsonify({"error": "Rate limit exceeded"}), 429
-            return f(*args, **kwargs)
-        return decorated_function
-    return decorator
+    """Per-endpoint limit, checked together with the global, IP and user limits"""
+    return rate_limiting.rate_limit(limit=limit, window=window)
 
 # 2FA Support
 def setup_2fa(user_id):
@@ -0,0 +1,128 @@
+import hmac
+import hashlib
+import secrets
+import threading
+import logging
+from datetime import datetime, timedelta
+from . import BaseService
+from ..models.api_key import ApiKeyModel
+from ..utils.metrics import metrics
+from ..utils.epoch import SharedEpoch
+from ..utils.bounded_cache import BoundedCache
+from ..config import config
+
+logger = logging.getLogger(__name__)
+
+class ApiKeyService(BaseService):
+    """API ключи для внешних интеграций.
+
+    Ключ вида kl_<префикс>_<секрет> показывается один раз при создании, в БД
+    хранятся только открытый префикс (для поиска по индексу) и SHA-256 ключа:
+    у ключа 256 бит энтропии, медленный хеш вроде bcrypt не нужен.
+
+    Проверенные ключи держатся в ограниченном кеше с TTL (BoundedCache),
+    поэтому частые вызовы интеграций не обращаются к БД. Отзыв сбрасывает кеш во всех воркерах через
+    файл-эпоху в RUN_DIR, last_used записывается пакетами в фоне.
+    """
+
+    KEY_PREFIX = 'kl_'
+    PREFIX_LENGTH = 8
+    
+    # Отличает промах кеша от закешированного неверного ключа (None)
+    _MISS = object()
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # key_hash -> principal или None
+        self._cache = BoundedCache('api_keys', config.API_KEY_CACHE_SIZE)
+        # key_id -> последнее использование, ожидающее записи в БД
+        self._last_used = {}
+        self._epoch = SharedEpoch('api-keys')
+
+    def create_key(self, user_id, description='', expires_days=None):
+        """Создать ключ. Возвращает (key_id, ключ) — ключ больше нигде не сохраняется"""
+        prefix = secrets.token_hex(self.PREFIX_LENGTH // 2)
+        key = f"{self.KEY_PREFIX}{prefix}_{secrets.token_urlsafe(32)}"
+        expires_at = datetime.utcnow() + timedelta(days=expires_days) if expires_days else None
+        key_id = ApiKeyModel.create(user_id, prefix, self._hash(key), description, expires_at)
+        return key_id, key
+
+    def revoke_key(self, key_id, user_id=None):
+        """Отозвать ключ и сбросить кеш ключей во всех воркерах"""
+        revoked = ApiKeyModel.revoke(key_id, user_id)
+        if revoked:
+            self._epoch.bump()
+            self.invalidate()
+        return revoked
+
+    def authenticate(self, key):
+        """Проверить ключ. Возвращает данные владельца или None"""
+        if not key or not key.startswith(self.KEY_PREFIX):
+            return None
+
+        # Другой воркер отозвал ключ
+        if self._epoch.changed():
+            self.invalidate()
+        key_hash = self._hash(key)
+
+        principal = self._cache.get(key_hash, self._MISS)
+        if principal is not self._MISS:
+            metrics.inc('api_key_cache_total', result='hit')
+        else:
+            metrics.inc('api_key_cache_total', result='miss')
+            principal = self._lookup(key, key_hash)
+            # Неверные ключи тоже кешируются, чтобы перебор не нагружал БД
+            self._cache.set(key_hash, principal, config.API_KEY_CACHE_TTL)
+
+        if principal is None:
+            return None
+        if principal['expires_at'] and principal['expires_at'] <= datetime.utcnow():
+            return None
+
+        with self._lock:
+            self._last_used[principal['key_id']] = datetime.utcnow()
+        return principal
+
+    def flush_last_used(self):
+        """Записать накопленные last_used одним запросом (фоновая задача)"""
+        with self._lock:
+            pending, self._last_used = self._last_used, {}
+        if not pending:
+            return 0
+        try:
+            ApiKeyModel.touch_batch(list(pending.items()))
+        except Exception:
+            # Вернуть в очередь, не затирая более свежие отметки
+            with self._lock:
+                for key_id, last_used in pending.items():
+                    self._last_used.setdefault(key_id, last_used)
+            raise
+        return len(pending)
+
+    def invalidate(self):
+        self._cache.clear()
+
+    def _lookup(self, key, key_hash):
+        parts = key[len(self.KEY_PREFIX):].split('_', 1)
+        if len(parts) != 2 or len(parts[0]) != self.PREFIX_LENGTH:
+            return None
+
+        for key_id, stored_hash, expires_at, user_id, username, role, full_name in ApiKeyModel.get_by_prefix(parts[0]):
+            if hmac.compare_digest(stored_hash, key_hash):
+                return {
+                    'key_id': key_id,
+                    'expires_at': expires_at,
+                    'id': user_id,
+                    'username': username,
+                    'role': role,
+                    'full_name': full_name or ''
+                }
+        return None
+
+    @staticmethod
+    def _hash(key):
+        return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+# Глобальный сервис API ключей
+api_key_service = ApiKeyService()
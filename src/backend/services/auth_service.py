@@ -1,7 +1,9 @@
 from . import BaseService
 from ..models.user import UserModel
 from ..models.group import GroupModel
+from .login_attempts import login_attempts
 from ..utils.radius import RadiusClient
+from ..utils.password_hasher import HashingBusyError
 import logging
 
 logger = logging.getLogger(__name__)
@@ -18,26 +20,26 @@ class AuthService(BaseService):
             # Проверка обязательных полей
             self.validate_required_fields({'username': username, 'password': password}, ['username', 'password'])
             
-            # Проверка блокировки аккаунта
-            if UserModel.is_locked(username):
+            # Проверка блокировки аккаунта (в памяти, без обращения к БД)
+            if login_attempts.is_locked(username):
                 return None, "Account temporarily locked. Try again later."
             
             # RADIUS аутентификация
             if use_radius and self.radius_client:
                 radius_result = self.radius_client.authenticate(username, password)
                 if not radius_result['success']:
-                    UserModel.update_login_attempts(username, False)
+                    login_attempts.record_failure(username)
                     return None, f"RADIUS authentication failed: {radius_result['message']}"
             
             # Локальная аутентификация
             is_valid, user = UserModel.verify_password(username, password)
             
             if not is_valid:
-                UserModel.update_login_attempts(username, False)
+                login_attempts.record_failure(username)
                 return None, "Invalid credentials"
             
-            # Успешная аутентификация
-            UserModel.update_login_attempts(username, True)
+            # Успешная аутентификация (сброс счетчика и last_login пишутся в БД в фоне)
+            login_attempts.record_success(username)
             
             user_data = {
                 'id': user['id'],
@@ -52,6 +54,8 @@ class AuthService(BaseService):
             
         except ValueError as e:
             return None, str(e)
+        except HashingBusyError:
+            raise
         except Exception as e:
             logger.error(f"Login error for user {username}: {str(e)}")
             return None, "Authentication service error"
@@ -86,6 +90,8 @@ class AuthService(BaseService):
                 
         except ValueError as e:
             return False, str(e)
+        except HashingBusyError:
+            raise
         except Exception as e:
             logger.error(f"Password change error for user {user_id}: {str(e)}")
             return False, "Password change service error"
@@ -1,49 +1,295 @@
 import os
+import re
+import time
 import subprocess
+import threading
 import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
 from pathlib import Path
+from cryptography import x509
+from cryptography.x509.oid import NameOID, ExtendedKeyUsageOID
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa, ec, ed25519
+from .key_pool import key_pool, generate_private_key, generate_key_pair_pem
+from .dh_params import dh_store
+from ..models.client import ClientModel
+from ..models.vpn import VPNModel
+from ..models.revocation import RevocationModel
+from ..models.certificate import CertificateModel
+from ..utils.metrics import metrics
+from ..utils.file_cache import file_cache
 from ..config import config
 
 logger = logging.getLogger(__name__)
 
 class CertificateService:
     """Сервис для управления SSL сертификатами"""
-    
+
+    CERT_DAYS = 3650
+
+    # Поддерживаемые алгоритмы ключей PKI
+    KEY_ALGORITHMS = ('rsa2048', 'rsa4096', 'ec-p256', 'ec-p384', 'ed25519')
+
+    # Кривая ECDHE для OpenVPN (ecdh-curve) при EC PKI
+    ECDH_CURVES = {
+        'ec-p256': 'prime256v1',
+        'ec-p384': 'secp384r1',
+        'ed25519': 'prime256v1'
+    }
+
+    # CRL: пауза перед перевыпуском, чтобы близкие по времени отзывы попали в один CRL
+    CRL_DEBOUNCE = 2.0
+    _crl_lock = threading.Lock()
+    _crl_timer = None
+    _crl_timer_lock = threading.Lock()
+
+    # Причины отзыва (имена x509.ReasonFlags)
+    REVOCATION_REASONS = {
+        flag.name: flag for flag in x509.ReasonFlags if flag is not x509.ReasonFlags.remove_from_crl
+    }
+
+    # Допустимые имена клиентов (имя используется в путях файлов)
+    CLIENT_NAME_RE = re.compile(r'^[A-Za-z0-9][A-Za-z0-9_.@-]{0,99}$')
+
     def __init__(self):
         self.openssl_bin = self._find_openssl()
-    
+
     def _find_openssl(self):
         """Найти бинарник OpenSSL"""
         for path in ['/usr/bin/openssl', '/bin/openssl', '/usr/local/bin/openssl']:
             if Path(path).exists():
                 return path
         raise RuntimeError("OpenSSL not found")
-    
-    def generate_ca(self):
-        """Сгенерировать корневой сертификат (CA)"""
+
+    def _subject(self, common_name):
+        """Сформировать subject сертификата"""
+        return x509.Name([
+            x509.NameAttribute(NameOID.COUNTRY_NAME, 'RU'),
+            x509.NameAttribute(NameOID.STATE_OR_PROVINCE_NAME, 'Moscow'),
+            x509.NameAttribute(NameOID.LOCALITY_NAME, 'Moscow'),
+            x509.NameAttribute(NameOID.ORGANIZATION_NAME, 'KursLight'),
+            x509.NameAttribute(NameOID.COMMON_NAME, common_name),
+        ])
+
+    def _generate_private_key(self, algorithm='rsa2048'):
+        """Сгенерировать приватный ключ заданного алгоритма"""
+        return generate_private_key(algorithm)
+
+    def _obtain_private_key(self, algorithm):
+        """Взять ключ из пула, при пустом пуле — сгенерировать на месте.
+
+        Пул хранит только RSA-ключи: EC-ключ генерируется быстрее, чем
+        расшифровывается из пула.
+        """
+        if algorithm == key_pool.ALGORITHM:
+            key = key_pool.acquire()
+            if key is not None:
+                return key
+        return self._generate_private_key(algorithm)
+
+    @staticmethod
+    def _key_algorithm(key):
+        """Определить алгоритм по ключу (приватному или публичному)"""
+        if isinstance(key, (rsa.RSAPrivateKey, rsa.RSAPublicKey)):
+            return f'rsa{key.key_size}'
+        if isinstance(key, (ec.EllipticCurvePrivateKey, ec.EllipticCurvePublicKey)):
+            return {'secp256r1': 'ec-p256', 'secp384r1': 'ec-p384'}.get(key.curve.name, key.curve.name)
+        if isinstance(key, (ed25519.Ed25519PrivateKey, ed25519.Ed25519PublicKey)):
+            return 'ed25519'
+        raise ValueError(f"Unsupported key type: {type(key).__name__}")
+
+    @staticmethod
+    def _signature_hash(algorithm):
+        """Хеш подписи для алгоритма ключа CA (Ed25519 хеш не принимает)"""
+        if algorithm == 'ed25519':
+            return None
+        if algorithm == 'ec-p384':
+            return hashes.SHA384()
+        return hashes.SHA256()
+
+    @classmethod
+    def get_key_algorithm(cls):
+        """Алгоритм ключей текущего CA (определяется по ключу CA).
+
+        Пока CA не создан, возвращается алгоритм по умолчанию из настроек.
+        """
+        if not (config.CA_DIR / 'ca.key').exists():
+            return config.PKI_KEY_ALGORITHM
+        ca_key, _, _ = cls._load_ca()
+        return cls._key_algorithm(ca_key)
+
+    def _openvpn_supports_ed25519(self):
+        """Ed25519 требует OpenVPN >= 2.5 и OpenSSL >= 1.1.1"""
+        try:
+            result = subprocess.run([config.OPENVPN_BIN, '--version'], capture_output=True, text=True)
+        except OSError:
+            return False
+        output = result.stdout + result.stderr
+        openvpn = re.search(r'OpenVPN (\d+)\.(\d+)', output)
+        openssl = re.search(r'OpenSSL (\d+)\.(\d+)\.(\d+)', output)
+        if not openvpn or not openssl:
+            return False
+        return (tuple(map(int, openvpn.groups())) >= (2, 5)
+                and tuple(map(int, openssl.groups())) >= (1, 1, 1))
+
+    @staticmethod
+    def _key_to_pem(key):
+        return key.private_bytes(
+            encoding=serialization.Encoding.PEM,
+            format=serialization.PrivateFormat.PKCS8,
+            encryption_algorithm=serialization.NoEncryption()
+        )
+
+    @staticmethod
+    def _write_file(path, data, mode=0o644):
+        """Записать файл сразу с нужными правами.
+
+        Запись идет во временный файл с уникальным именем и атомарно заменяет
+        целевой, поэтому параллельный выпуск из нескольких воркеров не оставляет
+        частично записанных файлов.
+        """
+        path = Path(path)
+        tmp = path.with_name(f'.{path.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, mode)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.chmod(tmp, mode)
+            os.replace(tmp, path)
+        except BaseException:
+            tmp.unlink(missing_ok=True)
+            raise
+
+    @staticmethod
+    def _parse_private_key(data):
+        return serialization.load_pem_private_key(data, password=None)
+
+    @classmethod
+    def _load_ca(cls):
+        """Получить (ключ CA, сертификат CA, PEM сертификата CA) из кеша файлов"""
+        ca_key = file_cache.get(config.CA_DIR / 'ca.key', cls._parse_private_key)
+        ca_cert = file_cache.get(config.CA_DIR / 'ca.crt', x509.load_pem_x509_certificate)
+        if ca_key is None or ca_cert is None:
+            raise FileNotFoundError("CA is not initialized")
+        return ca_key.value, ca_cert.value, ca_cert.data
+
+    @classmethod
+    def invalidate_ca_cache(cls):
+        """Сбросить кеш CA, ta.key и CRL (после перевыпуска или ротации)"""
+        file_cache.invalidate()
+
+    @staticmethod
+    def _allocate_serials(count):
+        """Выделить уникальные серийные номера.
+
+        Случайные номера (до 159 бит, RFC 5280) резервируются в БД, общий файл
+        ca.srl и блокировка не нужны. Если БД недоступна, используются
+        случайные номера без резерва.
+        """
+        serials = []
+        while len(serials) < count:
+            candidates = {format(x509.random_serial_number(), 'x') for _ in range(count - len(serials))}
+            try:
+                reserved = CertificateModel.reserve_serials(candidates)
+            except Exception as e:
+                logger.warning(f"Serial reservation unavailable, using unreserved random serials: {str(e)}")
+                reserved = candidates
+            serials.extend(int(serial, 16) for serial in reserved)
+        return serials
+
+    def _sign_certificate(self, common_name, public_key, server=False, serial=None):
+        """Подписать сертификат ключом CA (без CSR)"""
+        ca_key, ca_cert, _ = self._load_ca()
+        serial = serial or self._allocate_serials(1)[0]
+        now = datetime.utcnow()
+        usage = ExtendedKeyUsageOID.SERVER_AUTH if server else ExtendedKeyUsageOID.CLIENT_AUTH
+        # keyEncipherment имеет смысл только для RSA
+        key_encipherment = isinstance(public_key, rsa.RSAPublicKey)
+
+        builder = (
+            x509.CertificateBuilder()
+            .subject_name(self._subject(common_name))
+            .issuer_name(ca_cert.subject)
+            .public_key(public_key)
+            .serial_number(serial)
+            .not_valid_before(now - timedelta(minutes=5))
+            .not_valid_after(now + timedelta(days=config.CERT_VALIDITY_DAYS))
+            .add_extension(x509.BasicConstraints(ca=False, path_length=None), critical=True)
+            .add_extension(x509.KeyUsage(
+                digital_signature=True, content_commitment=False, key_encipherment=key_encipherment,
+                data_encipherment=False, key_agreement=False, key_cert_sign=False,
+                crl_sign=False, encipher_only=False, decipher_only=False
+            ), critical=True)
+            # Нужно для remote-cert-tls server/client в конфигурациях OpenVPN
+            .add_extension(x509.ExtendedKeyUsage([usage]), critical=False)
+            .add_extension(x509.SubjectKeyIdentifier.from_public_key(public_key), critical=False)
+            .add_extension(
+                x509.AuthorityKeyIdentifier.from_issuer_public_key(ca_key.public_key()), critical=False
+            )
+        )
+        return builder.sign(ca_key, self._signature_hash(self._key_algorithm(ca_key)))
+
+    def _build_ca_certificate(self, ca_key):
+        """Самоподписанный сертификат CA"""
+        subject = self._subject('KursLight CA')
+        now = datetime.utcnow()
+        return (
+            x509.CertificateBuilder()
+            .subject_name(subject)
+            .issuer_name(subject)
+            .public_key(ca_key.public_key())
+            .serial_number(x509.random_serial_number())
+            .not_valid_before(now - timedelta(minutes=5))
+            .not_valid_after(now + timedelta(days=self.CERT_DAYS))
+            .add_extension(x509.BasicConstraints(ca=True, path_length=None), critical=True)
+            .add_extension(x509.KeyUsage(
+                digital_signature=True, content_commitment=False, key_encipherment=False,
+                data_encipherment=False, key_agreement=False, key_cert_sign=True,
+                crl_sign=True, encipher_only=False, decipher_only=False
+            ), critical=True)
+            .add_extension(x509.SubjectKeyIdentifier.from_public_key(ca_key.public_key()), critical=False)
+            .sign(ca_key, self._signature_hash(self._key_algorithm(ca_key)))
+        )
+
+    def generate_ca(self, key_algorithm=None, dh_bits=None):
+        """Сгенерировать корневой сертификат (CA).
+
+        key_algorithm задает алгоритм ключей всей PKI: CA, сервера и клиентов.
+        dh_bits — размер DH параметров для RSA PKI, 0 — только ECDHE (dh none).
+        DH параметры берутся из хранилища, при пустом хранилище генерируются
+        в фоне — в ответе возвращается задача генерации.
+        """
+        key_algorithm = key_algorithm or config.PKI_KEY_ALGORITHM
+        if key_algorithm not in self.KEY_ALGORITHMS:
+            return False, f"Unsupported key algorithm: {key_algorithm}"
+        dh_bits = config.DH_PARAM_BITS if dh_bits is None else dh_bits
+        if dh_bits and dh_bits not in dh_store.SIZES:
+            return False, f"DH size must be 0 or one of {', '.join(map(str, dh_store.SIZES))}"
+        if key_algorithm == 'ed25519' and not self._openvpn_supports_ed25519():
+            return False, "Ed25519 requires OpenVPN 2.5+ built with OpenSSL 1.1.1+"
+
         try:
             config.CA_DIR.mkdir(parents=True, exist_ok=True)
-            
-            # Генерация приватного ключа CA
-            ca_key = config.CA_DIR / 'ca.key'
-            subprocess.run([
-                self.openssl_bin, 'genrsa', '-out', str(ca_key), '2048'
-            ], check=True, capture_output=True)
-            
-            # Генерация сертификата CA
-            ca_crt = config.CA_DIR / 'ca.crt'
-            subprocess.run([
-                self.openssl_bin, 'req', '-new', '-x509', '-days', '3650',
-                '-key', str(ca_key), '-out', str(ca_crt),
-                '-subj', '/C=RU/ST=Moscow/L=Moscow/O=KursLight/CN=KursLight CA'
-            ], check=True, capture_output=True)
-            
-            # Генерация DH параметров
+
+            # Приватный ключ и самоподписанный сертификат CA
+            ca_key = self._generate_private_key(key_algorithm)
+            ca_cert = self._build_ca_certificate(ca_key)
+
+            self._write_file(config.CA_DIR / 'ca.key', self._key_to_pem(ca_key), 0o600)
+            self._write_file(config.CA_DIR / 'ca.crt', ca_cert.public_bytes(serialization.Encoding.PEM))
+            self.invalidate_ca_cache()
+
+            # DH параметры (EC PKI и режим ECDHE-only обходятся без них — dh none)
             dh_pem = config.CA_DIR / 'dh.pem'
-            subprocess.run([
-                self.openssl_bin, 'dhparam', '-out', str(dh_pem), '2048'
-            ], check=True, capture_output=True)
-            
+            dh_job = None
+            if key_algorithm.startswith('rsa') and dh_bits:
+                if not dh_store.take(dh_bits, dh_pem):
+                    dh_job = dh_store.start_job(dh_bits, dh_pem)
+            else:
+                dh_pem.unlink(missing_ok=True)
+
             # Генерация TLS static key
             ta_key = config.CA_DIR / 'ta.key'
             openvpn_bin = config.OPENVPN_BIN
@@ -51,10 +297,10 @@ class CertificateService:
                 subprocess.run([
                     openvpn_bin, '--genkey', '--secret', str(ta_key)
                 ], check=True, capture_output=True)
-            
-            logger.info("CA certificates generated successfully")
-            return True, None
-            
+
+            logger.info(f"CA certificates generated successfully ({key_algorithm})")
+            return True, {'key_algorithm': key_algorithm, 'dh_job': dh_job}
+
         except subprocess.CalledProcessError as e:
             error_msg = f"Failed to generate CA: {e.stderr.decode() if e.stderr else str(e)}"
             logger.error(error_msg)
@@ -62,151 +308,343 @@ class CertificateService:
         except Exception as e:
             logger.error(f"Error generating CA: {str(e)}")
             return False, str(e)
-    
+
+    @staticmethod
+    def _inventory_row(cert, instance_name, cert_type, path):
+        """Строка реестра сертификатов (см. CertificateModel.record_batch)"""
+        common_name = cert.subject.get_attributes_for_oid(NameOID.COMMON_NAME)[0].value
+        return (
+            format(cert.serial_number, 'x'), common_name, instance_name, cert_type,
+            cert.not_valid_after, cert.fingerprint(hashes.SHA256()).hex(), str(path)
+        )
+
+    @staticmethod
+    def _record_certificates(rows):
+        """Записать сертификаты в реестр (ошибка реестра не отменяет выпуск)"""
+        try:
+            CertificateModel.record_batch(rows)
+        except Exception as e:
+            logger.warning(f"Certificate inventory not updated: {str(e)}")
+
     def generate_server_certificate(self, server_name):
         """Сгенерировать серверный сертификат"""
         try:
             config.CERTS_DIR.mkdir(parents=True, exist_ok=True)
-            
-            # Генерация приватного ключа сервера
-            server_key = config.CERTS_DIR / 'server.key'
-            subprocess.run([
-                self.openssl_bin, 'genrsa', '-out', str(server_key), '2048'
-            ], check=True, capture_output=True)
-            
-            # Создание запроса на сертификат
-            server_csr = config.CERTS_DIR / 'server.csr'
-            subprocess.run([
-                self.openssl_bin, 'req', '-new',
-                '-key', str(server_key), '-out', str(server_csr),
-                '-subj', f'/C=RU/ST=Moscow/L=Moscow/O=KursLight/CN={server_name}'
-            ], check=True, capture_output=True)
-            
-            # Подписание сертификата CA
-            server_crt = config.CERTS_DIR / 'server.crt'
-            subprocess.run([
-                self.openssl_bin, 'x509', '-req', '-days', '3650',
-                '-in', str(server_csr), '-CA', str(config.CA_DIR / 'ca.crt'),
-                '-CAkey', str(config.CA_DIR / 'ca.key'), '-CAcreateserial',
-                '-out', str(server_crt)
-            ], check=True, capture_output=True)
-            
-            # Очистка временных файлов
-            server_csr.unlink(missing_ok=True)
-            
+
+            server_key = self._obtain_private_key(self.get_key_algorithm())
+            server_crt = self._sign_certificate(server_name, server_key.public_key(), server=True)
+
+            self._write_file(config.CERTS_DIR / 'server.key', self._key_to_pem(server_key), 0o600)
+            self._write_file(config.CERTS_DIR / 'server.crt', server_crt.public_bytes(serialization.Encoding.PEM))
+            self._record_certificates([
+                self._inventory_row(server_crt, server_name, 'server', config.CERTS_DIR / 'server.crt')
+            ])
+
             logger.info(f"Server certificate generated for {server_name}")
             return True, None
-            
-        except subprocess.CalledProcessError as e:
-            error_msg = f"Failed to generate server certificate: {e.stderr.decode() if e.stderr else str(e)}"
-            logger.error(error_msg)
-            return False, error_msg
+
         except Exception as e:
             logger.error(f"Error generating server certificate: {str(e)}")
             return False, str(e)
-    
+
     def generate_client_certificate(self, client_name, server_name):
         """Сгенерировать клиентский сертификат"""
         try:
             clients_dir = config.CERTS_DIR / 'clients' / server_name
             clients_dir.mkdir(parents=True, exist_ok=True)
-            
-            # Генерация приватного ключа клиента
-            client_key = clients_dir / f'{client_name}.key'
-            subprocess.run([
-                self.openssl_bin, 'genrsa', '-out', str(client_key), '2048'
-            ], check=True, capture_output=True)
-            
-            # Создание запроса на сертификат
-            client_csr = clients_dir / f'{client_name}.csr'
-            subprocess.run([
-                self.openssl_bin, 'req', '-new',
-                '-key', str(client_key), '-out', str(client_csr),
-                '-subj', f'/C=RU/ST=Moscow/L=Moscow/O=KursLight/CN={client_name}'
-            ], check=True, capture_output=True)
-            
-            # Подписание сертификата CA
-            client_crt = clients_dir / f'{client_name}.crt'
-            subprocess.run([
-                self.openssl_bin, 'x509', '-req', '-days', '3650',
-                '-in', str(client_csr), '-CA', str(config.CA_DIR / 'ca.crt'),
-                '-CAkey', str(config.CA_DIR / 'ca.key'), '-CAcreateserial',
-                '-out', str(client_crt)
-            ], check=True, capture_output=True)
-            
-            # Очистка временных файлов
-            client_csr.unlink(missing_ok=True)
-            
-            # Чтение сертификатов для возврата
-            with open(client_key, 'r') as f:
-                key_content = f.read()
-            with open(client_crt, 'r') as f:
-                cert_content = f.read()
-            with open(config.CA_DIR / 'ca.crt', 'r') as f:
-                ca_content = f.read()
-            
+
+            client_key = self._obtain_private_key(self.get_key_algorithm())
+            client_crt = self._sign_certificate(client_name, client_key.public_key())
+
+            key_pem = self._key_to_pem(client_key)
+            cert_pem = client_crt.public_bytes(serialization.Encoding.PEM)
+            self._write_file(clients_dir / f'{client_name}.key', key_pem, 0o600)
+            self._write_file(clients_dir / f'{client_name}.crt', cert_pem)
+            self._record_certificates([
+                self._inventory_row(client_crt, server_name, 'client', clients_dir / f'{client_name}.crt')
+            ])
+
+            _, _, ca_pem = self._load_ca()
+
             logger.info(f"Client certificate generated: {client_name}")
             return True, {
-                'key': key_content,
-                'cert': cert_content,
-                'ca': ca_content
+                'key': key_pem.decode(),
+                'cert': cert_pem.decode(),
+                'ca': ca_pem.decode()
             }
-            
-        except subprocess.CalledProcessError as e:
-            error_msg = f"Failed to generate client certificate: {e.stderr.decode() if e.stderr else str(e)}"
-            logger.error(error_msg)
-            return False, error_msg
+
         except Exception as e:
             logger.error(f"Error generating client certificate: {str(e)}")
             return False, str(e)
-    
-    def revoke_client_certificate(self, client_name, server_name):
-        """Отозвать клиентский сертификат"""
+
+    def generate_client_certificates_bulk(self, client_names, server_name):
+        """Выпустить сертификаты для списка клиентов сервера.
+
+        Ключи генерируются параллельно в пуле процессов, серийные номера
+        резервируются одним запросом, записи в БД сохраняются одной
+        транзакцией. Генератор отдает результат по каждому клиенту по мере
+        готовности и итоговую запись в конце.
+        """
+        started = time.perf_counter()
+
+        instance = VPNModel.get_by_name(server_name)
+        if not instance:
+            yield {'error': f"VPN instance {server_name} not found"}
+            return
+
+        # Тип проверяется до dict.fromkeys: список или объект в JSON не хешируется
+        invalid = [name for name in client_names if not isinstance(name, str)]
+        names = list(dict.fromkeys(name for name in client_names if isinstance(name, str)))
+        invalid += [name for name in names if not self.CLIENT_NAME_RE.match(name)]
+        for name in invalid:
+            yield {'client_name': name, 'status': 'failed', 'error': 'invalid client name'}
+        names = [name for name in names if name not in invalid]
+
+        clients_dir = config.CERTS_DIR / 'clients' / server_name
+        clients_dir.mkdir(parents=True, exist_ok=True)
+        algorithm = self.get_key_algorithm()
+        serials = self._allocate_serials(len(names))
+        issued = []
+        inventory = []
+
+        workers = min(len(names), os.cpu_count() or 1) or 1
+        with ProcessPoolExecutor(max_workers=workers,
+                                 mp_context=multiprocessing.get_context('forkserver')) as executor:
+            key_pairs = executor.map(
+                generate_key_pair_pem, [algorithm] * len(names),
+                chunksize=max(1, len(names) // (workers * 4))
+            )
+
+            for name, serial, (key_pem, public_pem) in zip(names, serials, key_pairs):
+                try:
+                    public_key = serialization.load_pem_public_key(public_pem)
+                    cert = self._sign_certificate(name, public_key, serial=serial)
+                    cert_pem = cert.public_bytes(serialization.Encoding.PEM)
+                    self._write_file(clients_dir / f'{name}.key', key_pem, 0o600)
+                    self._write_file(clients_dir / f'{name}.crt', cert_pem)
+                except Exception as e:
+                    logger.error(f"Bulk issuance failed for {name}: {str(e)}")
+                    yield {'client_name': name, 'status': 'failed', 'error': str(e)}
+                    continue
+
+                issued.append((name, cert_pem.decode()))
+                inventory.append(self._inventory_row(cert, server_name, 'client', clients_dir / f'{name}.crt'))
+                yield {'client_name': name, 'status': 'issued', 'serial': format(cert.serial_number, 'x')}
+
+        summary = {'issued': len(issued), 'failed': len(invalid) + len(names) - len(issued)}
         try:
-            # Создать CRL если не существует
-            crl_file = config.CA_DIR / 'crl.pem'
-            if not crl_file.exists():
-                subprocess.run([
-                    self.openssl_bin, 'ca', '-gencrl',
-                    '-keyfile', str(config.CA_DIR / 'ca.key'),
-                    '-cert', str(config.CA_DIR / 'ca.crt'),
-                    '-out', str(crl_file)
-                ], check=True, capture_output=True)
-            
-            # Отозвать сертификат
-            client_crt = config.CERTS_DIR / 'clients' / server_name / f'{client_name}.crt'
-            if client_crt.exists():
-                subprocess.run([
-                    self.openssl_bin, 'ca', '-revoke', str(client_crt),
-                    '-keyfile', str(config.CA_DIR / 'ca.key'),
-                    '-cert', str(config.CA_DIR / 'ca.crt')
-                ], check=True, capture_output=True)
-                
-                # Обновить CRL
-                subprocess.run([
-                    self.openssl_bin, 'ca', '-gencrl',
-                    '-keyfile', str(config.CA_DIR / 'ca.key'),
-                    '-cert', str(config.CA_DIR / 'ca.crt'),
-                    '-out', str(crl_file)
-                ], check=True, capture_output=True)
-                
-                logger.info(f"Client certificate revoked: {client_name}")
-                return True, None
-            else:
-                return False, "Client certificate not found"
-                
-        except subprocess.CalledProcessError as e:
-            error_msg = f"Failed to revoke certificate: {e.stderr.decode() if e.stderr else str(e)}"
-            logger.error(error_msg)
-            return False, error_msg
+            summary['updated'], summary['created'] = ClientModel.upsert_certificates_batch(instance['id'], issued)
         except Exception as e:
-            logger.error(f"Error revoking certificate: {str(e)}")
+            summary['error'] = f"Certificates issued but not saved to database: {str(e)}"
+        # После vpn_clients, чтобы реестр получил владельцев новых клиентов
+        self._record_certificates(inventory)
+
+        elapsed = time.perf_counter() - started
+        metrics.observe('cert_bulk_issue_seconds', elapsed)
+        metrics.inc('cert_issued_total', len(issued))
+        summary['duration_ms'] = round(elapsed * 1000, 1)
+        logger.info(f"Bulk issued {len(issued)} client certificates for {server_name} in {elapsed:.1f}s")
+        yield {'summary': summary}
+
+    def revoke_client_certificate(self, client_name, server_name, reason='unspecified'):
+        """Отозвать клиентский сертификат (перевыпуск CRL откладывается, чтобы объединить соседние отзывы)"""
+        success, result = self.revoke_client_certificates([client_name], server_name, reason, debounce=True)
+        if not success:
+            return False, result
+        if result['not_found']:
+            return False, "Client certificate not found"
+        return True, None
+
+    def revoke_client_certificates(self, client_names, server_name, reason='unspecified', debounce=False):
+        """Отозвать сертификаты клиентов сервера пакетом.
+
+        Отзываются все непросроченные сертификаты клиента из реестра, включая
+        замененные продлением или перевыпуском: файл хранит только последний.
+        Все отзывы записываются одной транзакцией, CRL подписывается один раз
+        на пакет (при debounce — один раз на группу близких по времени отзывов).
+        """
+        try:
+            if reason not in self.REVOCATION_REASONS:
+                return False, f"Unsupported revocation reason: {reason}"
+
+            instance = VPNModel.get_by_name(server_name)
+            if not instance:
+                return False, f"VPN instance {server_name} not found"
+
+            not_found = [name for name in client_names if not isinstance(name, str)]
+            names = list(dict.fromkeys(name for name in client_names if isinstance(name, str)))
+            not_found += [name for name in names if not self.CLIENT_NAME_RE.match(name)]
+            names = [name for name in names if self.CLIENT_NAME_RE.match(name)]
+
+            rows = [
+                (serial, name, reason)
+                for serial, name in CertificateModel.get_revocable(instance['id'], names)
+            ]
+            found = {name for _, name, _ in rows}
+            not_found += [name for name in names if name not in found]
+
+            new_serials = RevocationModel.revoke_batch(instance['id'], rows)
+            if new_serials:
+                # Каталог для crl-verify dir обновляется сразу, CRL — после подписи
+                for serial in new_serials:
+                    self._add_revoked_serial_file(serial)
+                if debounce:
+                    self.schedule_crl_update()
+                else:
+                    self.regenerate_crl()
+
+            metrics.inc('cert_revoked_total', len(new_serials))
+            logger.info(f"Revoked {len(new_serials)} client certificates for {server_name}")
+            revoked = {name for serial, name, _ in rows if serial in new_serials}
+            return True, {
+                'revoked': [name for name in names if name in revoked],
+                'already_revoked': [name for name in names if name in found and name not in revoked],
+                'not_found': not_found
+            }
+
+        except Exception as e:
+            logger.error(f"Error revoking certificates: {str(e)}")
             return False, str(e)
-    
-    def get_crl(self):
-        """Получить текущий CRL"""
+
+    def regenerate_crl(self):
+        """Подписать CRL по хранилищу отозванных сертификатов"""
+        with self._crl_lock:
+            started = time.perf_counter()
+            ca_key, ca_cert, _ = self._load_ca()
+            now = datetime.utcnow()
+
+            builder = (
+                x509.CertificateRevocationListBuilder()
+                .issuer_name(ca_cert.subject)
+                .last_update(now)
+                .next_update(now + timedelta(days=config.CRL_VALIDITY_DAYS))
+                # Номер CRL должен расти — миллисекунды не требуют общего счетчика между воркерами
+                .add_extension(x509.CRLNumber(int(time.time() * 1000)), critical=False)
+                .add_extension(
+                    x509.AuthorityKeyIdentifier.from_issuer_public_key(ca_key.public_key()), critical=False
+                )
+            )
+
+            revoked = RevocationModel.get_all()
+            for serial, revoked_at, reason in revoked:
+                if not isinstance(revoked_at, datetime):
+                    revoked_at = datetime.fromisoformat(str(revoked_at)) if revoked_at else now
+                entry = x509.RevokedCertificateBuilder().serial_number(int(serial, 16)).revocation_date(revoked_at)
+                if reason != 'unspecified':
+                    entry = entry.add_extension(x509.CRLReason(self.REVOCATION_REASONS[reason]), critical=False)
+                builder = builder.add_revoked_certificate(entry.build())
+
+            crl = builder.sign(ca_key, self._signature_hash(self._key_algorithm(ca_key)))
+
+            # OpenVPN перечитывает CRL при каждом подключении — файл заменяется атомарно
+            self._write_file(config.CA_DIR / 'crl.pem', crl.public_bytes(serialization.Encoding.PEM))
+            file_cache.invalidate(config.CA_DIR / 'crl.pem')
+
+            self._sync_revoked_serial_files(serial for serial, _, _ in revoked)
+
+            elapsed = time.perf_counter() - started
+            metrics.observe('crl_sign_seconds', elapsed)
+            metrics.set_gauge('crl_entries', len(revoked))
+            logger.info(f"CRL regenerated with {len(revoked)} entries in {elapsed * 1000:.0f} ms")
+            return len(revoked)
+
+    @staticmethod
+    def _add_revoked_serial_file(serial):
+        """Создать файл отозванного серийного номера для crl-verify dir.
+
+        OpenVPN ищет файл с десятичным серийным номером, поэтому проверка при
+        подключении не зависит от размера списка отзыва.
+        """
+        config.CRL_DIR.mkdir(parents=True, exist_ok=True)
+        path = config.CRL_DIR / str(int(serial, 16))
+        if path.exists():
+            return
+        tmp = path.with_name(f'.{path.name}.{os.getpid()}.tmp')
+        tmp.touch(mode=0o644)
+        os.replace(tmp, path)
+
+    def _sync_revoked_serial_files(self, serials):
+        """Привести каталог crl-verify dir в соответствие с хранилищем отзывов"""
+        config.CRL_DIR.mkdir(parents=True, exist_ok=True)
+        expected = {str(int(serial, 16)) for serial in serials}
+        existing = {entry.name for entry in os.scandir(config.CRL_DIR) if not entry.name.startswith('.')}
+
+        for name in expected - existing:
+            self._add_revoked_serial_file(format(int(name), 'x'))
+        for name in existing - expected:
+            (config.CRL_DIR / name).unlink(missing_ok=True)
+
+    def crl_verify_mode(self, instance):
+        """Режим crl-verify инстанса: 'file' (crl.pem) или 'dir' (файл на серийный номер).
+
+        При crl_mode=auto каталог используется, когда CRL достаточно велик,
+        чтобы его разбор при каждом подключении стал заметным.
+        """
+        mode = instance.get('crl_mode') or 'auto'
+        if mode in ('file', 'dir'):
+            return mode
+        return 'dir' if RevocationModel.count() >= config.CRL_DIR_MODE_THRESHOLD else 'file'
+
+    def schedule_crl_update(self):
+        """Запланировать перевыпуск CRL через CRL_DEBOUNCE секунд (повторные вызовы объединяются)"""
+        cls = type(self)
+        with cls._crl_timer_lock:
+            if cls._crl_timer is not None:
+                return
+            timer = threading.Timer(cls.CRL_DEBOUNCE, self._run_scheduled_crl_update)
+            timer.daemon = True
+            cls._crl_timer = timer
+            timer.start()
+
+    def _run_scheduled_crl_update(self):
+        cls = type(self)
+        # Отзывы, пришедшие во время подписи, запланируют следующий перевыпуск
+        with cls._crl_timer_lock:
+            cls._crl_timer = None
+        try:
+            self.regenerate_crl()
+        except Exception as e:
+            logger.error(f"Scheduled CRL update failed: {str(e)}")
+
+    def cleanup_expired(self):
+        """Пометить истекшие сертификаты и убрать их из списка отзыва.
+
+        Истекший сертификат не пройдет проверку срока, поэтому держать его в CRL
+        незачем (RFC 5280, 3.3) — CRL и каталог crl-verify dir перестают расти.
+        """
+        expired = CertificateModel.expire_due()
+        pruned = RevocationModel.prune_expired()
+        if pruned and (config.CA_DIR / 'ca.key').exists():
+            self.regenerate_crl()
+        if expired or pruned:
+            logger.info(f"Expired certificates: {expired} marked, {pruned} removed from CRL")
+        return {'expired': expired, 'pruned': pruned}
+
+    def refresh_crl_if_needed(self):
+        """Перевыпустить CRL, если прошла половина срока его действия"""
         crl_file = config.CA_DIR / 'crl.pem'
+        if not (config.CA_DIR / 'ca.key').exists():
+            return False
         if crl_file.exists():
-            with open(crl_file, 'r') as f:
-                return f.read()
-        return None
\ No newline at end of file
+            crl = x509.load_pem_x509_crl(crl_file.read_bytes())
+            half_life = timedelta(days=config.CRL_VALIDITY_DAYS) / 2
+            if crl.next_update - datetime.utcnow() > half_life:
+                return False
+        self.regenerate_crl()
+        return True
+
+    def get_crl(self):
+        """Получить текущий CRL"""
+        cached = self.get_crl_file()
+        return cached.data.decode() if cached else None
+
+    @staticmethod
+    def get_crl_file():
+        """CRL из кеша файлов (CachedFile с mtime и etag) или None"""
+        return file_cache.get(config.CA_DIR / 'crl.pem')
+
+    @staticmethod
+    def get_tls_auth_key():
+        """Содержимое ta.key или None, если ключ не создан"""
+        cached = file_cache.get(config.CA_DIR / 'ta.key')
+        return cached.data.decode() if cached else None
\ No newline at end of file
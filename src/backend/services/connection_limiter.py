@@ -0,0 +1,259 @@
+import os
+import json
+import time
+import fcntl
+import socket
+import socketserver
+import threading
+import logging
+from ..models.session import SessionModel
+from ..utils.metrics import metrics
+from ..config import config
+
+logger = logging.getLogger(__name__)
+
+class ConnectionLimiter:
+    """Счетчики подключений в памяти для проверки group max_connections и instance max_clients.
+
+    Решение принимается без обращения к БД: счетчики поддерживаются событиями
+    connect/disconnect от скриптов OpenVPN и периодически сверяются с vpn_sessions.
+    """
+
+    # Сессии, о которых БД еще не знает (скрипт не успел записать), не удаляются при сверке
+    RECONCILE_GRACE = 60
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # session_key -> {'instance', 'client', 'ip', 'user_id', 'since'}
+        self._sessions = {}
+        self._instance_counts = {}
+        self._user_counts = {}
+        # Кеш лимитов, обновляется при сверке
+        self._instance_limits = {}
+        self._client_owners = {}
+        self._user_limits = {}
+        self.decisions = {'allow': 0, 'deny_instance': 0, 'deny_group': 0}
+        self.last_reconcile = None
+
+    def connect(self, instance, client_name, session_key, client_ip=''):
+        """Проверить лимиты и учесть подключение. Возвращает (allowed, reason)"""
+        with self._lock:
+            if session_key in self._sessions:
+                return True, None
+
+            user_id = self._client_owners.get((instance, client_name))
+
+            max_clients = self._instance_limits.get(instance)
+            if max_clients and self._instance_counts.get(instance, 0) >= max_clients:
+                self.decisions['deny_instance'] += 1
+                metrics.inc('conn_limiter_decisions_total', decision='deny', reason='instance')
+                return False, f"instance limit {max_clients} reached"
+
+            user_limit = self._user_limits.get(user_id) if user_id is not None else None
+            if user_limit and self._user_counts.get(user_id, 0) >= user_limit:
+                self.decisions['deny_group'] += 1
+                metrics.inc('conn_limiter_decisions_total', decision='deny', reason='group')
+                return False, f"group connection limit {user_limit} reached"
+
+            self._add_session(session_key, instance, client_name, client_ip, user_id, time.time())
+            self.decisions['allow'] += 1
+            metrics.inc('conn_limiter_decisions_total', decision='allow', reason='ok')
+            return True, None
+
+    def disconnect(self, instance, session_key, client_name='', client_ip=''):
+        """Учесть отключение"""
+        with self._lock:
+            if session_key not in self._sessions:
+                # Сессия могла быть восстановлена из БД при сверке под синтетическим ключом
+                session_key = next((
+                    key for key, s in self._sessions.items()
+                    if key.startswith('db:') and s['instance'] == instance
+                    and s['client'] == client_name and s['ip'] == client_ip
+                ), None)
+                if session_key is None:
+                    return False
+            self._remove_session(session_key)
+            return True
+
+    def reconcile(self):
+        """Сверить счетчики и кеш лимитов с БД"""
+        instance_limits = {name: max_clients for name, max_clients in SessionModel.get_instance_limits()}
+        client_owners = {(instance, client): user_id
+                         for instance, client, user_id in SessionModel.get_client_owners()}
+        user_limits = {user_id: limit for user_id, limit in SessionModel.get_user_connection_limits()}
+        open_sessions = SessionModel.get_open_sessions()
+
+        now = time.time()
+        with self._lock:
+            self._instance_limits = instance_limits
+            self._client_owners = client_owners
+            self._user_limits = user_limits
+
+            # Открытые сессии в БД: id -> (instance, client, ip)
+            unmatched = {
+                session_id: (instance, client, ip or '')
+                for session_id, instance, client, ip in open_sessions
+            }
+
+            previous = self._sessions
+            self._sessions = {}
+            self._instance_counts = {}
+            self._user_counts = {}
+
+            # Сессии, восстановленные из БД раньше, сопоставляются по id строки
+            for session_key, s in previous.items():
+                if session_key.startswith('db:'):
+                    if unmatched.pop(int(session_key[3:]), None) is None:
+                        # Сессия закрыта в БД
+                        continue
+                    user_id = client_owners.get((s['instance'], s['client']))
+                    self._add_session(session_key, s['instance'], s['client'], s['ip'], user_id, s['since'])
+
+            # Сессии от скриптов OpenVPN — по (instance, client, ip), каждой достается своя строка
+            by_client = {}
+            for session_id, key in unmatched.items():
+                by_client.setdefault(key, []).append(session_id)
+            for session_key, s in previous.items():
+                if session_key.startswith('db:'):
+                    continue
+                session_ids = by_client.get((s['instance'], s['client'], s['ip']))
+                if session_ids:
+                    del unmatched[session_ids.pop()]
+                elif now - s['since'] > self.RECONCILE_GRACE:
+                    # Отключение было пропущено — сессии нет в БД
+                    continue
+                user_id = client_owners.get((s['instance'], s['client']))
+                self._add_session(session_key, s['instance'], s['client'], s['ip'], user_id, s['since'])
+
+            # Сессии из БД, о которых сервис не знал (например, после перезапуска)
+            for session_id, (instance, client, ip) in unmatched.items():
+                user_id = client_owners.get((instance, client))
+                self._add_session(f"db:{session_id}", instance, client, ip, user_id, now)
+
+            self.last_reconcile = now
+            metrics.set_gauge('conn_limiter_sessions', len(self._sessions))
+
+        logger.debug(f"Connection limiter reconciled: {len(self._sessions)} sessions")
+
+    def stats(self):
+        """Текущее состояние счетчиков"""
+        with self._lock:
+            return {
+                'sessions': len(self._sessions),
+                'instances': dict(self._instance_counts),
+                'decisions': dict(self.decisions),
+                'last_reconcile': self.last_reconcile
+            }
+
+    def _add_session(self, session_key, instance, client_name, client_ip, user_id, since):
+        self._sessions[session_key] = {
+            'instance': instance,
+            'client': client_name,
+            'ip': client_ip,
+            'user_id': user_id,
+            'since': since
+        }
+        self._instance_counts[instance] = self._instance_counts.get(instance, 0) + 1
+        if user_id is not None:
+            self._user_counts[user_id] = self._user_counts.get(user_id, 0) + 1
+
+    def _remove_session(self, session_key):
+        s = self._sessions.pop(session_key)
+        self._instance_counts[s['instance']] = max(0, self._instance_counts.get(s['instance'], 0) - 1)
+        if s['user_id'] is not None:
+            self._user_counts[s['user_id']] = max(0, self._user_counts.get(s['user_id'], 0) - 1)
+
+
+class _LimiterRequestHandler(socketserver.StreamRequestHandler):
+    """Построчный протокол сокета:
+
+    CONNECT <instance> <client_name> <session_key> [client_ip]  -> ALLOW | DENY <reason>
+    DISCONNECT <instance> <session_key> [client_name] [client_ip] -> OK | UNKNOWN
+    STATS -> JSON
+    """
+
+    def handle(self):
+        limiter = self.server.limiter
+        for raw in self.rfile:
+            parts = raw.decode('utf-8', 'replace').split()
+            if not parts:
+                continue
+            command = parts[0].upper()
+            try:
+                if command == 'CONNECT' and len(parts) >= 4:
+                    allowed, reason = limiter.connect(parts[1], parts[2], parts[3],
+                                                      parts[4] if len(parts) > 4 else '')
+                    reply = 'ALLOW' if allowed else f'DENY {reason}'
+                elif command == 'DISCONNECT' and len(parts) >= 3:
+                    found = limiter.disconnect(parts[1], parts[2],
+                                               parts[3] if len(parts) > 3 else '',
+                                               parts[4] if len(parts) > 4 else '')
+                    reply = 'OK' if found else 'UNKNOWN'
+                elif command == 'STATS':
+                    reply = json.dumps(limiter.stats())
+                else:
+                    reply = 'ERROR bad command'
+            except Exception as e:
+                logger.error(f"Connection limiter request error: {str(e)}")
+                reply = 'ERROR internal'
+            self.wfile.write(reply.encode() + b'\n')
+            self.wfile.flush()
+
+
+class _LimiterServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+# Глобальный экземпляр (работает только в процессе-владельце сокета)
+connection_limiter = ConnectionLimiter()
+_server = None
+_lock_file = None
+
+def start_connection_limiter():
+    """Запустить сервер ограничений, если сокетом еще не владеет другой воркер.
+
+    Вызывается периодически во всех воркерах: если владелец упал, его
+    блокировку перехватывает следующий. Возвращает True, если текущий
+    процесс — владелец.
+    """
+    global _server, _lock_file
+
+    if not config.CONNECTION_LIMITS_ENABLED:
+        return False
+    if _server is not None:
+        return True
+
+    socket_path = config.CONNECTION_LIMITER_SOCKET
+    socket_path.parent.mkdir(parents=True, exist_ok=True)
+
+    # Владение определяется flock — блокировка снимается автоматически при падении процесса
+    lock_file = open(socket_path.with_suffix('.lock'), 'w')
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        return False
+
+    try:
+        socket_path.unlink(missing_ok=True)
+        server = _LimiterServer(str(socket_path), _LimiterRequestHandler)
+        os.chmod(socket_path, config.CONNECTION_LIMITER_SOCKET_MODE)
+        server.limiter = connection_limiter
+        connection_limiter.reconcile()
+    except Exception as e:
+        logger.error(f"Failed to start connection limiter: {str(e)}")
+        lock_file.close()
+        return False
+
+    threading.Thread(target=server.serve_forever, daemon=True, name="ConnectionLimiter").start()
+    _server, _lock_file = server, lock_file
+    logger.info(f"Connection limiter listening on {socket_path}")
+    return True
+
+def query_connection_limiter(command, timeout=2):
+    """Отправить команду сервису ограничений (из любого воркера)"""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(str(config.CONNECTION_LIMITER_SOCKET))
+        sock.sendall(command.encode() + b'\n')
+        return sock.makefile('rb').readline().decode().strip()
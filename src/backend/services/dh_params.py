@@ -0,0 +1,210 @@
+import os
+import json
+import time
+import uuid
+import fcntl
+import shutil
+import logging
+import threading
+import subprocess
+import psutil
+from ..utils.metrics import metrics
+from ..config import config
+
+logger = logging.getLogger(__name__)
+
+class DHParamStore:
+    """Хранилище заранее сгенерированных DH параметров и фоновая генерация.
+
+    Готовые наборы лежат в CERTS_DIR/dhparams/<bits>/ и забираются новым CA
+    атомарным переименованием. Состояние задач генерации хранится в файлах
+    RUN_DIR/dh-jobs, поэтому прогресс видит любой воркер.
+    """
+
+    SIZES = (2048, 3072, 4096)
+
+    # Пополнение хранилища только при загрузке CPU ниже порога
+    IDLE_CPU_PERCENT = 30
+
+    # Файлы завершенных задач хранятся сутки
+    JOB_TTL = 86400
+
+    def __init__(self, store_dir=None, jobs_dir=None, target=None):
+        self.store_dir = store_dir or config.CERTS_DIR / 'dhparams'
+        self.jobs_dir = jobs_dir or config.RUN_DIR / 'dh-jobs'
+        self.target = config.DH_STORE_TARGET if target is None else target
+        self.openssl_bin = shutil.which('openssl') or '/usr/bin/openssl'
+
+    def available(self):
+        """Количество готовых наборов по размерам"""
+        counts = {}
+        for bits in self.SIZES:
+            try:
+                counts[bits] = sum(1 for e in os.scandir(self.store_dir / str(bits)) if e.name.endswith('.pem'))
+            except FileNotFoundError:
+                counts[bits] = 0
+        return counts
+
+    def take(self, bits, destination):
+        """Установить готовый набор в destination. Возвращает False, если наборов нет"""
+        directory = self.store_dir / str(bits)
+        try:
+            entries = sorted(e.name for e in os.scandir(directory) if e.name.endswith('.pem'))
+        except FileNotFoundError:
+            return False
+
+        for name in entries:
+            try:
+                # rename атомарен — один набор не достанется двум CA
+                os.replace(directory / name, destination)
+            except FileNotFoundError:
+                continue
+            os.chmod(destination, 0o644)
+            metrics.inc('dh_store_taken_total', bits=str(bits))
+            return True
+
+        return False
+
+    def start_job(self, bits, destination):
+        """Запустить генерацию DH параметров в фоне, вернуть описание задачи"""
+        if bits not in self.SIZES:
+            raise ValueError(f"DH size must be one of {', '.join(map(str, self.SIZES))}")
+
+        self.jobs_dir.mkdir(parents=True, exist_ok=True)
+        self._cleanup_jobs()
+
+        job = {
+            'id': uuid.uuid4().hex,
+            'bits': bits,
+            'status': 'running',
+            'candidates': 0,
+            'elapsed': 0,
+            'started_at': time.time(),
+            'finished_at': None,
+            'error': None,
+            'pid': os.getpid()
+        }
+        self._save_job(job)
+
+        threading.Thread(
+            target=self._run_job, args=(job, destination), daemon=True, name=f"DHJob-{job['id'][:8]}"
+        ).start()
+        return self._public_job(job)
+
+    def get_job(self, job_id):
+        """Получить состояние задачи генерации"""
+        try:
+            job = json.loads((self.jobs_dir / f'{job_id}.json').read_text())
+        except (FileNotFoundError, ValueError):
+            return None
+
+        # Задача осталась в статусе running, но воркер, который ее выполнял, завершился
+        if job['status'] == 'running' and not psutil.pid_exists(job['pid']):
+            job.update(status='failed', error='interrupted')
+
+        return self._public_job(job)
+
+    def refill(self):
+        """Догенерировать один недостающий набор, если машина простаивает"""
+        if self.target <= 0:
+            return False
+
+        missing = [bits for bits, count in self.available().items() if count < self.target]
+        if not missing:
+            return False
+
+        if psutil.cpu_percent(interval=1) > self.IDLE_CPU_PERCENT:
+            return False
+
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+
+        # Генерирует только один воркер
+        with open(self.store_dir / '.refill.lock', 'w') as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                return False
+
+            bits = missing[0]
+            directory = self.store_dir / str(bits)
+            directory.mkdir(exist_ok=True)
+
+            started = time.perf_counter()
+            self._generate(bits, directory / f'{time.time_ns()}-{uuid.uuid4().hex}.pem')
+            elapsed = time.perf_counter() - started
+
+            metrics.observe('dh_generate_seconds', elapsed, bits=str(bits))
+            logger.info(f"DH store refilled with {bits}-bit parameters in {elapsed:.0f}s")
+            return True
+
+    def _run_job(self, job, destination):
+        last_saved = 0
+
+        def progress(candidates):
+            nonlocal last_saved
+            job['candidates'] = candidates
+            job['elapsed'] = round(time.time() - job['started_at'], 1)
+            # Файл задачи обновляется не чаще раза в секунду
+            if time.monotonic() - last_saved >= 1:
+                last_saved = time.monotonic()
+                self._save_job(job)
+
+        try:
+            self._generate(job['bits'], destination, progress)
+            job['status'] = 'done'
+            metrics.observe('dh_generate_seconds', time.time() - job['started_at'], bits=str(job['bits']))
+            logger.info(f"DH parameters ({job['bits']} bit) generated: {destination}")
+        except Exception as e:
+            job['status'] = 'failed'
+            job['error'] = str(e)
+            logger.error(f"DH generation job {job['id']} failed: {str(e)}")
+
+        job['finished_at'] = time.time()
+        job['elapsed'] = round(job['finished_at'] - job['started_at'], 1)
+        self._save_job(job)
+
+    def _generate(self, bits, output, progress=None):
+        """Сгенерировать DH параметры через openssl dhparam (запись через временный файл)"""
+        tmp = output.with_name(output.name + '.tmp')
+        process = subprocess.Popen(
+            [self.openssl_bin, 'dhparam', '-out', str(tmp), str(bits)],
+            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+        )
+
+        # openssl печатает '.' на каждое проверенное простое-кандидат
+        candidates = 0
+        while True:
+            chunk = process.stderr.read1(4096)
+            if not chunk:
+                break
+            candidates += chunk.count(b'.')
+            if progress:
+                progress(candidates)
+
+        if process.wait() != 0:
+            tmp.unlink(missing_ok=True)
+            raise RuntimeError(f"openssl dhparam exited with code {process.returncode}")
+
+        os.replace(tmp, output)
+
+    def _save_job(self, job):
+        path = self.jobs_dir / f"{job['id']}.json"
+        tmp = path.with_suffix('.tmp')
+        tmp.write_text(json.dumps(job))
+        os.replace(tmp, path)
+
+    def _cleanup_jobs(self):
+        cutoff = time.time() - self.JOB_TTL
+        for entry in os.scandir(self.jobs_dir):
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    os.unlink(entry.path)
+            except FileNotFoundError:
+                continue
+
+    @staticmethod
+    def _public_job(job):
+        return {key: value for key, value in job.items() if key != 'pid'}
+
+# Глобальное хранилище DH параметров
+dh_store = DHParamStore()
@@ -1,5 +1,6 @@
 from . import BaseService
 from ..models.group import GroupModel
+from .permission_service import permission_service, permission_mask, permission_names
 import logging
 
 logger = logging.getLogger(__name__)
@@ -22,7 +23,8 @@ class GroupService(BaseService):
                     'vpn_access': group['vpn_access'],
                     'max_connections': group['max_connections'],
                     'bandwidth_limit': group['bandwidth_limit'],
-                    'access_hours': group['access_hours']
+                    'access_hours': group['access_hours'],
+                    'permissions': permission_names(group.get('permissions') or 0)
                 }
                 
                 if include_user_count:
@@ -36,8 +38,8 @@ class GroupService(BaseService):
             logger.error(f"Error getting all groups: {str(e)}")
             return None, "Failed to retrieve groups"
     
-    def create_group(self, group_data):
-        """Создать новую группу"""
+    def create_group(self, group_data, actor):
+        """Создать новую группу (actor — пользователь из g.user)"""
         try:
             self.validate_required_fields(group_data, ['name'])
             
@@ -46,13 +48,17 @@ class GroupService(BaseService):
             if existing_group:
                 raise ValueError("Group name already exists")
             
+            permissions = permission_mask(group_data.get('permissions'))
+            self._check_grantable(actor, permissions)
+            
             group_id = GroupModel.create(
                 name=group_data['name'],
                 description=group_data.get('description', ''),
                 vpn_access=group_data.get('vpn_access', True),
                 max_connections=group_data.get('max_connections', 5),
                 bandwidth_limit=group_data.get('bandwidth_limit', 0),
-                access_hours=group_data.get('access_hours', '00:00-23:59')
+                access_hours=group_data.get('access_hours', '00:00-23:59'),
+                permissions=permissions
             )
             
             if not group_id:
@@ -61,14 +67,16 @@ class GroupService(BaseService):
             logger.info(f"Group created successfully: {group_data['name']} (ID: {group_id})")
             return group_id, None
             
+        except PermissionError:
+            raise
         except ValueError as e:
             return None, str(e)
         except Exception as e:
             logger.error(f"Error creating group {group_data.get('name', 'unknown')}: {str(e)}")
             return None, "Failed to create group"
     
-    def update_group(self, group_id, update_data):
-        """Обновить данные группы"""
+    def update_group(self, group_id, update_data, actor):
+        """Обновить данные группы (actor — пользователь из g.user)"""
         try:
             group = GroupModel.get_by_id(group_id)
             if not group:
@@ -79,19 +87,31 @@ class GroupService(BaseService):
             if group['name'] in default_groups:
                 return False, "Cannot modify default groups"
             
-            allowed_fields = ['description', 'vpn_access', 'max_connections', 'bandwidth_limit', 'access_hours']
+            allowed_fields = ['description', 'vpn_access', 'max_connections', 'bandwidth_limit', 'access_hours', 'permissions']
             update_fields = {k: v for k, v in update_data.items() if k in allowed_fields}
             
             if not update_fields:
                 return False, "No valid fields to update"
             
+            if 'permissions' in update_fields:
+                update_fields['permissions'] = permission_mask(update_fields['permissions'])
+                # Права группы меняет только тот, у кого есть и прежние, и новые права
+                self._check_grantable(actor, update_fields['permissions'] | (group.get('permissions') or 0))
+            
             success = GroupModel.update(group_id, **update_fields)
             if not success:
                 return False, "Failed to update group"
             
+            if 'permissions' in update_fields:
+                permission_service.invalidate()
+            
             logger.info(f"Group updated successfully: {group['name']} (ID: {group_id})")
             return True, None
             
+        except PermissionError:
+            raise
+        except ValueError as e:
+            return False, str(e)
         except Exception as e:
             logger.error(f"Error updating group {group_id}: {str(e)}")
             return False, "Failed to update group"
@@ -112,6 +132,9 @@ class GroupService(BaseService):
             if not success:
                 return False, "Failed to delete group"
             
+            # Участники группы теряют ее права
+            permission_service.invalidate()
+            
             logger.info(f"Group deleted successfully: {group['name']} (ID: {group_id})")
             return True, None
             
@@ -119,6 +142,13 @@ class GroupService(BaseService):
             logger.error(f"Error deleting group {group_id}: {str(e)}")
             return False, "Failed to delete group"
     
+    @staticmethod
+    def _check_grantable(actor, mask):
+        """PermissionError, если в маске есть права, которых нет у actor"""
+        if not permission_service.can_grant(actor, mask):
+            missing = permission_names(mask & ~permission_service.user_mask(actor))
+            raise PermissionError(f"Cannot grant permissions you do not hold: {', '.join(missing)}")
+    
     def _get_group_user_count(self, group_id):
         """Получить количество пользователей в группе"""
         try:
@@ -0,0 +1,185 @@
+import os
+import time
+import uuid
+import fcntl
+import hashlib
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import psutil
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa, ec, ed25519
+from ..utils.metrics import metrics
+from ..config import config
+
+logger = logging.getLogger(__name__)
+
+# Функции генерации выполняются и в дочерних процессах, поэтому модуль
+# не импортирует модели и сервисы
+
+def generate_private_key(algorithm='rsa2048'):
+    """Сгенерировать приватный ключ заданного алгоритма"""
+    if algorithm == 'rsa2048':
+        return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    if algorithm == 'rsa4096':
+        return rsa.generate_private_key(public_exponent=65537, key_size=4096)
+    if algorithm == 'ec-p256':
+        return ec.generate_private_key(ec.SECP256R1())
+    if algorithm == 'ec-p384':
+        return ec.generate_private_key(ec.SECP384R1())
+    if algorithm == 'ed25519':
+        return ed25519.Ed25519PrivateKey.generate()
+    raise ValueError(f"Unsupported key algorithm: {algorithm}")
+
+def generate_key_pair_pem(algorithm):
+    """Сгенерировать ключ и вернуть (приватный PEM, публичный PEM)"""
+    key = generate_private_key(algorithm)
+    private_pem = key.private_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PrivateFormat.PKCS8,
+        encryption_algorithm=serialization.NoEncryption()
+    )
+    public_pem = key.public_key().public_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PublicFormat.SubjectPublicKeyInfo
+    )
+    return private_pem, public_pem
+
+def _generate_encrypted_key(passphrase):
+    """Сгенерировать ключ пула и вернуть его зашифрованный PEM"""
+    key = generate_private_key(KeyPool.ALGORITHM)
+    return key.private_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PrivateFormat.PKCS8,
+        encryption_algorithm=serialization.BestAvailableEncryption(passphrase)
+    )
+
+class KeyPool:
+    """Пул заранее сгенерированных приватных ключей.
+
+    Ключи хранятся зашифрованными по одному файлу в CERTS_DIR/keypool. Выдача
+    ключа — атомарное переименование файла, поэтому пул безопасно делят все
+    воркеры на хосте.
+    """
+
+    # Пул хранит ключи одного алгоритма
+    ALGORITHM = 'rsa2048'
+
+    # Захваченные, но не удаленные файлы (процесс упал) чистятся через час
+    STALE_CLAIM_AGE = 3600
+
+    def __init__(self, pool_dir=None, size=None):
+        self.pool_dir = pool_dir or config.CERTS_DIR / 'keypool'
+        self.size = config.KEY_POOL_SIZE if size is None else size
+        self._passphrase = hashlib.sha256(b'kurslight-keypool:' + config.SECRET_KEY.encode()).digest()
+
+    def acquire(self):
+        """Забрать ключ из пула. Возвращает None, если пул пуст"""
+        if self.size <= 0:
+            return None
+
+        try:
+            entries = sorted(e.name for e in os.scandir(self.pool_dir) if e.name.endswith('.pem'))
+        except FileNotFoundError:
+            return None
+
+        for name in entries:
+            path = self.pool_dir / name
+            claimed = path.with_name(f'{name}.{os.getpid()}.{uuid.uuid4().hex}.claimed')
+            try:
+                os.rename(path, claimed)
+            except FileNotFoundError:
+                # Ключ уже забрал другой поток или воркер
+                continue
+
+            try:
+                key = serialization.load_pem_private_key(claimed.read_bytes(), password=self._passphrase)
+            except Exception as e:
+                logger.error(f"Broken key in pool {name}: {str(e)}")
+                continue
+            finally:
+                claimed.unlink(missing_ok=True)
+
+            metrics.inc('key_pool_acquired_total')
+            return key
+
+        metrics.inc('key_pool_empty_total')
+        return None
+
+    def available(self):
+        """Количество готовых ключей"""
+        try:
+            return sum(1 for e in os.scandir(self.pool_dir) if e.name.endswith('.pem'))
+        except FileNotFoundError:
+            return 0
+
+    def refill(self):
+        """Догенерировать ключи до целевого размера пула"""
+        if self.size <= 0:
+            return 0
+
+        self.pool_dir.mkdir(parents=True, exist_ok=True)
+        os.chmod(self.pool_dir, 0o700)
+
+        # Пополняет только один воркер, остальные пропускают проход
+        with open(self.pool_dir / '.refill.lock', 'w') as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                return 0
+            return self._refill_locked()
+
+    def _refill_locked(self):
+        self._cleanup_stale()
+
+        missing = self.size - self.available()
+        if missing <= 0:
+            metrics.set_gauge('key_pool_available', self.size)
+            return 0
+
+        workers = min(missing, self._idle_cores())
+        started = time.perf_counter()
+
+        # forkserver: не форкаем многопоточный процесс веб-сервера напрямую
+        with ProcessPoolExecutor(max_workers=workers,
+                                 mp_context=multiprocessing.get_context('forkserver')) as executor:
+            for pem in executor.map(_generate_encrypted_key, [self._passphrase] * missing):
+                self._store(pem)
+
+        elapsed = time.perf_counter() - started
+        metrics.observe('key_pool_refill_seconds', elapsed)
+        metrics.set_gauge('key_pool_available', self.available())
+        logger.info(f"Key pool refilled with {missing} keys using {workers} processes in {elapsed:.1f}s")
+        return missing
+
+    def _store(self, pem):
+        """Атомарно положить ключ в пул (запись во временный файл и rename)"""
+        name = f'{time.time_ns()}-{uuid.uuid4().hex}'
+        tmp = self.pool_dir / f'{name}.tmp'
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(pem)
+        os.rename(tmp, self.pool_dir / f'{name}.pem')
+
+    def _cleanup_stale(self):
+        """Удалить незавершенные временные и захваченные файлы"""
+        cutoff = time.time() - self.STALE_CLAIM_AGE
+        for entry in os.scandir(self.pool_dir):
+            if entry.name.endswith(('.claimed', '.tmp')):
+                try:
+                    if entry.stat().st_mtime < cutoff:
+                        os.unlink(entry.path)
+                except FileNotFoundError:
+                    continue
+
+    @staticmethod
+    def _idle_cores():
+        """Количество незагруженных ядер (минимум одно)"""
+        try:
+            usage = psutil.cpu_percent(interval=0.5, percpu=True)
+            return max(1, sum(1 for percent in usage if percent < 50))
+        except Exception:
+            return 1
+
+# Глобальный пул ключей
+key_pool = KeyPool()
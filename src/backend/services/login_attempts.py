@@ -0,0 +1,176 @@
+import math
+import time
+import threading
+import logging
+from datetime import datetime, timezone
+from ..models.user import UserModel
+from ..utils.metrics import metrics
+from ..utils.shared_counters import shared_counters
+from ..config import config
+
+logger = logging.getLogger(__name__)
+
+class LoginAttemptTracker:
+    """Счетчики неудачных входов с затуханием в общей памяти и фоновой записью в БД.
+
+    Каждая неудачная попытка добавляет 1 к счету пользователя, счет убывает
+    вдвое за LOGIN_ATTEMPT_HALF_LIFE. Достиг LOGIN_MAX_ATTEMPTS — вход
+    блокируется на LOGIN_LOCKOUT_SECONDS. Счет и блокировка лежат в
+    shared_counters, общей для всех воркеров хоста, и меняются атомарно,
+    поэтому порог не умножается на число воркеров, а решение о блокировке
+    принимается без обращения к БД.
+
+    Счет хранится одним числом — моментом, когда он затухнет до 0.5
+    (score = 0.5 * 2 ** ((decays_at - now) / half_life)); к этому же моменту
+    слот истекает и освобождается сам, так что перебор случайных имен не
+    раздувает память.
+
+    Изменения копятся и записываются в users пакетом (failed_login_attempts,
+    locked_until, last_login) — только для сохранности; тем же проходом из
+    БД читаются блокировки, поставленные на других хостах или до перезапуска,
+    и снимаются блокировки, снятые в БД. Очередь записи ограничена
+    LOGIN_TRACKER_SIZE: при переполнении неудачные попытки новых имен не
+    ставятся в очередь (метрика login_attempts_dropped_total), а блокировки и
+    успешные входы ставятся всегда.
+    """
+
+    def __init__(self, table=shared_counters):
+        self._table = table
+        self._lock = threading.Lock()
+        # username -> (attempts, locked_until, last_login) для записи в БД
+        self._pending = {}
+        # username -> locked_until, прочитанные из БД прошлой синхронизацией
+        self._db_locks = {}
+
+    def is_locked(self, username):
+        """Заблокирован ли вход (только общая память)"""
+        locked_until, _ = self._table.get(self._lock_key(username))
+        return bool(locked_until and locked_until > time.time())
+
+    def record_failure(self, username):
+        """Учесть неудачную попытку. Возвращает True, если вход теперь заблокирован"""
+        half_life = config.LOGIN_ATTEMPT_HALF_LIFE
+
+        def count_failure(current, now):
+            (decays_at, _), (locked_until, _) = current
+            score = (0.5 * 2 ** ((decays_at - now) / half_life) if decays_at else 0.0) + 1
+            decays_at = now + half_life * math.log2(2 * score)
+            if round(score) >= config.LOGIN_MAX_ATTEMPTS and not locked_until:
+                locked_until = now + config.LOGIN_LOCKOUT_SECONDS
+                logger.warning(f"Login locked for user {username} for {config.LOGIN_LOCKOUT_SECONDS}s")
+                lock = (locked_until, locked_until)
+            else:
+                lock = (None, None)
+            return [(decays_at, decays_at), lock], (score, locked_until)
+
+        score, locked_until = self._table.update_many(
+            [self._score_key(username), self._lock_key(username)], count_failure
+        )
+        attempts = round(score)
+        locked = attempts >= config.LOGIN_MAX_ATTEMPTS
+        self._queue(username, (attempts, locked_until, None))
+
+        metrics.inc('login_attempts_total', result='locked' if locked else 'failure')
+        return locked
+
+    def record_success(self, username):
+        """Сбросить счетчик после успешного входа и отметить last_login"""
+        # Запись с истекшим сроком освобождает слот
+        self._table.update_many(
+            [self._score_key(username), self._lock_key(username)],
+            lambda current, now: ([(0.0, 0.0), (0.0, 0.0)], None),
+        )
+        with self._lock:
+            # Успешный вход ставится в очередь всегда — его нельзя потерять
+            self._pending[username] = (0, None, time.time())
+        metrics.inc('login_attempts_total', result='success')
+
+    def _queue(self, username, state):
+        attempts, locked_until, last_login = state
+        with self._lock:
+            # Блокировку нельзя терять: иначе ее снимет следующая синхронизация
+            if (locked_until is not None or username in self._pending
+                    or len(self._pending) < config.LOGIN_TRACKER_SIZE):
+                self._pending[username] = state
+                return
+        metrics.inc('login_attempts_dropped_total')
+
+    def flush(self):
+        """Записать накопленные изменения и подтянуть блокировки из БД (фоновая задача)"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+
+        if pending:
+            rows = [
+                (username, attempts, self._timestamp(locked_until), self._timestamp(last_login), last_login is not None)
+                for username, (attempts, locked_until, last_login) in pending.items()
+            ]
+            try:
+                UserModel.save_login_attempts(rows)
+            except Exception:
+                # Вернуть в очередь, не затирая более свежие изменения
+                with self._lock:
+                    for username, state in pending.items():
+                        self._pending.setdefault(username, state)
+                raise
+
+        self._sync_lockouts()
+        return len(pending)
+
+    def _sync_lockouts(self):
+        """Принять блокировки из БД; снятые в БД блокировки снимаются и здесь.
+
+        Снимается только блокировка, которую прошлая синхронизация прочитала
+        из БД и которая с тех пор не продлевалась и не ждет записи:
+        блокировки, еще не дошедшие до БД, не трогаются.
+        """
+        now = time.time()
+        locked = {
+            username: locked_until.replace(tzinfo=timezone.utc).timestamp()
+            for username, attempts, locked_until in UserModel.get_login_lockouts()
+        }
+
+        def set_lock(locked_until):
+            def apply(current, expires_at, now):
+                if current is not None and current >= locked_until:
+                    return None, None, None
+                return locked_until, locked_until, None
+            return apply
+
+        def clear_lock(previous):
+            def apply(current, expires_at, now):
+                # Точность TIMESTAMP в БД — микросекунды
+                if current is None or current > previous + 1e-3:
+                    return None, None, None
+                return 0.0, 0.0, None
+            return apply
+
+        for username, locked_until in locked.items():
+            self._table.update(self._lock_key(username), set_lock(locked_until))
+
+        with self._lock:
+            pending = set(self._pending)
+        for username, previous in self._db_locks.items():
+            if username not in locked and username not in pending and previous > now:
+                self._table.update(self._lock_key(username), clear_lock(previous))
+        self._db_locks = locked
+
+        metrics.set_gauge('login_locked_users', len(locked))
+
+    @staticmethod
+    def _score_key(username):
+        return f"login:score:{username}"
+
+    @staticmethod
+    def _lock_key(username):
+        return f"login:lock:{username}"
+
+    @staticmethod
+    def _timestamp(value):
+        # В БД locked_until хранится в UTC без зоны и сравнивается с datetime.utcnow(),
+        # а не с CURRENT_TIMESTAMP (тот в часовом поясе сессии БД)
+        return datetime.utcfromtimestamp(value) if value else None
+
+
+# Глобальный учет попыток входа
+login_attempts = LoginAttemptTracker()
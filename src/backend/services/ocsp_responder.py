@@ -0,0 +1,241 @@
+import os
+import time
+import fcntl
+import struct
+import logging
+import threading
+from datetime import datetime, timedelta
+from cryptography import x509
+from cryptography.x509 import ocsp
+from cryptography.hazmat.primitives import hashes, serialization
+from .certificate_service import CertificateService
+from ..models.certificate import CertificateModel
+from ..utils.metrics import metrics
+from ..config import config
+
+logger = logging.getLogger(__name__)
+
+class OCSPResponder:
+    """OCSP-ответчик с заранее подписанными ответами.
+
+    Ответы для всех действующих и отозванных серийных номеров подписываются
+    в фоне (один воркер — владелец блокировки) и сохраняются в общий файл,
+    остальные воркеры перечитывают его по mtime. На пути запроса только
+    разбор запроса и поиск в словаре — без подписи.
+
+    Ответы не содержат nonce запроса (RFC 8954 разрешает это ответчикам
+    с заранее подписанными ответами). CertID строится по SHA-1 из хешей
+    имени и ключа CA и серийного номера из реестра, а не из файла
+    сертификата: перевыпуск перезаписывает файл, а замененный или
+    отозванный серийный номер должен получать ответ о себе. Запросы с
+    другим алгоритмом или хешами другого CA отклоняются (UNAUTHORIZED).
+    """
+
+    # Как часто воркер проверяет mtime общего файла ответов
+    RELOAD_CHECK_INTERVAL = 1.0
+    # Заголовок общего файла: магия, SHA-1 имени CA, SHA-1 ключа CA
+    CACHE_MAGIC = b'KLOCSP02'
+
+    def __init__(self, cache_file=None):
+        self.cache_file = cache_file or config.RUN_DIR / 'ocsp-responses.bin'
+        # serial -> DER ответа
+        self._responses = {}
+        # serial -> (status, signed_at) — только у владельца
+        self._signed = {}
+        self._issuer_name_hash = None
+        self._issuer_key_hash = None
+        self._cache_mtime = None
+        self._checked_at = 0
+        self._lock = threading.Lock()
+        self._malformed = ocsp.OCSPResponseBuilder.build_unsuccessful(
+            ocsp.OCSPResponseStatus.MALFORMED_REQUEST
+        ).public_bytes(serialization.Encoding.DER)
+        self._unauthorized = ocsp.OCSPResponseBuilder.build_unsuccessful(
+            ocsp.OCSPResponseStatus.UNAUTHORIZED
+        ).public_bytes(serialization.Encoding.DER)
+
+    def respond(self, request_der):
+        """Вернуть DER ответа на DER запроса"""
+        now = time.monotonic()
+        if now - self._checked_at >= self.RELOAD_CHECK_INTERVAL:
+            self._checked_at = now
+            self._reload_if_changed()
+
+        try:
+            request = ocsp.load_der_ocsp_request(request_der)
+        except ValueError:
+            metrics.inc('ocsp_requests_total', result='malformed')
+            return self._malformed
+
+        # Ответы подписаны только для CertID по SHA-1 этого CA
+        if (not isinstance(request.hash_algorithm, hashes.SHA1)
+                or request.issuer_name_hash != self._issuer_name_hash
+                or request.issuer_key_hash != self._issuer_key_hash):
+            metrics.inc('ocsp_requests_total', result='unauthorized')
+            return self._unauthorized
+
+        response = self._responses.get(request.serial_number)
+        if response is None:
+            metrics.inc('ocsp_requests_total', result='unknown')
+            return self._unauthorized
+
+        metrics.inc('ocsp_requests_total', result='ok')
+        return response
+
+    def refresh(self, entries=None):
+        """Подписать новые, изменившие статус и скоро истекающие ответы.
+
+        entries — последовательность (serial, status, revoked_at, reason),
+        по умолчанию берется из реестра сертификатов. Возвращает количество
+        подписанных ответов.
+        """
+        if entries is None:
+            entries = CertificateModel.get_ocsp_entries()
+
+        service = CertificateService()
+        ca_key, ca_cert, _ = service._load_ca()
+        signature_hash = service._signature_hash(service._key_algorithm(ca_key))
+        issuer_name_hash, issuer_key_hash = self._issuer_hashes(ca_cert)
+        now = datetime.utcnow()
+        validity = timedelta(hours=config.OCSP_VALIDITY_HOURS)
+        started = time.perf_counter()
+
+        with self._lock:
+            # Сменился CA — все ответы подписываются заново
+            if (issuer_name_hash, issuer_key_hash) != (self._issuer_name_hash, self._issuer_key_hash):
+                self._signed = {}
+            responses = dict(self._responses)
+            signed = {}
+            count = 0
+
+            for serial_hex, status, revoked_at, reason in entries:
+                serial = int(serial_hex, 16)
+                cert_status = ocsp.OCSPCertStatus.REVOKED if status == 'revoked' else ocsp.OCSPCertStatus.GOOD
+                previous = self._signed.get(serial)
+
+                # Ответ еще свежий и статус не изменился
+                if previous and previous[0] == cert_status and now - previous[1] < validity / 2:
+                    signed[serial] = previous
+                    continue
+
+                if cert_status == ocsp.OCSPCertStatus.REVOKED:
+                    if not isinstance(revoked_at, datetime):
+                        revoked_at = datetime.fromisoformat(str(revoked_at)) if revoked_at else now
+                    revocation_reason = CertificateService.REVOCATION_REASONS.get(reason)
+                    if revocation_reason == x509.ReasonFlags.unspecified:
+                        revocation_reason = None
+                else:
+                    revoked_at = revocation_reason = None
+
+                builder = (
+                    ocsp.OCSPResponseBuilder()
+                    .add_response_by_hash(
+                        issuer_name_hash=issuer_name_hash, issuer_key_hash=issuer_key_hash,
+                        serial_number=serial, algorithm=hashes.SHA1(),
+                        cert_status=cert_status, this_update=now, next_update=now + validity,
+                        revocation_time=revoked_at, revocation_reason=revocation_reason
+                    )
+                    .responder_id(ocsp.OCSPResponderEncoding.HASH, ca_cert)
+                )
+                responses[serial] = builder.sign(ca_key, signature_hash).public_bytes(serialization.Encoding.DER)
+                signed[serial] = (cert_status, now)
+                count += 1
+
+            # Истекшие и удаленные из реестра серийные номера больше не обслуживаются
+            removed = len(responses) - len(signed)
+            responses = {serial: der for serial, der in responses.items() if serial in signed}
+
+            self._signed = signed
+            self._responses = responses
+            self._issuer_name_hash = issuer_name_hash
+            self._issuer_key_hash = issuer_key_hash
+
+        if count or removed:
+            self._save()
+
+        elapsed = time.perf_counter() - started
+        metrics.set_gauge('ocsp_responses', len(responses))
+        metrics.inc('ocsp_signed_total', count)
+        if count:
+            logger.info(f"OCSP responses signed: {count} of {len(responses)} in {elapsed:.1f}s")
+        return count
+
+    @staticmethod
+    def _issuer_hashes(ca_cert):
+        """SHA-1 имени и открытого ключа CA, как в CertID (RFC 6960, 4.1.1)"""
+        name_hash = hashes.Hash(hashes.SHA1())
+        name_hash.update(ca_cert.subject.public_bytes())
+        # Идентификатор ключа по RFC 5280 — тот же SHA-1 от BIT STRING открытого ключа
+        key_hash = x509.SubjectKeyIdentifier.from_public_key(ca_cert.public_key()).digest
+        return name_hash.finalize(), key_hash
+
+    def _save(self):
+        """Записать ответы в общий файл: заголовок, затем [serial len][serial][DER len][DER]..."""
+        chunks = [self.CACHE_MAGIC, self._issuer_name_hash, self._issuer_key_hash]
+        for serial, der in self._responses.items():
+            serial_bytes = serial.to_bytes((serial.bit_length() + 7) // 8 or 1, 'big')
+            chunks.append(struct.pack('>H', len(serial_bytes)) + serial_bytes + struct.pack('>I', len(der)) + der)
+
+        self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.cache_file.with_suffix('.tmp')
+        tmp.write_bytes(b''.join(chunks))
+        os.replace(tmp, self.cache_file)
+
+    def _reload_if_changed(self):
+        """Перечитать общий файл ответов, если его обновил владелец"""
+        try:
+            mtime = os.stat(self.cache_file).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime == self._cache_mtime:
+            return
+
+        data = self.cache_file.read_bytes()
+        header_size = len(self.CACHE_MAGIC) + 40
+        if not data.startswith(self.CACHE_MAGIC) or len(data) < header_size:
+            # Файл прежнего формата — его перепишет владелец при следующей подписи
+            return
+        issuer_name_hash = data[len(self.CACHE_MAGIC):len(self.CACHE_MAGIC) + 20]
+        issuer_key_hash = data[len(self.CACHE_MAGIC) + 20:header_size]
+        responses = {}
+        offset = header_size
+        while offset < len(data):
+            (serial_len,) = struct.unpack_from('>H', data, offset)
+            offset += 2
+            serial = int.from_bytes(data[offset:offset + serial_len], 'big')
+            offset += serial_len
+            (der_len,) = struct.unpack_from('>I', data, offset)
+            offset += 4
+            responses[serial] = data[offset:offset + der_len]
+            offset += der_len
+
+        with self._lock:
+            # Владелец держит актуальные ответы в памяти
+            if not self._signed:
+                self._responses = responses
+                self._issuer_name_hash = issuer_name_hash
+                self._issuer_key_hash = issuer_key_hash
+            self._cache_mtime = mtime
+
+
+# Глобальный ответчик
+ocsp_responder = OCSPResponder()
+_lock_file = None
+
+def acquire_ocsp_signer():
+    """Сделать текущий воркер подписывающим ответы OCSP, если им еще не стал другой"""
+    global _lock_file
+
+    if _lock_file is not None:
+        return True
+
+    config.RUN_DIR.mkdir(parents=True, exist_ok=True)
+    lock_file = open(config.RUN_DIR / 'ocsp.lock', 'w')
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        return False
+
+    _lock_file = lock_file
+    return True
@@ -3,6 +3,7 @@ import logging
 from pathlib import Path
 from ..config import config
 from ..models.vpn import VPNModel
+from .certificate_service import CertificateService
 
 logger = logging.getLogger(__name__)
 
@@ -77,13 +78,23 @@ class OpenVPNConfigGenerator:
         config_lines.append(f"ca {config.CA_DIR / 'ca.crt'}")
         config_lines.append(f"cert {config.CERTS_DIR / 'server.crt'}")
         config_lines.append(f"key {config.CERTS_DIR / 'server.key'}")
-        config_lines.append(f"dh {config.CA_DIR / 'dh.pem'}")
+        
+        # EC PKI или RSA без DH параметров (ECDHE-only либо генерация еще идет): только ECDHE
+        key_algorithm = CertificateService.get_key_algorithm()
+        if key_algorithm in CertificateService.ECDH_CURVES or not (config.CA_DIR / 'dh.pem').exists():
+            config_lines.append("dh none")
+            config_lines.append(f"ecdh-curve {CertificateService.ECDH_CURVES.get(key_algorithm, 'prime256v1')}")
+        else:
+            config_lines.append(f"dh {config.CA_DIR / 'dh.pem'}")
         
         if instance.get('tls_auth'):
             config_lines.append(f"tls-auth {config.CA_DIR / 'ta.key'} 0")
         
         if instance.get('crl_enabled'):
-            config_lines.append(f"crl-verify {config.CA_DIR / 'crl.pem'}")
+            if CertificateService().crl_verify_mode(instance) == 'dir':
+                config_lines.append(f"crl-verify {config.CRL_DIR} dir")
+            else:
+                config_lines.append(f"crl-verify {config.CA_DIR / 'crl.pem'}")
         
         # Настройки сервера
         config_lines.append(f"server {instance['subnet'].replace('/24', '')} 255.255.255.0")
@@ -122,6 +133,14 @@ class OpenVPNConfigGenerator:
         if instance.get('renegotiate_time'):
             config_lines.append(f"reneg-sec {instance['renegotiate_time']}")
         
+        # Проверка лимитов подключений через client-connect/client-disconnect
+        if config.CONNECTION_LIMITS_ENABLED:
+            config_lines.append(f"setenv KL_INSTANCE {instance['name']}")
+            config_lines.append(f"setenv KL_LIMITER_SOCKET {config.CONNECTION_LIMITER_SOCKET}")
+            config_lines.append("script-security 2")
+            config_lines.append(f"client-connect {config.OPENVPN_SCRIPTS_DIR / 'client-connect.sh'}")
+            config_lines.append(f"client-disconnect {config.OPENVPN_SCRIPTS_DIR / 'client-disconnect.sh'}")
+        
         # OpenVPN опции
         openvpn_options = VPNModel.get_openvpn_options(instance)
         config_lines.extend(openvpn_options)
@@ -168,7 +187,7 @@ class OpenVPNConfigGenerator:
         
         if instance.get('tls_auth'):
             config_lines.append("<tls-auth>")
-            # Здесь должен быть ta.key
+            config_lines.append((CertificateService.get_tls_auth_key() or '').strip())
             config_lines.append("</tls-auth>")
             config_lines.append("key-direction 1")
         
@@ -0,0 +1,108 @@
+import logging
+from enum import IntFlag
+from ..models.user import UserModel
+from ..utils.epoch import SharedEpoch
+from ..utils.bounded_cache import BoundedCache
+from ..utils.metrics import metrics
+from ..config import config
+
+logger = logging.getLogger(__name__)
+
+class Permission(IntFlag):
+    """Права доступа (бит на право)"""
+    VPN_MANAGE = 1 << 0
+    USERS_MANAGE = 1 << 1
+    GROUPS_MANAGE = 1 << 2
+    CERTIFICATES_MANAGE = 1 << 3
+    TRAFFIC_VIEW = 1 << 4
+    SYSTEM_VIEW = 1 << 5
+    SYSTEM_MANAGE = 1 << 6
+    ADMIN = 1 << 30
+
+
+ALL_PERMISSIONS = 0
+for _permission in Permission:
+    ALL_PERMISSIONS |= _permission
+
+# Права ролей; группы добавляют свои биты (groups.permissions)
+ROLE_PERMISSIONS = {
+    'admin': ALL_PERMISSIONS,
+    'user': 0
+}
+
+
+def permission_mask(names):
+    """Маска из списка имен прав (['users_manage', ...]). ValueError для неизвестного имени"""
+    mask = 0
+    for name in names or []:
+        try:
+            mask |= Permission[str(name).upper()]
+        except KeyError:
+            raise ValueError(f"Unknown permission: {name}")
+    return mask
+
+
+def permission_names(mask):
+    return [permission.name.lower() for permission in Permission if mask & permission]
+
+
+class PermissionService:
+    """Эффективные права пользователя: маска роли OR маски всех его групп.
+
+    Маска вычисляется в БД одним агрегатом (bit_or) независимо от числа групп
+    и кешируется на пользователя, проверка в декораторе — одна битовая
+    операция. Изменение членства, роли или прав группы сбрасывает кеш во всех
+    воркерах через файл-эпоху; PERMISSION_CACHE_TTL ограничивает устаревание
+    на случай изменений в обход сервисов.
+    """
+
+    def __init__(self):
+        # user_id -> mask
+        self._cache = BoundedCache('permissions', config.PERMISSION_CACHE_SIZE)
+        self._epoch = SharedEpoch('permissions')
+
+    def get_mask(self, user_id):
+        """Маска прав пользователя (из кеша)"""
+        if self._epoch.changed():
+            self._clear()
+
+        mask = self._cache.get(user_id)
+        if mask is not None:
+            return mask
+
+        metrics.inc('permission_cache_misses_total')
+        inputs = UserModel.get_permission_inputs(user_id)
+        if inputs is None:
+            mask = 0
+        else:
+            db_role, group_mask = inputs
+            mask = ROLE_PERMISSIONS.get(db_role, 0) | group_mask
+        self._cache.set(user_id, mask, config.PERMISSION_CACHE_TTL)
+        return mask
+
+    def has_permission(self, user, permission):
+        """Проверить право пользователя из g.user (маска из токена или кеша)"""
+        return bool(self.user_mask(user) & permission)
+
+    def can_grant(self, user, mask):
+        """Может ли пользователь из g.user выдать права mask — только те, что есть у него самого"""
+        return not mask & ~self.user_mask(user)
+
+    def user_mask(self, user):
+        """Маска прав пользователя из g.user (из токена или кеша)"""
+        mask = user.get('permissions')
+        if mask is None:
+            mask = user['permissions'] = self.get_mask(user['id'])
+        return mask
+
+    def invalidate(self):
+        """Сбросить кеш прав во всех воркерах (после изменения членства, роли или прав группы)"""
+        self._epoch.bump()
+        self._clear()
+
+    def _clear(self):
+        self._cache.clear()
+
+
+# Глобальный сервис прав
+permission_service = PermissionService()
@@ -0,0 +1,239 @@
+import os
+import json
+import time
+import heapq
+import fcntl
+import logging
+import threading
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from .certificate_service import CertificateService
+from .openvpn_config_generator import OpenVPNConfigGenerator
+from ..models.certificate import CertificateModel
+from ..models.vpn import VPNModel
+from ..utils.metrics import metrics
+from ..config import config
+
+logger = logging.getLogger(__name__)
+
+class RenewalScheduler:
+    """Планировщик продления сертификатов.
+
+    Держит min-heap сроков продления активных сертификатов из реестра и
+    просыпается только к ближайшему сроку. Продление идет пакетами не больше
+    CERT_RENEWAL_BATCH с ограничением CERT_RENEWAL_RATE сертификатов в минуту.
+    """
+
+    # Полная перезагрузка кучи из реестра (подхватывает сертификаты, выпущенные другими воркерами)
+    RELOAD_INTERVAL = 3600
+
+    # Окно расчета пропускной способности
+    THROUGHPUT_WINDOW = 600
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        # (renew_at, serial, common_name, instance_name, cert_type)
+        self._heap = []
+        self._loaded_at = 0
+        self._stopped = False
+        self._renewed_at = deque(maxlen=100000)
+        self.renewed_total = 0
+        self.failed_total = 0
+        self.certificate_service = CertificateService()
+        self.config_generator = OpenVPNConfigGenerator()
+
+    def add(self, serial, common_name, instance_name, cert_type, not_after):
+        """Добавить сертификат в расписание (будит планировщик, если срок раньше текущего)"""
+        entry = (self._renew_at(not_after), serial, common_name, instance_name, cert_type)
+        with self._cond:
+            heapq.heappush(self._heap, entry)
+            if self._heap[0] is entry:
+                self._cond.notify()
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+
+    def run(self):
+        """Основной цикл (выполняется в отдельном потоке)"""
+        while not self._stopped:
+            try:
+                self._step()
+            except Exception as e:
+                logger.error(f"Renewal scheduler error: {str(e)}")
+                with self._cond:
+                    self._cond.wait(timeout=60)
+
+    def _step(self):
+        """Дождаться ближайшего срока и продлить один пакет"""
+        with self._cond:
+            if self._stopped:
+                return
+
+            now = time.time()
+            if now - self._loaded_at >= self.RELOAD_INTERVAL:
+                self._load()
+                self._write_stats()
+
+            until_reload = self.RELOAD_INTERVAL - (now - self._loaded_at)
+            if not self._heap or self._heap[0][0] > now:
+                delay = self._heap[0][0] - now if self._heap else until_reload
+                self._cond.wait(timeout=max(0.0, min(delay, until_reload)))
+                return
+
+            batch = []
+            while self._heap and self._heap[0][0] <= now and len(batch) < config.CERT_RENEWAL_BATCH:
+                batch.append(heapq.heappop(self._heap))
+
+        processed = self._renew_batch(batch)
+        self._write_stats()
+
+        # Ограничение скорости: пауза пропорциональна размеру обработанного пакета
+        with self._cond:
+            if not self._stopped and processed:
+                self._cond.wait(timeout=processed * 60 / config.CERT_RENEWAL_RATE)
+
+    def stats(self):
+        """Очередь, отставание и пропускная способность продления"""
+        now = time.time()
+        with self._cond:
+            backlog = sum(1 for entry in self._heap if entry[0] <= now)
+            queued = len(self._heap)
+            next_due = self._heap[0][0] if self._heap else None
+        recent = sum(1 for ts in self._renewed_at if now - ts <= self.THROUGHPUT_WINDOW)
+        return {
+            'queued': queued,
+            'backlog': backlog,
+            'next_due': next_due,
+            'renewed_total': self.renewed_total,
+            'failed_total': self.failed_total,
+            'throughput_per_minute': round(recent * 60 / self.THROUGHPUT_WINDOW, 2),
+            'updated_at': now
+        }
+
+    def _load(self):
+        heap = [
+            (self._renew_at(not_after), serial, common_name, instance_name, cert_type)
+            for serial, common_name, instance_name, cert_type, not_after in CertificateModel.get_renewal_candidates()
+        ]
+        heapq.heapify(heap)
+        self._heap = heap
+        self._loaded_at = time.time()
+        logger.debug(f"Renewal scheduler loaded {len(heap)} certificates")
+
+    @staticmethod
+    def _renew_at(not_after):
+        expires = not_after.replace(tzinfo=timezone.utc).timestamp()
+        return expires - config.CERT_RENEW_BEFORE_DAYS * 86400
+
+    def _renew_batch(self, batch):
+        """Продлить пакет сертификатов. Возвращает количество обработанных"""
+        # Сертификат мог быть отозван или уже перевыпущен после загрузки кучи
+        active = CertificateModel.filter_active([entry[1] for entry in batch])
+        batch = [entry for entry in batch if entry[1] in active]
+        if not batch:
+            return 0
+
+        by_instance = {}
+        for _, serial, common_name, instance_name, cert_type in batch:
+            if cert_type == 'server':
+                self._renew_server(common_name)
+            elif instance_name:
+                by_instance.setdefault(instance_name, []).append(common_name)
+
+        for instance_name, names in by_instance.items():
+            self._renew_clients(instance_name, names)
+
+        return len(batch)
+
+    def _renew_clients(self, instance_name, names):
+        instance = VPNModel.get_by_name(instance_name)
+        if not instance:
+            return
+
+        renewed = []
+        for result in self.certificate_service.generate_client_certificates_bulk(names, instance_name):
+            if result.get('status') == 'issued':
+                renewed.append(result['client_name'])
+                # Новый сертификат сразу попадает в расписание
+                self.add(result['serial'], result['client_name'], instance_name, 'client',
+                         datetime.utcnow() + timedelta(days=config.CERT_VALIDITY_DAYS))
+            elif result.get('status') == 'failed':
+                self.failed_total += 1
+                metrics.inc('cert_renewals_total', result='failed')
+
+        # Перегенерировать профили .ovpn с новыми сертификатами
+        clients_dir = config.CERTS_DIR / 'clients' / instance_name
+        _, _, ca_pem = self.certificate_service._load_ca()
+        for name in renewed:
+            self.config_generator.generate_client_config(
+                instance, name,
+                (clients_dir / f'{name}.crt').read_text(),
+                (clients_dir / f'{name}.key').read_text(),
+                ca_pem.decode()
+            )
+            self._renewed_at.append(time.time())
+
+        self.renewed_total += len(renewed)
+        metrics.inc('cert_renewals_total', len(renewed), result='renewed')
+        logger.info(f"Renewed {len(renewed)} of {len(names)} client certificates for {instance_name}")
+
+    def _renew_server(self, common_name):
+        success, error = self.certificate_service.generate_server_certificate(common_name)
+        if not success:
+            self.failed_total += 1
+            metrics.inc('cert_renewals_total', result='failed')
+            logger.error(f"Server certificate renewal failed for {common_name}: {error}")
+            return
+
+        # Серверный сертификат общий — обновить конфигурации всех инстансов
+        for instance in VPNModel.get_all():
+            self.config_generator.generate_server_config(instance)
+
+        self._renewed_at.append(time.time())
+        self.renewed_total += 1
+        metrics.inc('cert_renewals_total', result='renewed')
+        logger.warning(f"Server certificate {common_name} renewed: restart VPN instances to load it")
+
+    def _write_stats(self):
+        """Сохранить статистику для остальных воркеров"""
+        stats = self.stats()
+        metrics.set_gauge('cert_renewal_backlog', stats['backlog'])
+        metrics.set_gauge('cert_renewal_queued', stats['queued'])
+        path = config.RUN_DIR / 'renewal-stats.json'
+        tmp = path.with_suffix('.tmp')
+        tmp.write_text(json.dumps(stats))
+        os.replace(tmp, path)
+
+
+# Глобальный планировщик (работает только в процессе-владельце блокировки)
+renewal_scheduler = RenewalScheduler()
+_lock_file = None
+
+def start_renewal_scheduler():
+    """Запустить планировщик, если его еще не запустил другой воркер"""
+    global _lock_file
+
+    if not config.CERT_RENEWAL_ENABLED or _lock_file is not None:
+        return False
+
+    config.RUN_DIR.mkdir(parents=True, exist_ok=True)
+    lock_file = open(config.RUN_DIR / 'renewal.lock', 'w')
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        return False
+
+    _lock_file = lock_file
+    threading.Thread(target=renewal_scheduler.run, daemon=True, name="RenewalScheduler").start()
+    logger.info("Certificate renewal scheduler started")
+    return True
+
+def get_renewal_stats():
+    """Статистика планировщика (из любого воркера)"""
+    try:
+        return json.loads((config.RUN_DIR / 'renewal-stats.json').read_text())
+    except (FileNotFoundError, ValueError):
+        return None
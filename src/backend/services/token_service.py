@@ -0,0 +1,126 @@
+import json
+import time
+import hmac
+import base64
+import hashlib
+import secrets
+import logging
+from datetime import datetime, timedelta
+from . import BaseService
+from ..models.refresh_token import RefreshTokenModel
+from ..models.user import UserModel
+from .permission_service import permission_service
+from ..config import config
+
+logger = logging.getLogger(__name__)
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+def _b64decode(data):
+    return base64.urlsafe_b64decode(data + '=' * (-len(data) % 4))
+
+
+class TokenService(BaseService):
+    """Токены доступа для API и автоматизации.
+
+    Access token — JWT (HS256) с id пользователя, ролью, маской прав и сроком
+    жизни ACCESS_TOKEN_TTL. Проверка — только HMAC и разбор JSON, без обращения
+    к БД, поэтому такой токен нельзя отозвать до истечения срока.
+    Refresh token — случайная строка, в БД хранится ее SHA-256; при каждом
+    обновлении выдается новая пара, а старый refresh token отзывается.
+    """
+
+    ISSUER = 'kurslight'
+
+    # Заголовок у всех токенов одинаковый — при проверке сравнивается как строка
+    HEADER = _b64encode(json.dumps({'alg': 'HS256', 'typ': 'JWT'}, separators=(',', ':')).encode())
+
+    def __init__(self):
+        self._signing_key = None
+
+    def _key(self):
+        """Ключ подписи, производный от SECRET_KEY (вычисляется один раз на процесс)"""
+        if self._signing_key is None:
+            self._signing_key = hmac.new(
+                config.SECRET_KEY.encode('utf-8'), b'kurslight-access-token', hashlib.sha256
+            ).digest()
+        return self._signing_key
+
+    def issue_tokens(self, user):
+        """Выдать пару (access token, refresh token) пользователю"""
+        refresh_token = secrets.token_urlsafe(32)
+        RefreshTokenModel.create(
+            user['id'], self._hash(refresh_token),
+            datetime.utcnow() + timedelta(days=config.REFRESH_TOKEN_DAYS)
+        )
+        return {
+            'access_token': self.create_access_token(user),
+            'token_type': 'Bearer',
+            'expires_in': config.ACCESS_TOKEN_TTL,
+            'refresh_token': refresh_token
+        }
+
+    def create_access_token(self, user):
+        now = int(time.time())
+        claims = {
+            'iss': self.ISSUER,
+            'sub': str(user['id']),
+            'name': user['username'],
+            'role': user['role'],
+            'perms': permission_service.get_mask(user['id']),
+            'iat': now,
+            'exp': now + config.ACCESS_TOKEN_TTL
+        }
+        payload = _b64encode(json.dumps(claims, separators=(',', ':')).encode())
+        signing_input = f"{self.HEADER}.{payload}"
+        signature = hmac.new(self._key(), signing_input.encode('ascii'), hashlib.sha256).digest()
+        return f"{signing_input}.{_b64encode(signature)}"
+
+    def verify_access_token(self, token):
+        """Проверить access token. Возвращает claims или None"""
+        try:
+            header, payload, signature = token.split('.')
+        except (AttributeError, ValueError):
+            return None
+        if header != self.HEADER:
+            return None
+
+        expected = hmac.new(self._key(), f"{header}.{payload}".encode('ascii'), hashlib.sha256).digest()
+        try:
+            if not hmac.compare_digest(_b64decode(signature), expected):
+                return None
+            claims = json.loads(_b64decode(payload))
+        except (ValueError, TypeError):
+            return None
+
+        if claims.get('iss') != self.ISSUER or claims.get('exp', 0) <= time.time():
+            return None
+        return claims
+
+    def refresh(self, refresh_token):
+        """Обменять refresh token на новую пару. None — токен недействителен или отозван"""
+        user_id = RefreshTokenModel.consume(self._hash(refresh_token or ''))
+        if user_id is None:
+            return None
+
+        user = UserModel.get_by_id(user_id)
+        if not user or not user.get('is_active', True):
+            return None
+        return self.issue_tokens(user)
+
+    def revoke(self, refresh_token):
+        """Отозвать refresh token (выход)"""
+        return RefreshTokenModel.revoke(self._hash(refresh_token or ''))
+
+    def revoke_user(self, user_id):
+        """Отозвать все refresh token пользователя"""
+        return RefreshTokenModel.revoke_by_user(user_id)
+
+    @staticmethod
+    def _hash(token):
+        return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+
+# Глобальный сервис токенов
+token_service = TokenService()
@@ -0,0 +1,100 @@
+from . import BaseService
+from ..models.traffic import TrafficModel
+from datetime import datetime, timedelta
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+class TrafficService(BaseService):
+    """Сервис для учета и отчетов по трафику VPN"""
+
+    def rollup(self, chunk_size=1000, max_chunks=10):
+        """Инкрементально учесть новые и закрытые сессии"""
+        processed = 0
+        for _ in range(max_chunks):
+            count = TrafficModel.rollup_chunk(chunk_size)
+            processed += count
+            if count < chunk_size:
+                break
+
+        if processed:
+            logger.debug(f"Traffic rollup processed {processed} sessions")
+        return processed
+
+    def backfill(self, chunk_size=5000, time_budget=60):
+        """Учесть накопленные сессии порциями в пределах бюджета времени.
+
+        Прогресс хранится в самих сессиях, поэтому прерванный backfill
+        продолжается повторным вызовом.
+        """
+        try:
+            deadline = time.monotonic() + time_budget
+            processed = 0
+
+            while time.monotonic() < deadline:
+                count = TrafficModel.rollup_chunk(chunk_size)
+                processed += count
+                if count < chunk_size:
+                    break
+
+            remaining = TrafficModel.count_pending()
+            logger.info(f"Traffic backfill processed {processed} sessions, {remaining} pending")
+            return {'processed': processed, 'remaining': remaining}, None
+
+        except Exception as e:
+            logger.error(f"Traffic backfill error: {str(e)}")
+            return None, "Failed to backfill traffic statistics"
+
+    def get_usage(self, scope, scope_id, start=None, end=None, granularity='day'):
+        """Получить трафик пользователя, группы или инстанса за период"""
+        try:
+            if scope not in TrafficModel.SCOPES:
+                raise ValueError(f"Invalid scope: {scope}")
+            if granularity not in TrafficModel.TABLES:
+                raise ValueError(f"Invalid granularity: {granularity}")
+
+            # По умолчанию — текущий календарный месяц
+            today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+            start = self._parse_date(start) if start else today.replace(day=1)
+            end = self._parse_date(end) + timedelta(days=1) if end else today + timedelta(days=1)
+            if end <= start:
+                raise ValueError("Invalid period: 'to' must not be earlier than 'from'")
+
+            series = TrafficModel.get_series(granularity, scope, scope_id, start, end)
+
+            buckets = []
+            totals = {'bytes_received': 0, 'bytes_sent': 0, 'sessions': 0}
+            for row in series:
+                buckets.append({
+                    'bucket_start': row['bucket_start'].isoformat(),
+                    'bytes_received': row['bytes_received'],
+                    'bytes_sent': row['bytes_sent'],
+                    'sessions': row['sessions']
+                })
+                for key in totals:
+                    totals[key] += row[key]
+
+            return {
+                'scope': scope,
+                'scope_id': scope_id,
+                'granularity': granularity,
+                'from': start.date().isoformat(),
+                'to': (end - timedelta(days=1)).date().isoformat(),
+                'totals': totals,
+                'buckets': buckets
+            }, None
+
+        except ValueError as e:
+            return None, str(e)
+        except Exception as e:
+            logger.error(f"Error getting traffic usage for {scope} {scope_id}: {str(e)}")
+            return None, "Failed to retrieve traffic usage"
+
+    @staticmethod
+    def _parse_date(value):
+        """Разобрать дату в формате YYYY-MM-DD"""
+        try:
+            return datetime.strptime(value, '%Y-%m-%d')
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid date: {value}. Expected YYYY-MM-DD")
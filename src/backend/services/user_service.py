@@ -1,7 +1,9 @@
 from . import BaseService
 from ..models.user import UserModel
 from ..models.group import GroupModel
+from ..models.certificate import CertificateModel
 from ..utils.radius import create_radius_user
+from .permission_service import permission_service, Permission
 import logging
 
 logger = logging.getLogger(__name__)
@@ -14,6 +16,8 @@ class UserService(BaseService):
         try:
             users = UserModel.get_all()
             result = []
+            # Один запрос на всех пользователей вместо запроса на каждого
+            certificate_counts = CertificateModel.count_active_by_user() if include_certificates else {}
             
             for user in users:
                 user_data = {
@@ -34,7 +38,7 @@ class UserService(BaseService):
                 
                 # Добавить информацию о сертификатах
                 if include_certificates:
-                    user_data['certificate_count'] = self._get_user_certificate_count(user['id'])
+                    user_data['certificate_count'] = certificate_counts.get(user['id'], 0)
                 
                 result.append(user_data)
             
@@ -44,13 +48,26 @@ class UserService(BaseService):
             logger.error(f"Error getting all users: {str(e)}")
             return None, "Failed to retrieve users"
     
-    def create_user(self, user_data):
-        """Создать нового пользователя"""
+    def create_user(self, user_data, actor):
+        """Создать нового пользователя (actor — пользователь из g.user)"""
         try:
             # Валидация
             self.validate_required_fields(user_data, ['username', 'password', 'role'])
             self.validate_password_strength(user_data['password'])
             
+            # Роль выше обычной назначает только администратор, группы — только с правами,
+            # которые есть у самого actor
+            if user_data['role'] != 'user':
+                self._require_admin(actor)
+            groups = []
+            if isinstance(user_data.get('groups'), list):
+                for group_name in user_data['groups']:
+                    group = GroupModel.get_by_name(group_name)
+                    if group:
+                        if not permission_service.can_grant(actor, group.get('permissions') or 0):
+                            raise PermissionError(f"Cannot add users to group {group_name}: it has permissions you do not hold")
+                        groups.append(group)
+            
             # Проверить существование username
             existing_user = UserModel.get_by_username(user_data['username'])
             if existing_user:
@@ -70,11 +87,8 @@ class UserService(BaseService):
                 raise Exception("Failed to create user")
             
             # Добавить в группы
-            if 'groups' in user_data and isinstance(user_data['groups'], list):
-                for group_name in user_data['groups']:
-                    group = GroupModel.get_by_name(group_name)
-                    if group:
-                        GroupModel.add_user_to_group(user_id, group['id'])
+            for group in groups:
+                GroupModel.add_user_to_group(user_id, group['id'])
             
             # Создать RADIUS аккаунт если требуется
             if user_data.get('create_radius_account', False):
@@ -83,14 +97,16 @@ class UserService(BaseService):
             logger.info(f"User created successfully: {user_data['username']} (ID: {user_id})")
             return user_id, None
             
+        except PermissionError:
+            raise
         except ValueError as e:
             return None, str(e)
         except Exception as e:
             logger.error(f"Error creating user {user_data.get('username', 'unknown')}: {str(e)}")
             return None, "Failed to create user"
     
-    def update_user(self, user_id, update_data):
-        """Обновить данные пользователя"""
+    def update_user(self, user_id, update_data, actor):
+        """Обновить данные пользователя (actor — пользователь из g.user)"""
         try:
             # Проверить существование пользователя
             user = UserModel.get_by_id(user_id)
@@ -101,6 +117,10 @@ class UserService(BaseService):
             if user['username'] == 'admin' and 'role' in update_data and update_data['role'] != 'admin':
                 return False, "Cannot change admin user role"
             
+            # Роль меняет только администратор (иначе менеджер пользователей может выдать себе admin)
+            if 'role' in update_data and update_data['role'] != user['role']:
+                self._require_admin(actor)
+            
             # Обновить основные данные
             allowed_fields = ['full_name', 'email', 'role', 'is_active']
             update_fields = {k: v for k, v in update_data.items() if k in allowed_fields}
@@ -114,6 +134,10 @@ class UserService(BaseService):
             if 'groups' in update_data:
                 self._update_user_groups(user_id, update_data['groups'])
             
+            # Роль, активность и группы определяют права пользователя
+            if any(field in update_data for field in ('role', 'is_active', 'groups')):
+                permission_service.invalidate()
+            
             # Обновить RADIUS статус
             if 'radius_enabled' in update_data:
                 self._update_radius_status(user['username'], update_data['radius_enabled'])
@@ -121,6 +145,8 @@ class UserService(BaseService):
             logger.info(f"User updated successfully: {user['username']} (ID: {user_id})")
             return True, None
             
+        except PermissionError:
+            raise
         except Exception as e:
             logger.error(f"Error updating user {user_id}: {str(e)}")
             return False, "Failed to update user"
@@ -141,6 +167,8 @@ class UserService(BaseService):
             if not success:
                 return False, "Failed to delete user"
             
+            permission_service.invalidate()
+            
             # Отключить RADIUS аккаунт
             self._update_radius_status(user['username'], False)
             
@@ -164,13 +192,16 @@ class UserService(BaseService):
     def _get_user_certificate_count(self, user_id):
         """Получить количество сертификатов пользователя"""
         try:
-            # Здесь будет логика подсчета сертификатов
-            # Временная заглушка
-            return 0
+            return CertificateModel.count_active(user_id)
         except Exception as e:
             logger.error(f"Error getting certificate count for user {user_id}: {str(e)}")
             return 0
     
+    @staticmethod
+    def _require_admin(actor):
+        if not permission_service.has_permission(actor, Permission.ADMIN):
+            raise PermissionError("Only administrators can assign user roles")
+    
     def _update_user_groups(self, user_id, groups):
         """Обновить группы пользователя"""
         try:
@@ -7,6 +7,7 @@ from pathlib import Path
 # Исправляем импорты
 from src.backend.services.base_service import BaseService
 from src.backend.models.vpn import VPNModel
+from src.backend.services.openvpn_config_generator import OpenVPNConfigGenerator
 from src.backend.config import config
 
 logger = logging.getLogger(__name__)
@@ -87,6 +88,8 @@ class VPNService(BaseService):
                     'subnet': instance['subnet'],
                     'active_clients': instance['active_clients'],
                     'max_clients': instance['max_clients'],
+                    'bytes_received': instance['bytes_received'],
+                    'bytes_sent': instance['bytes_sent'],
                     'created_at': instance['created_at'].isoformat() if instance['created_at'] else None
                 }
                 result.append(instance_data)
@@ -183,6 +186,35 @@ class VPNService(BaseService):
         except Exception as e:
             logger.error(f"Error stopping VPN instance {instance_name}: {str(e)}")
             return False, f"Stop error: {str(e)}"
+    
+    def update_crl_mode(self, instance_name, crl_mode):
+        """Сменить режим crl-verify инстанса и перегенерировать server.conf.
+
+        Новый режим вступает в силу после перезапуска инстанса.
+        """
+        try:
+            instance_name = self._validate_instance_name(instance_name)
+            instance = VPNModel.get_by_name(instance_name)
+            if not instance:
+                return False, "VPN instance not found"
+            
+            VPNModel.update_settings(instance['id'], crl_mode=crl_mode)
+            instance['crl_mode'] = crl_mode
+            success, result = OpenVPNConfigGenerator().generate_server_config(instance)
+            if not success:
+                return False, f"Config generation error: {result}"
+            
+            logger.info(f"CRL mode of {instance_name} set to {crl_mode}")
+            return True, None
+            
+        except ValueError as e:
+            return False, str(e)
+        except SecurityError as e:
+            logger.error(f"Security violation while updating {instance_name}: {str(e)}")
+            return False, f"Security error: {str(e)}"
+        except Exception as e:
+            logger.error(f"Error updating CRL mode of {instance_name}: {str(e)}")
+            return False, f"Update error: {str(e)}"
 
 class SecurityError(Exception):
     """Ошибка безопасности"""
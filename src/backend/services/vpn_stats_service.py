@@ -0,0 +1,123 @@
+import os
+import time
+import logging
+from ..models.vpn import VPNModel
+from ..utils.metrics import metrics
+from ..config import config
+
+logger = logging.getLogger(__name__)
+
+class VPNStatsCollector:
+    """Сборщик статистики VPN инстансов из status-файлов OpenVPN"""
+
+    # Status-файл, который давно не обновлялся, считается остановленным инстансом
+    STALE_AFTER = 180
+
+    def __init__(self):
+        # name -> (mtime_ns, size, stats) — неизменившиеся файлы повторно не разбираются
+        self._parsed = {}
+        self.last_tick = {}
+
+    def status_file(self, instance_name):
+        """Путь к status-файлу инстанса (см. OpenVPNConfigGenerator)"""
+        return config.LOGS_DIR / f"openvpn-{instance_name}.log"
+
+    def collect(self):
+        """Один проход: собрать счетчики всех инстансов и записать изменившиеся"""
+        started = time.perf_counter()
+        now = time.time()
+
+        instances = VPNModel.get_stats_snapshot()
+        changed = []
+        parsed = 0
+        seen = set()
+
+        for instance_id, name, active_clients, bytes_received, bytes_sent in instances:
+            seen.add(name)
+            stats, was_parsed = self._read_status(name, now)
+            parsed += was_parsed
+
+            current = (active_clients or 0, bytes_received or 0, bytes_sent or 0)
+            if stats != current:
+                changed.append((instance_id,) + stats)
+
+        # Забыть удаленные инстансы
+        for name in list(self._parsed):
+            if name not in seen:
+                del self._parsed[name]
+
+        if changed:
+            VPNModel.update_stats_batch(changed)
+
+        elapsed = time.perf_counter() - started
+        metrics.observe('vpn_stats_tick_seconds', elapsed)
+        metrics.set_gauge('vpn_stats_instances', len(instances))
+        metrics.set_gauge('vpn_stats_files_parsed', parsed)
+        metrics.inc('vpn_stats_rows_written_total', len(changed))
+
+        self.last_tick = {
+            'instances': len(instances),
+            'files_parsed': parsed,
+            'rows_written': len(changed),
+            'duration_ms': round(elapsed * 1000, 3)
+        }
+        return self.last_tick
+
+    def _read_status(self, instance_name, now):
+        """Получить (clients, bytes_received, bytes_sent) инстанса и флаг разбора файла"""
+        path = self.status_file(instance_name)
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            self._parsed.pop(instance_name, None)
+            return (0, 0, 0), False
+
+        if now - st.st_mtime > self.STALE_AFTER:
+            return (0, 0, 0), False
+
+        cached = self._parsed.get(instance_name)
+        if cached and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+            return cached[2], False
+
+        try:
+            stats = self._parse_status(path)
+        except OSError as e:
+            logger.warning(f"Cannot read status file for {instance_name}: {str(e)}")
+            return (0, 0, 0), False
+
+        self._parsed[instance_name] = (st.st_mtime_ns, st.st_size, stats)
+        return stats, True
+
+    @staticmethod
+    def _parse_status(path):
+        """Разобрать status-файл OpenVPN (status-version 2 и 3)"""
+        clients = 0
+        bytes_received = 0
+        bytes_sent = 0
+        # Позиции по умолчанию для status-version 2/3, уточняются по строке HEADER
+        rx_index, tx_index = 5, 6
+
+        with open(path, 'r', errors='replace') as f:
+            for line in f:
+                if line.startswith('HEADER'):
+                    sep = '\t' if '\t' in line else ','
+                    header = line.rstrip('\r\n').split(sep)
+                    if len(header) > 1 and header[1] == 'CLIENT_LIST':
+                        # В строках данных нет поля HEADER, поэтому индексы сдвинуты на 1
+                        if 'Bytes Received' in header:
+                            rx_index = header.index('Bytes Received') - 1
+                        if 'Bytes Sent' in header:
+                            tx_index = header.index('Bytes Sent') - 1
+                elif line.startswith('CLIENT_LIST'):
+                    sep = '\t' if '\t' in line else ','
+                    fields = line.rstrip('\r\n').split(sep)
+                    clients += 1
+                    try:
+                        bytes_received += int(fields[rx_index])
+                        bytes_sent += int(fields[tx_index])
+                    except (IndexError, ValueError):
+                        continue
+                elif line.startswith('END'):
+                    break
+
+        return clients, bytes_received, bytes_sent
@@ -3,6 +3,19 @@ import time
 import logging
 from ..models.vpn import VPNModel
 from ..models.user import UserModel
+from ..services.traffic_service import TrafficService
+from ..services.vpn_stats_service import VPNStatsCollector
+from ..services.connection_limiter import connection_limiter, start_connection_limiter
+from ..services.key_pool import key_pool
+from ..services.certificate_service import CertificateService
+from ..services.dh_params import dh_store
+from ..services.renewal_scheduler import start_renewal_scheduler
+from ..services.ocsp_responder import ocsp_responder, acquire_ocsp_signer
+from ..services.api_key_service import api_key_service
+from ..services.login_attempts import login_attempts
+from .bounded_cache import sweep_caches
+from ..models.refresh_token import RefreshTokenModel
+from ..config import config
 
 logger = logging.getLogger(__name__)
 
@@ -52,27 +65,111 @@ class BackgroundTaskManager:
 # Глобальный менеджер задач
 task_manager = BackgroundTaskManager()
 
+# Сборщик статистики VPN (хранит кеш разобранных status-файлов между проходами)
+vpn_stats_collector = VPNStatsCollector()
+
 def cleanup_expired_certificates():
     """Очистка просроченных сертификатов"""
     try:
-        # TODO: Реализовать очистку просроченных сертификатов
-        logger.debug("Expired certificates cleanup completed")
+        result = CertificateService().cleanup_expired()
+        logger.debug(f"Expired certificates cleanup completed: {result}")
     except Exception as e:
         logger.error(f"Certificate cleanup error: {str(e)}")
 
 def update_vpn_stats():
     """Обновление статистики VPN"""
     try:
-        # TODO: Реализовать обновление статистики VPN
-        logger.debug("VPN statistics updated")
+        tick = vpn_stats_collector.collect()
+        logger.debug(
+            f"VPN statistics updated: {tick['instances']} instances, "
+            f"{tick['files_parsed']} parsed, {tick['rows_written']} written in {tick['duration_ms']} ms"
+        )
     except Exception as e:
         logger.error(f"VPN stats update error: {str(e)}")
 
+def rollup_traffic_stats():
+    """Инкрементальный учет трафика сессий в агрегатах"""
+    try:
+        TrafficService().rollup()
+    except Exception as e:
+        logger.error(f"Traffic rollup error: {str(e)}")
+
+def reconcile_connection_limits():
+    """Сверка счетчиков подключений с vpn_sessions (только в воркере-владельце сокета)"""
+    try:
+        # Владелец выбирается заново, если прежний воркер завершился; новый сверяется при запуске
+        if start_connection_limiter():
+            connection_limiter.reconcile()
+    except Exception as e:
+        logger.error(f"Connection limiter reconcile error: {str(e)}")
+
+def elect_renewal_scheduler():
+    """Запуск планировщика продления, если воркер-владелец завершился"""
+    try:
+        # Блокировку файла держит только живой владелец; у него вызов ничего не делает
+        if start_renewal_scheduler():
+            logger.info("Certificate renewal scheduler taken over by this worker")
+    except Exception as e:
+        logger.error(f"Renewal scheduler election error: {str(e)}")
+
+def refill_key_pool():
+    """Пополнение пула заранее сгенерированных ключей"""
+    try:
+        # Пул нужен только для RSA PKI
+        if CertificateService.get_key_algorithm() == key_pool.ALGORITHM:
+            key_pool.refill()
+    except Exception as e:
+        logger.error(f"Key pool refill error: {str(e)}")
+
+def refill_dh_params():
+    """Пополнение хранилища DH параметров в простое"""
+    try:
+        dh_store.refill()
+    except Exception as e:
+        logger.error(f"DH store refill error: {str(e)}")
+
+def refresh_crl():
+    """Перевыпуск CRL до истечения nextUpdate"""
+    try:
+        CertificateService().refresh_crl_if_needed()
+    except Exception as e:
+        logger.error(f"CRL refresh error: {str(e)}")
+
+def refresh_ocsp_responses():
+    """Подпись новых и скоро истекающих ответов OCSP (только в одном воркере)"""
+    try:
+        if (config.CA_DIR / 'ca.key').exists() and acquire_ocsp_signer():
+            ocsp_responder.refresh()
+    except Exception as e:
+        logger.error(f"OCSP refresh error: {str(e)}")
+
+def flush_api_key_usage():
+    """Пакетная запись last_used API ключей"""
+    try:
+        api_key_service.flush_last_used()
+    except Exception as e:
+        logger.error(f"API key usage flush error: {str(e)}")
+
+def flush_login_attempts():
+    """Пакетная запись счетчиков входа и синхронизация блокировок"""
+    try:
+        login_attempts.flush()
+    except Exception as e:
+        logger.error(f"Login attempts flush error: {str(e)}")
+
+def sweep_memory_caches():
+    """Удаление истекших записей из кешей в памяти (колесо таймеров)"""
+    try:
+        sweep_caches()
+    except Exception as e:
+        logger.error(f"Cache sweep error: {str(e)}")
+
 def session_cleanup():
     """Очистка устаревших сессий"""
     try:
-        # TODO: Реализовать очистку сессий
-        logger.debug("Session cleanup completed")
+        # Cookie-сессии истекают сами, в БД хранятся только refresh token
+        removed = RefreshTokenModel.delete_expired()
+        logger.debug(f"Session cleanup completed: {removed} refresh tokens removed")
     except Exception as e:
         logger.error(f"Session cleanup error: {str(e)}")
 
@@ -82,7 +179,34 @@ def start_background_tasks():
     # Добавить задачи
     task_manager.add_task(cleanup_expired_certificates, interval=3600, name="cert_cleanup")  # Каждый час
     task_manager.add_task(update_vpn_stats, interval=30, name="vpn_stats")  # Каждые 30 секунд
+    task_manager.add_task(rollup_traffic_stats, interval=60, name="traffic_rollup")  # Каждую минуту
     task_manager.add_task(session_cleanup, interval=1800, name="session_cleanup")  # Каждые 30 минут
+    task_manager.add_task(flush_api_key_usage, interval=config.API_KEY_LAST_USED_FLUSH, name="api_key_usage")
+    task_manager.add_task(flush_login_attempts, interval=config.LOGIN_ATTEMPTS_FLUSH, name="login_attempts")
+    task_manager.add_task(sweep_memory_caches, interval=1, name="cache_sweep")  # Каждую секунду
+    task_manager.add_task(refresh_crl, interval=3600, name="crl_refresh")  # Каждый час
+    if config.OCSP_ENABLED:
+        task_manager.add_task(refresh_ocsp_responses, interval=60, name="ocsp_refresh")  # Каждую минуту
+    if config.KEY_POOL_SIZE > 0:
+        task_manager.add_task(refill_key_pool, interval=config.KEY_POOL_REFILL_INTERVAL, name="key_pool_refill")
+    if config.DH_STORE_TARGET > 0:
+        task_manager.add_task(refill_dh_params, interval=300, name="dh_store_refill")  # Каждые 5 минут
+    
+    # Планировщик продления сертификатов работает в одном воркере и просыпается сам;
+    # остальные воркеры раз в минуту пробуют занять его место
+    start_renewal_scheduler()
+    if config.CERT_RENEWAL_ENABLED:
+        task_manager.add_task(elect_renewal_scheduler, interval=60, name="renewal_election")  # Каждую минуту
+    
+    # Сервис лимитов подключений работает только в одном воркере — владельце сокета;
+    # остальные воркеры на каждом проходе пробуют занять его место
+    start_connection_limiter()
+    if config.CONNECTION_LIMITS_ENABLED:
+        task_manager.add_task(
+            reconcile_connection_limits,
+            interval=config.CONNECTION_LIMITER_RECONCILE,
+            name="conn_limiter_reconcile"
+        )
     
     # Запустить задачи
     task_manager.start()
\ No newline at end of file
@@ -0,0 +1,166 @@
+import time
+import weakref
+import threading
+import logging
+from collections import OrderedDict
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Все кеши процесса, для фоновой очистки sweep_caches()
+_caches = weakref.WeakSet()
+
+class BoundedCache:
+    """Ограниченный кеш с истечением записей: шардированный LRU и колесо таймеров.
+
+    Ключ попадает в один из SHARDS шардов (OrderedDict со своей блокировкой),
+    каждый шард хранит не более max_entries / SHARDS записей и при переполнении
+    вытесняет самую давно использованную. Срок записи отмечается в колесе
+    таймеров (слот на секунду); sweep() проходит только слоты, время которых
+    наступило, и удаляет истекшие записи — память освобождается, даже если
+    ключ больше никогда не запрашивается (сканирование со случайных адресов).
+
+    Метрики: memory_cache_entries{cache} и
+    memory_cache_evictions_total{cache, reason=capacity|expired}.
+    """
+
+    SHARDS = 16
+    WHEEL_SLOTS = 3600
+    RESOLUTION = 1.0
+
+    def __init__(self, name, max_entries):
+        self.name = name
+        self.max_entries = max_entries
+        self._shard_size = max(1, max_entries // self.SHARDS)
+        # key -> (value, expires_at)
+        self._shards = [OrderedDict() for _ in range(self.SHARDS)]
+        self._locks = [threading.Lock() for _ in range(self.SHARDS)]
+        # Слот колеса -> ключи, истекающие в его секунду (или через целое число оборотов)
+        self._wheel = [set() for _ in range(self.WHEEL_SLOTS)]
+        self._wheel_lock = threading.Lock()
+        self._swept_tick = self._tick(time.monotonic()) - 1
+        _caches.add(self)
+
+    def get(self, key, default=None):
+        shard = hash(key) % self.SHARDS
+        with self._locks[shard]:
+            entry = self._shards[shard].get(key)
+            if entry is None:
+                return default
+            if entry[1] <= time.monotonic():
+                self._remove(shard, key, entry, 'expired')
+                return default
+            self._shards[shard].move_to_end(key)
+            return entry[0]
+
+    def set(self, key, value, ttl):
+        self.update(key, lambda current: (value, ttl))
+
+    def update(self, key, func, default=None):
+        """Атомарно изменить запись: func(текущее значение или default) -> (value, ttl).
+
+        ttl=None удаляет запись. Возвращает новое значение.
+        """
+        shard = hash(key) % self.SHARDS
+        entries = self._shards[shard]
+        with self._locks[shard]:
+            now = time.monotonic()
+            entry = entries.get(key)
+            if entry is not None and entry[1] <= now:
+                self._remove(shard, key, entry, 'expired')
+                entry = None
+
+            value, ttl = func(entry[0] if entry is not None else default)
+            if ttl is None:
+                if entry is not None:
+                    self._remove(shard, key, entry, None)
+                return None
+
+            expires_at = now + ttl
+            with self._wheel_lock:
+                if entry is not None:
+                    self._wheel[self._slot(entry[1])].discard(key)
+                self._wheel[self._slot(expires_at)].add(key)
+            entries[key] = (value, expires_at)
+            entries.move_to_end(key)
+
+            while len(entries) > self._shard_size:
+                old_key, old_entry = next(iter(entries.items()))
+                self._remove(shard, old_key, old_entry, 'capacity')
+            return value
+
+    def pop(self, key):
+        shard = hash(key) % self.SHARDS
+        with self._locks[shard]:
+            entry = self._shards[shard].get(key)
+            if entry is not None:
+                self._remove(shard, key, entry, None)
+                return entry[0]
+            return None
+
+    def items(self):
+        """Снимок действующих записей [(key, value)]"""
+        now = time.monotonic()
+        items = []
+        for shard, lock in zip(self._shards, self._locks):
+            with lock:
+                items.extend((key, entry[0]) for key, entry in shard.items() if entry[1] > now)
+        return items
+
+    def clear(self):
+        for shard, lock in zip(self._shards, self._locks):
+            with lock:
+                shard.clear()
+        with self._wheel_lock:
+            for slot in self._wheel:
+                slot.clear()
+
+    def __len__(self):
+        return sum(len(shard) for shard in self._shards)
+
+    def sweep(self):
+        """Удалить записи, истекшие с прошлого прохода. Возвращает число удаленных"""
+        now = time.monotonic()
+        current_tick = self._tick(now)
+        removed = 0
+        # Проходятся только целиком прошедшие секунды, не больше одного оборота колеса
+        first_tick = max(self._swept_tick + 1, current_tick - self.WHEEL_SLOTS)
+        for tick in range(first_tick, current_tick):
+            slot = tick % self.WHEEL_SLOTS
+            with self._wheel_lock:
+                keys, self._wheel[slot] = self._wheel[slot], set()
+            for key in keys:
+                shard = hash(key) % self.SHARDS
+                with self._locks[shard]:
+                    entry = self._shards[shard].get(key)
+                    if entry is None:
+                        continue
+                    if entry[1] <= now:
+                        self._remove(shard, key, entry, 'expired')
+                        removed += 1
+                    else:
+                        # Срок дальше одного оборота колеса — вернуть в слот
+                        with self._wheel_lock:
+                            self._wheel[self._slot(entry[1])].add(key)
+        self._swept_tick = current_tick - 1
+        metrics.set_gauge('memory_cache_entries', len(self), cache=self.name)
+        return removed
+
+    def _remove(self, shard, key, entry, reason):
+        # Вызывается под блокировкой шарда
+        del self._shards[shard][key]
+        with self._wheel_lock:
+            self._wheel[self._slot(entry[1])].discard(key)
+        if reason:
+            metrics.inc('memory_cache_evictions_total', cache=self.name, reason=reason)
+
+    def _tick(self, moment):
+        return int(moment / self.RESOLUTION)
+
+    def _slot(self, expires_at):
+        return self._tick(expires_at) % self.WHEEL_SLOTS
+
+
+def sweep_caches():
+    """Очистить истекшие записи во всех кешах процесса (фоновая задача)"""
+    return sum(cache.sweep() for cache in list(_caches))
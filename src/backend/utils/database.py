@@ -28,6 +28,33 @@ def _get_sqlite_connection():
         logger.error("SQLite3 not available")
         raise
 
+def _table_columns(cur, is_sqlite, table):
+    """Имена колонок таблицы (пустое множество, если таблицы нет)"""
+    if is_sqlite:
+        cur.execute(f"PRAGMA table_info({table})")
+        return {row[1] for row in cur.fetchall()}
+    cur.execute(
+        "SELECT column_name FROM information_schema.columns WHERE table_name = %s AND table_schema = current_schema()",
+        (table,)
+    )
+    return {row[0] for row in cur.fetchall()}
+
+def _add_missing_columns(cur, is_sqlite, table, columns):
+    """Добавить в существующую таблицу колонки, появившиеся после ее создания.
+
+    CREATE TABLE IF NOT EXISTS не меняет уже созданные таблицы, поэтому новые
+    колонки добавляются отдельно; columns — [(имя, определение)].
+    """
+    if is_sqlite:
+        # В SQLite нет ADD COLUMN IF NOT EXISTS
+        existing = _table_columns(cur, is_sqlite, table)
+        for name, definition in columns:
+            if name not in existing:
+                cur.execute(f"ALTER TABLE {table} ADD COLUMN {name} {definition}")
+    else:
+        for name, definition in columns:
+            cur.execute(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {name} {definition}")
+
 def init_db():
     """Инициализация таблиц БД"""
     conn = get_db_connection()
@@ -36,6 +63,8 @@ def init_db():
     try:
         # Определяем тип БД
         is_sqlite = 'sqlite' in str(conn)
+        bigint = 'INTEGER' if is_sqlite else 'BIGINT'
+        false = '0' if is_sqlite else 'FALSE'
         
         # Таблица пользователей
         if is_sqlite:
@@ -49,7 +78,9 @@ def init_db():
                     role VARCHAR(20) DEFAULT 'user',
                     is_active BOOLEAN DEFAULT 1,
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    last_login TIMESTAMP
+                    last_login TIMESTAMP,
+                    failed_login_attempts INTEGER DEFAULT 0,
+                    locked_until TIMESTAMP NULL
                 )
             ''')
         else:
@@ -63,9 +94,15 @@ def init_db():
                     role VARCHAR(20) DEFAULT 'user',
                     is_active BOOLEAN DEFAULT TRUE,
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    last_login TIMESTAMP
+                    last_login TIMESTAMP,
+                    failed_login_attempts INTEGER DEFAULT 0,
+                    locked_until TIMESTAMP NULL
                 )
             ''')
+        _add_missing_columns(cur, is_sqlite, 'users', [
+            ('failed_login_attempts', 'INTEGER DEFAULT 0'),
+            ('locked_until', 'TIMESTAMP NULL'),
+        ])
         
         # Таблица VPN инстансов
         if is_sqlite:
@@ -81,10 +118,13 @@ def init_db():
                     subnet VARCHAR(20) DEFAULT '10.8.0.0/24',
                     active_clients INTEGER DEFAULT 0,
                     max_clients INTEGER DEFAULT 100,
+                    bytes_received INTEGER DEFAULT 0,
+                    bytes_sent INTEGER DEFAULT 0,
                     interface_type VARCHAR(10) DEFAULT 'tun',
                     topology VARCHAR(20) DEFAULT 'subnet',
                     tls_auth BOOLEAN DEFAULT 0,
                     crl_enabled BOOLEAN DEFAULT 0,
+                    crl_mode VARCHAR(8) DEFAULT 'auto',
                     verify_client BOOLEAN DEFAULT 1,
                     ocsp_enabled BOOLEAN DEFAULT 0,
                     cert_depth INTEGER DEFAULT 1,
@@ -125,10 +165,13 @@ def init_db():
                     subnet VARCHAR(20) DEFAULT '10.8.0.0/24',
                     active_clients INTEGER DEFAULT 0,
                     max_clients INTEGER DEFAULT 100,
+                    bytes_received BIGINT DEFAULT 0,
+                    bytes_sent BIGINT DEFAULT 0,
                     interface_type VARCHAR(10) DEFAULT 'tun',
                     topology VARCHAR(20) DEFAULT 'subnet',
                     tls_auth BOOLEAN DEFAULT FALSE,
                     crl_enabled BOOLEAN DEFAULT FALSE,
+                    crl_mode VARCHAR(8) DEFAULT 'auto',
                     verify_client BOOLEAN DEFAULT TRUE,
                     ocsp_enabled BOOLEAN DEFAULT FALSE,
                     cert_depth INTEGER DEFAULT 1,
@@ -156,6 +199,11 @@ def init_db():
                     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
                 )
             ''')
+        _add_missing_columns(cur, is_sqlite, 'vpn_instances', [
+            ('bytes_received', f'{bigint} DEFAULT 0'),
+            ('bytes_sent', f'{bigint} DEFAULT 0'),
+            ('crl_mode', "VARCHAR(8) DEFAULT 'auto'"),
+        ])
         
         # Таблица клиентов VPN
         if is_sqlite:
@@ -201,6 +249,9 @@ def init_db():
                     disconnected_at TIMESTAMP NULL,
                     bytes_received INTEGER DEFAULT 0,
                     bytes_sent INTEGER DEFAULT 0,
+                    rolled_bytes_received INTEGER DEFAULT 0,
+                    rolled_bytes_sent INTEGER DEFAULT 0,
+                    rollup_done BOOLEAN DEFAULT 0,
                     FOREIGN KEY (vpn_instance_id) REFERENCES vpn_instances(id) ON DELETE CASCADE
                 )
             ''')
@@ -213,19 +264,153 @@ def init_db():
                     client_ip VARCHAR(45),
                     connected_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                     disconnected_at TIMESTAMP NULL,
-                    bytes_received INTEGER DEFAULT 0,
-                    bytes_sent INTEGER DEFAULT 0,
+                    bytes_received BIGINT DEFAULT 0,
+                    bytes_sent BIGINT DEFAULT 0,
+                    rolled_bytes_received BIGINT DEFAULT 0,
+                    rolled_bytes_sent BIGINT DEFAULT 0,
+                    rollup_done BOOLEAN DEFAULT FALSE,
                     FOREIGN KEY (vpn_instance_id) REFERENCES vpn_instances(id) ON DELETE CASCADE
                 )
             ''')
+        # Сессии, созданные до агрегатов, остаются неучтенными и попадают в backfill
+        _add_missing_columns(cur, is_sqlite, 'vpn_sessions', [
+            ('rolled_bytes_received', f'{bigint} DEFAULT 0'),
+            ('rolled_bytes_sent', f'{bigint} DEFAULT 0'),
+            ('rollup_done', f'BOOLEAN DEFAULT {false}'),
+        ])
         
-        # Таблица для API ключей
+        # Сессии, ещё не полностью учтённые в агрегатах трафика
+        cur.execute('''
+            CREATE INDEX IF NOT EXISTS idx_vpn_sessions_rollup_pending
+            ON vpn_sessions (id) WHERE NOT rollup_done
+        ''')
+        
+        # Группы пользователей и членство в группах
+        if is_sqlite:
+            cur.execute('''
+                CREATE TABLE IF NOT EXISTS groups (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    name VARCHAR(100) UNIQUE NOT NULL,
+                    description TEXT,
+                    vpn_access BOOLEAN DEFAULT 1,
+                    max_connections INTEGER DEFAULT 5,
+                    bandwidth_limit INTEGER DEFAULT 0,
+                    access_hours VARCHAR(20) DEFAULT '00:00-23:59',
+                    permissions INTEGER DEFAULT 0,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+        else:
+            cur.execute('''
+                CREATE TABLE IF NOT EXISTS groups (
+                    id SERIAL PRIMARY KEY,
+                    name VARCHAR(100) UNIQUE NOT NULL,
+                    description TEXT,
+                    vpn_access BOOLEAN DEFAULT TRUE,
+                    max_connections INTEGER DEFAULT 5,
+                    bandwidth_limit INTEGER DEFAULT 0,
+                    access_hours VARCHAR(20) DEFAULT '00:00-23:59',
+                    permissions BIGINT DEFAULT 0,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+        _add_missing_columns(cur, is_sqlite, 'groups', [
+            ('permissions', f'{bigint} DEFAULT 0'),
+        ])
+        
+        cur.execute('''
+            CREATE TABLE IF NOT EXISTS user_groups (
+                user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
+                group_id INTEGER REFERENCES groups(id) ON DELETE CASCADE,
+                PRIMARY KEY (user_id, group_id)
+            )
+        ''')
+        
+        # Агрегаты трафика (почасовые и посуточные) по пользователю, группе и инстансу
+        for table in ('traffic_hourly', 'traffic_daily'):
+            if is_sqlite:
+                id_column = 'id INTEGER PRIMARY KEY AUTOINCREMENT'
+                bytes_type = 'INTEGER'
+            else:
+                id_column = 'id SERIAL PRIMARY KEY'
+                bytes_type = 'BIGINT'
+            cur.execute(f'''
+                CREATE TABLE IF NOT EXISTS {table} (
+                    {id_column},
+                    scope VARCHAR(16) NOT NULL,
+                    scope_id INTEGER NOT NULL,
+                    bucket_start TIMESTAMP NOT NULL,
+                    bytes_received {bytes_type} DEFAULT 0,
+                    bytes_sent {bytes_type} DEFAULT 0,
+                    sessions INTEGER DEFAULT 0,
+                    UNIQUE (scope, scope_id, bucket_start)
+                )
+            ''')
+        
+        # Хранилище отозванных сертификатов (источник CRL)
+        id_column = 'id INTEGER PRIMARY KEY AUTOINCREMENT' if is_sqlite else 'id SERIAL PRIMARY KEY'
+        cur.execute(f'''
+            CREATE TABLE IF NOT EXISTS revoked_certificates (
+                {id_column},
+                serial VARCHAR(40) UNIQUE NOT NULL,
+                client_name VARCHAR(100),
+                vpn_instance_id INTEGER REFERENCES vpn_instances(id) ON DELETE SET NULL,
+                reason VARCHAR(32) NOT NULL DEFAULT 'unspecified',
+                revoked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        
+        # Реестр выпущенных сертификатов (файлы в CERTS_DIR остаются источником ключей)
+        cur.execute(f'''
+            CREATE TABLE IF NOT EXISTS certificates (
+                {id_column},
+                serial VARCHAR(40) UNIQUE NOT NULL,
+                common_name VARCHAR(100) NOT NULL,
+                user_id INTEGER REFERENCES users(id) ON DELETE SET NULL,
+                vpn_instance_id INTEGER REFERENCES vpn_instances(id) ON DELETE SET NULL,
+                cert_type VARCHAR(8) NOT NULL DEFAULT 'client',
+                not_after TIMESTAMP NOT NULL,
+                fingerprint VARCHAR(64) NOT NULL,
+                status VARCHAR(16) NOT NULL DEFAULT 'active',
+                path TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        cur.execute('''
+            CREATE INDEX IF NOT EXISTS idx_certificates_active_expiry
+            ON certificates (not_after) WHERE status = 'active'
+        ''')
+        cur.execute('''
+            CREATE INDEX IF NOT EXISTS idx_certificates_user_status
+            ON certificates (user_id, status)
+        ''')
+        cur.execute('''
+            CREATE INDEX IF NOT EXISTS idx_certificates_instance_cn
+            ON certificates (vpn_instance_id, common_name)
+        ''')
+
+        # Зарезервированные серийные номера (уникальность при выпуске из нескольких воркеров)
+        cur.execute(f'''
+            CREATE TABLE IF NOT EXISTS certificate_serials (
+                {id_column},
+                serial VARCHAR(40) UNIQUE NOT NULL,
+                reserved_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        
+        # Таблица для API ключей. Прежняя схема хранила ключ открытым текстом (api_key);
+        # такие ключи не проходят проверку по хешу (и раньше не принимались вовсе),
+        # поэтому таблица пересоздается, а открытые значения удаляются
+        if 'api_key' in _table_columns(cur, is_sqlite, 'api_keys'):
+            cur.execute('DROP TABLE api_keys')
+            logger.warning("Legacy api_keys table with plaintext keys dropped, API keys must be created again")
         if is_sqlite:
             cur.execute('''
                 CREATE TABLE IF NOT EXISTS api_keys (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
                     user_id INTEGER REFERENCES users(id),
-                    api_key VARCHAR(64) UNIQUE NOT NULL,
+                    key_prefix VARCHAR(16) NOT NULL,
+                    key_hash VARCHAR(64) UNIQUE NOT NULL,
                     description TEXT,
                     is_active BOOLEAN DEFAULT 1,
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
@@ -238,7 +423,8 @@ def init_db():
                 CREATE TABLE IF NOT EXISTS api_keys (
                     id SERIAL PRIMARY KEY,
                     user_id INTEGER REFERENCES users(id),
-                    api_key VARCHAR(64) UNIQUE NOT NULL,
+                    key_prefix VARCHAR(16) NOT NULL,
+                    key_hash VARCHAR(64) UNIQUE NOT NULL,
                     description TEXT,
                     is_active BOOLEAN DEFAULT TRUE,
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
@@ -246,6 +432,20 @@ def init_db():
                     expires_at TIMESTAMP NULL
                 )
             ''')
+        # Ключ ищется по открытому префиксу, затем сверяется хеш
+        cur.execute('CREATE INDEX IF NOT EXISTS idx_api_keys_prefix ON api_keys (key_prefix)')
+        
+        # Refresh token для токенов доступа (хранится только хеш)
+        cur.execute(f'''
+            CREATE TABLE IF NOT EXISTS refresh_tokens (
+                {id_column},
+                user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+                token_hash VARCHAR(64) UNIQUE NOT NULL,
+                expires_at TIMESTAMP NOT NULL,
+                revoked_at TIMESTAMP NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
         
         # Таблица для системных логов
         if is_sqlite:
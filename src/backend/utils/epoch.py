@@ -0,0 +1,36 @@
+import os
+import time
+from ..config import config
+
+class SharedEpoch:
+    """Файл-эпоха в RUN_DIR для сброса кешей во всех воркерах.
+
+    Воркер, изменивший данные, вызывает bump(); остальные проверяют mtime
+    файла не чаще CHECK_INTERVAL и сбрасывают свой кеш, если changed().
+    """
+
+    CHECK_INTERVAL = 1.0
+
+    def __init__(self, name):
+        self.path = config.RUN_DIR / f'{name}.epoch'
+        self._seen = None
+        self._checked_at = 0
+
+    def changed(self):
+        """True, если эпоха изменилась с прошлой проверки"""
+        now = time.monotonic()
+        if now - self._checked_at < self.CHECK_INTERVAL:
+            return False
+        self._checked_at = now
+        try:
+            epoch = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            epoch = None
+        if epoch == self._seen:
+            return False
+        self._seen = epoch
+        return True
+
+    def bump(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.path.touch()
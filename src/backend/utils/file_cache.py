@@ -0,0 +1,83 @@
+import os
+import time
+import hashlib
+import threading
+import logging
+from collections import namedtuple
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# value — разобранное содержимое (или сами байты), data — байты файла,
+# mtime — время изменения (для Last-Modified), etag — хеш содержимого
+CachedFile = namedtuple('CachedFile', ['value', 'data', 'mtime', 'etag'])
+
+class FileCache:
+    """Кеш небольших файлов (материалы CA, ta.key, CRL) с инвалидацией по mtime.
+
+    stat выполняется не чаще CHECK_INTERVAL на файл, файл перечитывается
+    только при изменении mtime, размера или inode (атомарная замена файла
+    меняет inode). Поэтому CA или CRL, перевыпущенные другим воркером,
+    подхватываются без перезапуска. Для немедленного сброса есть invalidate().
+    """
+
+    CHECK_INTERVAL = 1.0
+
+    def __init__(self, check_interval=None):
+        self.check_interval = self.CHECK_INTERVAL if check_interval is None else check_interval
+        # path -> (CachedFile, stat_key, checked_at)
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, path, parse=None):
+        """Получить файл из кеша или None, если файла нет.
+
+        parse — функция разбора байтов файла, результат кешируется в value.
+        Для одного пути должна использоваться одна и та же функция разбора.
+        """
+        path = str(path)
+        now = time.monotonic()
+        entry = self._entries.get(path)
+        if entry and now - entry[2] < self.check_interval:
+            return entry[0]
+
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            self._entries.pop(path, None)
+            return None
+
+        stat_key = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+        if entry and entry[1] == stat_key:
+            self._entries[path] = (entry[0], stat_key, now)
+            return entry[0]
+
+        with self._lock:
+            # Файл мог уже перечитать другой поток
+            entry = self._entries.get(path)
+            if entry and entry[1] == stat_key:
+                return entry[0]
+
+            with open(path, 'rb') as f:
+                data = f.read()
+            cached = CachedFile(
+                parse(data) if parse else data, data, stat.st_mtime,
+                hashlib.sha256(data).hexdigest()[:32]
+            )
+            self._entries[path] = (cached, stat_key, now)
+
+        metrics.inc('file_cache_loads_total')
+        logger.debug(f"File cache loaded {path}")
+        return cached
+
+    def invalidate(self, path=None):
+        """Сбросить кеш файла (или весь кеш) после перевыпуска или ротации"""
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(str(path), None)
+
+
+# Глобальный кеш файлов PKI
+file_cache = FileCache()
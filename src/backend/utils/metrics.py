@@ -0,0 +1,78 @@
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+class MetricsRegistry:
+    """Простой потокобезопасный реестр метрик (счетчики, gauge, длительности)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._gauges = {}
+        self._summaries = {}
+
+    @staticmethod
+    def _key(name, labels):
+        return (name, tuple(sorted(labels.items())))
+
+    def inc(self, name, value=1, **labels):
+        """Увеличить счетчик"""
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set_gauge(self, name, value, **labels):
+        """Установить текущее значение gauge"""
+        key = self._key(name, labels)
+        with self._lock:
+            self._gauges[key] = value
+
+    def observe(self, name, value, **labels):
+        """Зарегистрировать наблюдение (count/sum/max/last)"""
+        key = self._key(name, labels)
+        with self._lock:
+            summary = self._summaries.get(key)
+            if summary is None:
+                summary = self._summaries[key] = {'count': 0, 'sum': 0.0, 'max': 0.0, 'last': 0.0}
+            summary['count'] += 1
+            summary['sum'] += value
+            summary['last'] = value
+            if value > summary['max']:
+                summary['max'] = value
+
+    def snapshot(self):
+        """Получить все метрики в виде словаря"""
+        def render(key):
+            name, labels = key
+            if not labels:
+                return name
+            return name + '{' + ','.join(f'{k}="{v}"' for k, v in labels) + '}'
+
+        with self._lock:
+            return {
+                'counters': {render(k): v for k, v in self._counters.items()},
+                'gauges': {render(k): v for k, v in self._gauges.items()},
+                'summaries': {render(k): dict(v) for k, v in self._summaries.items()}
+            }
+
+    def render_prometheus(self):
+        """Представить метрики в текстовом формате Prometheus"""
+        lines = []
+        snapshot = self.snapshot()
+
+        for name, value in sorted(snapshot['counters'].items()):
+            lines.append(f"{name} {value}")
+        for name, value in sorted(snapshot['gauges'].items()):
+            lines.append(f"{name} {value}")
+        for name, summary in sorted(snapshot['summaries'].items()):
+            base, _, labels = name.partition('{')
+            labels = '{' + labels if labels else ''
+            lines.append(f"{base}_count{labels} {summary['count']}")
+            lines.append(f"{base}_sum{labels} {summary['sum']}")
+            lines.append(f"{base}_max{labels} {summary['max']}")
+
+        return '\n'.join(lines) + '\n'
+
+# Глобальный реестр метрик
+metrics = MetricsRegistry()
@@ -0,0 +1,111 @@
+import time
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+import bcrypt
+from werkzeug.security import check_password_hash
+from .metrics import metrics
+from ..config import config
+
+logger = logging.getLogger(__name__)
+
+class HashingBusyError(Exception):
+    """Очередь хеширования паролей переполнена (ответ 503)"""
+
+
+class PasswordHasher:
+    """Хеширование и проверка паролей в отдельном ограниченном пуле потоков.
+
+    bcrypt отпускает GIL на время вычисления, поэтому пул потоков дает
+    настоящий параллелизм, а его размер ограничивает CPU, который может
+    занять поток логинов. Запросы сверх PASSWORD_HASH_WORKERS +
+    PASSWORD_HASH_QUEUE_MAX сразу получают HashingBusyError вместо ожидания.
+    """
+
+    # Хеш для проверки при несуществующем пользователе (одинаковое время ответа)
+    _dummy_hash = None
+
+    def __init__(self):
+        self._executor = None
+        self._slots = None
+        self._init_lock = threading.Lock()
+        self._pending_lock = threading.Lock()
+        self._pending = 0
+
+    def _submit(self, operation, func, *args):
+        """Выполнить func в пуле хеширования и дождаться результата"""
+        if self._executor is None:
+            with self._init_lock:
+                if self._executor is None:
+                    self._slots = threading.BoundedSemaphore(
+                        config.PASSWORD_HASH_WORKERS + config.PASSWORD_HASH_QUEUE_MAX
+                    )
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=config.PASSWORD_HASH_WORKERS, thread_name_prefix='PasswordHasher'
+                    )
+
+        if not self._slots.acquire(blocking=False):
+            metrics.inc('password_hash_rejected_total', op=operation)
+            raise HashingBusyError("Password hashing queue is full")
+
+        self._track_pending(1)
+        submitted = time.perf_counter()
+
+        def run():
+            started = time.perf_counter()
+            metrics.observe('password_hash_queue_seconds', started - submitted, op=operation)
+            try:
+                return func(*args)
+            finally:
+                metrics.observe('password_hash_seconds', time.perf_counter() - started, op=operation)
+
+        try:
+            return self._executor.submit(run).result()
+        finally:
+            self._track_pending(-1)
+            self._slots.release()
+
+    def _track_pending(self, delta):
+        with self._pending_lock:
+            self._pending += delta
+            metrics.set_gauge('password_hash_pending', self._pending)
+
+    def hash(self, password):
+        """Хеш пароля с текущей стоимостью bcrypt"""
+        salt = bcrypt.gensalt(rounds=config.PASSWORD_HASH_ROUNDS)
+        return self._submit('hash', bcrypt.hashpw, password.encode('utf-8'), salt).decode('ascii')
+
+    def verify(self, password, password_hash):
+        """Проверить пароль. Возвращает (верен, нужно перехешировать).
+
+        Перехеширование нужно, если стоимость bcrypt изменилась в настройках или
+        хеш создан в старом формате (werkzeug).
+        """
+        if not password_hash:
+            self.verify_dummy(password)
+            return False, False
+
+        if password_hash.startswith(('$2a$', '$2b$', '$2y$')):
+            valid = self._submit('verify', bcrypt.checkpw, password.encode('utf-8'), password_hash.encode('ascii'))
+            return valid, valid and self.rounds(password_hash) != config.PASSWORD_HASH_ROUNDS
+
+        valid = self._submit('verify', check_password_hash, password_hash, password)
+        return valid, valid
+
+    def verify_dummy(self, password):
+        """Проверка против фиктивного хеша, чтобы время ответа не выдавало несуществующих пользователей"""
+        if PasswordHasher._dummy_hash is None:
+            PasswordHasher._dummy_hash = self.hash('dummy-password').encode('ascii')
+        self._submit('verify', bcrypt.checkpw, password.encode('utf-8'), PasswordHasher._dummy_hash)
+
+    @staticmethod
+    def rounds(password_hash):
+        """Стоимость bcrypt из хеша ($2b$12$...)"""
+        try:
+            return int(password_hash.split('$')[2])
+        except (IndexError, ValueError):
+            return None
+
+
+# Глобальный пул хеширования паролей
+password_hasher = PasswordHasher()
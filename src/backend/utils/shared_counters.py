@@ -0,0 +1,241 @@
+import os
+import mmap
+import time
+import fcntl
+import struct
+import hashlib
+import threading
+import logging
+from .metrics import metrics
+from ..config import config
+
+logger = logging.getLogger(__name__)
+
+class SharedCounterTable:
+    """Хеш-таблица счетчиков в общей памяти (mmap файла в RUN_DIR) для всех воркеров хоста.
+
+    Слот — (хеш ключа, значение, истекает_в). Таблица разбита на полосы со
+    своей блокировкой (threading.Lock внутри процесса + fcntl на байт полосы
+    между процессами); ключ и вся его цепочка проб лежат в одной полосе, так
+    что обновление — одна блокировка и чтение-изменение-запись нескольких
+    слотов. Истекшие слоты переиспользуются; если в окне проб нет места,
+    вытесняется слот с самым ранним сроком.
+
+    Если файл создать нельзя, таблица работает в анонимной памяти процесса.
+    """
+
+    MAGIC = b'KLCNT001'
+    HEADER = struct.Struct('<8sII')
+    HEADER_SIZE = 64
+    SLOT = struct.Struct('<Qdd')
+    PROBES = 16
+
+    def __init__(self, name, slots, stripes=64):
+        self.path = config.RUN_DIR / f'{name}.shm'
+        self.stripes = stripes
+        self.slots_per_stripe = max(self.PROBES, slots // stripes)
+        self.slots = self.slots_per_stripe * stripes
+        self.size = self.HEADER_SIZE + self.slots * self.SLOT.size
+        self._locks = [threading.Lock() for _ in range(stripes)]
+        self._open_lock = threading.Lock()
+        self._mm = None
+        self._fd = None
+        self._pid = None
+        self.shared = False
+
+    def update(self, key, func):
+        """Атомарно изменить значение ключа.
+
+        func(value, expires_at, now) получает None, None для отсутствующего или
+        истекшего ключа и возвращает (value, expires_at, result); value=None —
+        ничего не записывать. Возвращает result.
+        """
+        mm = self._map()
+        key_hash = self._hash(key)
+        stripe = key_hash % self.stripes
+        with self._locks[stripe]:
+            self._lock_stripe(stripe, fcntl.LOCK_EX)
+            try:
+                now = time.time()
+                offset, value, expires_at = self._find(mm, key_hash, stripe, now)
+                value, expires_at, result = func(value, expires_at, now)
+                if value is not None:
+                    self.SLOT.pack_into(mm, offset, key_hash, value, expires_at)
+                return result
+            finally:
+                self._lock_stripe(stripe, fcntl.LOCK_UN)
+
+    def update_many(self, keys, func):
+        """Атомарно изменить несколько ключей под одной блокировкой их полос.
+
+        func(current, now) получает список (value, expires_at) в порядке keys и
+        возвращает (список новых (value, expires_at), result); value=None —
+        ключ не записывать. Полосы блокируются по возрастанию номера, поэтому
+        пересекающиеся наборы ключей не взаимоблокируются.
+        """
+        mm = self._map()
+        hashes = [self._hash(key) for key in keys]
+        stripes = sorted({key_hash % self.stripes for key_hash in hashes})
+        locked = []
+        try:
+            for stripe in stripes:
+                self._locks[stripe].acquire()
+                locked.append(stripe)
+                self._lock_stripe(stripe, fcntl.LOCK_EX)
+
+            now = time.time()
+            offsets, current = [], []
+            for key_hash in hashes:
+                # Два новых ключа одной полосы не должны получить один свободный слот
+                offset, value, expires_at = self._find(mm, key_hash, key_hash % self.stripes, now, offsets)
+                offsets.append(offset)
+                current.append((value, expires_at))
+
+            updates, result = func(current, now)
+            for key_hash, offset, (value, expires_at) in zip(hashes, offsets, updates):
+                if value is not None:
+                    self.SLOT.pack_into(mm, offset, key_hash, value, expires_at)
+            return result
+        finally:
+            for stripe in reversed(locked):
+                self._lock_stripe(stripe, fcntl.LOCK_UN)
+                self._locks[stripe].release()
+
+    def get(self, key):
+        """(value, expires_at) действующего ключа или (None, None)"""
+        return self.update(key, lambda value, expires_at, now: (None, None, (value, expires_at)))
+
+    def incr(self, key, window, amount=1):
+        """Счетчик в фиксированном окне window секунд. Возвращает (count, expires_at)"""
+        def increment(value, expires_at, now):
+            if value is None:
+                value, expires_at = 0, now + window
+            return value + amount, expires_at, (value + amount, expires_at)
+        return self.update(key, increment)
+
+    def gcra(self, key, interval, period):
+        """Шаг GCRA (один запрос раз в interval, всплеск до period). Возвращает (allowed, TAT - now)"""
+        def step(tat, expires_at, now):
+            tat = max(tat or now, now)
+            if tat + interval - now > period:
+                return None, None, (False, tat - now)
+            return tat + interval, tat + interval, (True, tat + interval - now)
+        return self.update(key, step)
+
+    def gcra_many(self, limits):
+        """Шаг GCRA сразу по нескольким лимитам [(key, interval, period)].
+
+        Запрос проходит, только если его пропускают все лимиты, и тогда
+        учитывается во всех; отклоненный запрос не расходует ни один.
+        Возвращает (allowed, [TAT - now по каждому лимиту]).
+        """
+        if len(limits) == 1:
+            key, interval, period = limits[0]
+            allowed, used = self.gcra(key, interval, period)
+            return allowed, [used]
+
+        def step(current, now):
+            tats = []
+            allowed = True
+            for (tat, _), (_, interval, period) in zip(current, limits):
+                tat = max(tat or now, now)
+                tats.append(tat)
+                if tat + interval - now > period:
+                    allowed = False
+            if not allowed:
+                return [(None, None)] * len(limits), (False, [tat - now for tat in tats])
+            new_tats = [tat + interval for tat, (_, interval, _) in zip(tats, limits)]
+            return [(tat, tat) for tat in new_tats], (True, [tat - now for tat in new_tats])
+        return self.update_many([key for key, _, _ in limits], step)
+
+    def entries(self):
+        """Число действующих записей (полный проход, для метрик)"""
+        mm = self._map()
+        now = time.time()
+        count = 0
+        for offset in range(self.HEADER_SIZE, self.size, self.SLOT.size):
+            key_hash, _, expires_at = self.SLOT.unpack_from(mm, offset)
+            if key_hash and expires_at > now:
+                count += 1
+        return count
+
+    def _find(self, mm, key_hash, stripe, now, taken=()):
+        """Слот ключа: (offset, value, expires_at); для нового ключа value и expires_at — None.
+
+        Слоты из taken уже заняты другими ключами текущего обновления.
+        """
+        base = self.HEADER_SIZE + stripe * self.slots_per_stripe * self.SLOT.size
+        home = (key_hash // self.stripes) % self.slots_per_stripe
+        free = None
+        victim, victim_expires = None, None
+        for probe in range(self.PROBES):
+            offset = base + ((home + probe) % self.slots_per_stripe) * self.SLOT.size
+            slot_hash, value, expires_at = self.SLOT.unpack_from(mm, offset)
+            if slot_hash == key_hash:
+                if expires_at > now:
+                    return offset, value, expires_at
+                return offset, None, None
+            if offset in taken:
+                continue
+            if slot_hash == 0:
+                # Слоты не освобождаются, дальше пустого ключа быть не может
+                return (free if free is not None else offset), None, None
+            if expires_at <= now:
+                if free is None:
+                    free = offset
+            elif victim is None or expires_at < victim_expires:
+                victim, victim_expires = offset, expires_at
+
+        if free is not None:
+            return free, None, None
+        metrics.inc('shared_counter_evictions_total')
+        return victim, None, None
+
+    def _map(self):
+        # После fork блокировки fcntl не наследуются — открыть файл заново
+        if self._mm is not None and self._pid == os.getpid():
+            return self._mm
+        with self._open_lock:
+            if self._mm is None or self._pid != os.getpid():
+                self._open()
+        return self._mm
+
+    def _open(self):
+        self._pid = os.getpid()
+        self._locks = [threading.Lock() for _ in range(self.stripes)]
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                header = os.pread(fd, self.HEADER.size, 0)
+                if header != self.HEADER.pack(self.MAGIC, self.slots, self.stripes):
+                    # Новый файл или другой размер таблицы — создать заново
+                    os.ftruncate(fd, 0)
+                    os.ftruncate(fd, self.size)
+                    os.pwrite(fd, self.HEADER.pack(self.MAGIC, self.slots, self.stripes), 0)
+                fcntl.flock(fd, fcntl.LOCK_UN)
+                self._mm = mmap.mmap(fd, self.size)
+            except OSError:
+                os.close(fd)
+                raise
+            self._fd = fd
+            self.shared = True
+        except OSError as e:
+            logger.error(f"Shared counters unavailable ({self.path}), using process memory: {str(e)}")
+            self._mm = mmap.mmap(-1, self.size)
+            self._fd = None
+            self.shared = False
+
+    def _lock_stripe(self, stripe, operation):
+        if self._fd is not None:
+            fcntl.lockf(self._fd, operation, 1, stripe)
+
+    @staticmethod
+    def _hash(key):
+        # Стабильный между процессами хеш (hash() рандомизирован); 0 — пустой слот
+        return int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'little') or 1
+
+
+# Общие счетчики лимитов и защиты от перебора
+shared_counters = SharedCounterTable('counters', config.SHARED_COUNTER_SLOTS)
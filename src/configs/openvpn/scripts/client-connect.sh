@@ -3,16 +3,43 @@
 # Called when client connects
 
 LOG_TAG="openvpn-client-connect"
-USERNAME="$1"
+USERNAME="${common_name:-$1}"
 SESSION_ID="$2"
-REMOTE_IP="$3"
-VIRTUAL_IP="$4"
+REMOTE_IP="${trusted_ip:-$3}"
+VIRTUAL_IP="${ifconfig_pool_remote_ip:-$4}"
+
+# Set by the server config (setenv) generated by KursLight
+INSTANCE="${KL_INSTANCE:-}"
+LIMITER_SOCKET="${KL_LIMITER_SOCKET:-/opt/kurs-light/run/conn-limiter.sock}"
+SESSION_KEY="${INSTANCE}:${USERNAME}:${REMOTE_IP}:${trusted_port:-0}"
 
 log_message() {
     logger -t "$LOG_TAG" "$1"
     echo "$(date '+%Y-%m-%d %H:%M:%S') - $1" >> /opt/kurs-light/logs/openvpn/client-connections.log
 }
 
+# Ask the connection limiter for an allow/deny decision.
+# If the limiter is not running, the connection is allowed (fail-open).
+check_connection_limits() {
+    [ -n "$INSTANCE" ] && [ -S "$LIMITER_SOCKET" ] || return 0
+
+    local reply
+    reply=$(printf 'CONNECT %s %s %s %s\n' "$INSTANCE" "$USERNAME" "$SESSION_KEY" "$REMOTE_IP" \
+        | timeout 2 socat - "UNIX-CONNECT:$LIMITER_SOCKET" 2>/dev/null)
+
+    case "$reply" in
+        DENY*)
+            log_message "DENY: User $USERNAME on $INSTANCE from $REMOTE_IP: ${reply#DENY }"
+            return 1
+            ;;
+    esac
+    return 0
+}
+
+if ! check_connection_limits; then
+    exit 1
+fi
+
 # Log connection
 log_message "CONNECT: User $USERNAME connected from $REMOTE_IP (VIP: $VIRTUAL_IP, Session: $SESSION_ID)"
 
@@ -23,6 +50,13 @@ INSERT INTO vpn_connection_logs
 VALUES 
 ('$USERNAME', '$REMOTE_IP', '$VIRTUAL_IP', '$SESSION_ID', 'connect', NOW());" 2>/dev/null || true
 
+# Open session (used for limiter reconciliation and traffic rollups)
+if [ -n "$INSTANCE" ]; then
+    psql -d kurslight_db -c "
+    INSERT INTO vpn_sessions (vpn_instance_id, client_name, client_ip)
+    SELECT id, '$USERNAME', '$REMOTE_IP' FROM vpn_instances WHERE name = '$INSTANCE';" 2>/dev/null || true
+fi
+
 # Send RADIUS accounting start
 ACCT_REQUEST="User-Name=$USERNAME,Acct-Session-Id=$SESSION_ID,NAS-IP-Address=127.0.0.1,NAS-Port=1194,Acct-Status-Type=Start,Framed-IP-Address=$VIRTUAL_IP"
 
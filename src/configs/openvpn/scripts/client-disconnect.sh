@@ -3,14 +3,19 @@
 # Called when client disconnects
 
 LOG_TAG="openvpn-client-disconnect"
-USERNAME="$1"
+USERNAME="${common_name:-$1}"
 SESSION_ID="$2"
-REMOTE_IP="$3"
-VIRTUAL_IP="$4"
-BYTES_SENT="$5"
-BYTES_RECEIVED="$6"
+REMOTE_IP="${trusted_ip:-$3}"
+VIRTUAL_IP="${ifconfig_pool_remote_ip:-$4}"
+BYTES_SENT="${bytes_sent:-$5}"
+BYTES_RECEIVED="${bytes_received:-$6}"
 DURATION="$7"
 
+# Set by the server config (setenv) generated by KursLight
+INSTANCE="${KL_INSTANCE:-}"
+LIMITER_SOCKET="${KL_LIMITER_SOCKET:-/opt/kurs-light/run/conn-limiter.sock}"
+SESSION_KEY="${INSTANCE}:${USERNAME}:${REMOTE_IP}:${trusted_port:-0}"
+
 log_message() {
     logger -t "$LOG_TAG" "$1"
     echo "$(date '+%Y-%m-%d %H:%M:%S') - $1" >> /opt/kurs-light/logs/openvpn/client-connections.log
@@ -33,6 +38,25 @@ SET
     disconnected_at = NOW()
 WHERE session_id = '$SESSION_ID';" 2>/dev/null || true
 
+# Close session (used for limiter reconciliation and traffic rollups)
+if [ -n "$INSTANCE" ]; then
+    psql -d kurslight_db -c "
+    UPDATE vpn_sessions
+    SET disconnected_at = NOW(), bytes_received = ${BYTES_RECEIVED:-0}, bytes_sent = ${BYTES_SENT:-0}
+    WHERE id = (
+        SELECT s.id FROM vpn_sessions s JOIN vpn_instances i ON i.id = s.vpn_instance_id
+        WHERE i.name = '$INSTANCE' AND s.client_name = '$USERNAME' AND s.client_ip = '$REMOTE_IP'
+          AND s.disconnected_at IS NULL
+        ORDER BY s.id DESC LIMIT 1
+    );" 2>/dev/null || true
+fi
+
+# Release the slot in the connection limiter
+if [ -n "$INSTANCE" ] && [ -S "$LIMITER_SOCKET" ]; then
+    printf 'DISCONNECT %s %s %s %s\n' "$INSTANCE" "$SESSION_KEY" "$USERNAME" "$REMOTE_IP" \
+        | timeout 2 socat - "UNIX-CONNECT:$LIMITER_SOCKET" >/dev/null 2>&1 || true
+fi
+
 # Send RADIUS accounting stop
 ACCT_REQUEST="User-Name=$USERNAME,Acct-Session-Id=$SESSION_ID,NAS-IP-Address=127.0.0.1,Acct-Status-Type=Stop,Acct-Session-Time=$SESSION_TIME,Acct-Input-Octets=$BYTES_RECEIVED,Acct-Output-Octets=$BYTES_SENT,Framed-IP-Address=$VIRTUAL_IP"
 